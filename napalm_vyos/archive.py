@@ -0,0 +1,321 @@
+# Copyright 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Content addressed archive of configurations, deduplicated by blocks of lines.
+
+Configurations are cut into blocks of lines at boundaries chosen by the
+content of the lines themselves, so an edit only changes the blocks around
+it and every other block is shared with the previous snapshots. Blocks are
+stored once, zlib compressed, under their SHA-256. The list of blocks of a
+configuration is itself cut the same way into index blocks, so a change
+also rewrites only one of those, and the list of index blocks is stored
+under the SHA-256 of the whole text, which identifies the configuration.
+Those lists live in a directory of their own, as the text of a
+configuration made of one block has the SHA-256 of that block.
+The history of each device and store only gets a line when the
+configuration differs from the previous one:
+
+    root/objects/3f/9a...           blocks and index blocks
+    root/objects/configs/7c/2e...   configurations
+    root/history/router1/running
+        1700000000.0 7c2e...
+        1700086400.0 a41b...
+
+Polling an unchanged device writes nothing, so disk use and writes grow
+with the changes, not with the number of snapshots:
+
+    >>> archive = ConfigArchive("/var/lib/vyos-configs")
+    >>> archive.snapshot("router1", device)
+    >>> print(archive.diff("router1", yesterday, now))
+"""
+import bisect
+import difflib
+import hashlib
+import os
+import struct
+import threading
+import time
+import urllib.parse
+import zlib
+
+STORES = ("running", "startup", "candidate")
+
+
+class ConfigArchive(object):
+    """
+    Archive of the configurations of devices, one history per device and store.
+
+    :param root: directory of the archive, created if missing.
+    :param block_lines: average number of lines of a block. Smaller blocks
+        deduplicate more finely, for longer block lists.
+    """
+
+    _ENTRY = struct.Struct(">32sI")
+    # an index block ends after a block digest starting with 4 zero bits
+    _INDEX_MASK = 0xF0
+    _CONFIGS = "configs"
+
+    def __init__(self, root, block_lines=64):
+        self.root = root
+        self.mask = (1 << max(0, block_lines.bit_length() - 1)) - 1
+        self.min_lines = max(1, block_lines // 4)
+        self.max_lines = block_lines * 8
+        self._lock = threading.Lock()
+        self._last = {}
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+
+    def snapshot(self, name, device, stores=("running",), timestamp=None):
+        """
+        Stream the 'stores' of an open driver into the archive as 'name',
+        return the configuration id of each store.
+        """
+        writers = {store: _BlockWriter(self) for store in stores}
+        # retrieve="all" would also read the stores not asked for
+        for store, writer in writers.items():
+            device.get_config(retrieve=store, sinks={store: writer})
+        return {
+            store: self._record(name, store, *writer.close(), timestamp)
+            for store, writer in writers.items()
+        }
+
+    def add(self, name, store, config, timestamp=None):
+        """Archive the text of a configuration, return its id."""
+        writer = _BlockWriter(self)
+        writer.write(config.encode())
+        return self._record(name, store, *writer.close(), timestamp)
+
+    def history(self, name, store="running"):
+        """Return (timestamp, configuration id) of every change, oldest first."""
+        try:
+            with open(self._history_path(name, store)) as f:
+                changes = [
+                    (float(timestamp), config_id)
+                    for timestamp, config_id in (line.split() for line in f if line.strip())
+                ]
+        except FileNotFoundError:
+            return []
+        # snapshots given an explicit timestamp may be recorded out of order
+        changes.sort(key=lambda change: change[0])
+        return changes
+
+    def at(self, name, when=None, store="running"):
+        """Id of the configuration in place at 'when' (now by default), or None."""
+        history = self.history(name, store)
+        if when is not None:
+            history = history[:bisect.bisect_right([t for t, _ in history], when)]
+        return history[-1][1] if history else None
+
+    def get(self, name, when=None, store="running"):
+        """Text of the configuration in place at 'when', or None."""
+        config_id = self.at(name, when, store)
+        if config_id is None:
+            return None
+        return b"".join(self._read(digest) for digest, _ in self._blocks(config_id)).decode()
+
+    def diff(self, name, start, end=None, store="running", context=3):
+        """
+        Unified diff of the configuration between 'start' and 'end' (now by
+        default). Only the blocks that differ are read and compared.
+        """
+        old, new = self.at(name, start, store), self.at(name, end, store)
+        if old == new:
+            return ""
+        old_blocks = self._blocks(old) if old else []
+        new_blocks = self._blocks(new) if new else []
+
+        lines = [f"--- {name} {store} {start}\n", f"+++ {name} {store} {end or 'now'}\n"]
+        for (a_start, a_lines), (b_start, b_lines) in self._changed_regions(
+            old_blocks, new_blocks
+        ):
+            matcher = difflib.SequenceMatcher(None, a_lines, b_lines, autojunk=False)
+            for group in matcher.get_grouped_opcodes(context):
+                lines.append(_hunk_header(group, a_start, b_start))
+                for tag, i1, i2, j1, j2 in group:
+                    if tag == "equal":
+                        lines += [" " + line for line in a_lines[i1:i2]]
+                        continue
+                    lines += ["-" + line for line in a_lines[i1:i2]]
+                    lines += ["+" + line for line in b_lines[j1:j2]]
+        return "".join(line if line.endswith("\n") else line + "\n" for line in lines)
+
+    def stats(self):
+        """Number of objects stored and their size on disk in bytes."""
+        objects = size = 0
+        for directory, _, files in os.walk(os.path.join(self.root, "objects")):
+            for filename in files:
+                objects += 1
+                size += os.path.getsize(os.path.join(directory, filename))
+        return {"objects": objects, "bytes": size}
+
+    def _record(self, name, store, config_id, blocks, timestamp):
+        with self._lock:
+            key = (name, store)
+            if key not in self._last:
+                history = self.history(name, store)
+                self._last[key] = history[-1][1] if history else None
+            if self._last[key] == config_id:
+                return config_id
+
+            index = []
+            start = 0
+            for end, (digest, _) in enumerate(blocks, 1):
+                if end == len(blocks) or not digest[0] & self._INDEX_MASK:
+                    index.append(self._store_entries(blocks[start:end]))
+                    start = end
+            self._store(config_id, self._pack(index), self._CONFIGS)
+
+            path = self._history_path(name, store)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a") as f:
+                f.write(f"{time.time() if timestamp is None else timestamp} {config_id}\n")
+            self._last[key] = config_id
+        return config_id
+
+    def _changed_regions(self, old_blocks, new_blocks):
+        """
+        Yield ((old first line, old lines), (new first line, new lines)) for
+        each run of differing blocks, with one unchanged block around it for
+        context.
+        """
+        old_offsets = _offsets(old_blocks)
+        new_offsets = _offsets(new_blocks)
+        matcher = difflib.SequenceMatcher(
+            None, [d for d, _ in old_blocks], [d for d, _ in new_blocks], autojunk=False
+        )
+        regions = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            i1, j1 = max(0, i1 - 1), max(0, j1 - 1)
+            i2, j2 = min(len(old_blocks), i2 + 1), min(len(new_blocks), j2 + 1)
+            if regions and (i1 <= regions[-1][1] or j1 <= regions[-1][3]):
+                regions[-1][1:] = [max(i2, regions[-1][1]), regions[-1][2],
+                                   max(j2, regions[-1][3])]
+            else:
+                regions.append([i1, i2, j1, j2])
+
+        for i1, i2, j1, j2 in regions:
+            yield (
+                (old_offsets[i1], self._lines(old_blocks[i1:i2])),
+                (new_offsets[j1], self._lines(new_blocks[j1:j2])),
+            )
+
+    def _lines(self, blocks):
+        return b"".join(self._read(digest) for digest, _ in blocks).decode().splitlines(True)
+
+    def _blocks(self, config_id):
+        blocks = []
+        for digest, _ in self._ENTRY.iter_unpack(self._read(config_id, self._CONFIGS)):
+            blocks += self._ENTRY.iter_unpack(self._read(digest))
+        return blocks
+
+    def _store_entries(self, entries):
+        """Store a list of (digest, lines), return its own (digest, lines)."""
+        data = self._pack(entries)
+        digest = hashlib.sha256(data).digest()
+        self._store(digest, data)
+        return digest, sum(lines for _, lines in entries)
+
+    def _pack(self, entries):
+        return b"".join(self._ENTRY.pack(*entry) for entry in entries)
+
+    def _store(self, digest, data, namespace=""):
+        path = self._object_path(digest, namespace)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        with open(temporary, "wb") as f:
+            f.write(zlib.compress(data))
+        os.replace(temporary, path)
+
+    def _read(self, digest, namespace=""):
+        with open(self._object_path(digest, namespace), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def _object_path(self, digest, namespace=""):
+        digest = digest.hex() if isinstance(digest, bytes) else digest
+        return os.path.join(self.root, "objects", namespace, digest[:2], digest[2:])
+
+    def _history_path(self, name, store):
+        if store not in STORES:
+            raise ValueError(f"Unknown configuration store {store!r}")
+        return os.path.join(self.root, "history", urllib.parse.quote(name, safe=""), store)
+
+
+class _BlockWriter(object):
+    """
+    Binary file-like object cutting what is written into blocks of lines
+    and storing the new ones, as get_config sinks are written to.
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.blocks = []
+        self._digest = hashlib.sha256()
+        self._pending = b""
+        self._block = []
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self._digest.update(data)
+        lines = (self._pending + data).split(b"\n")
+        self._pending = lines.pop()
+        archive = self.archive
+        for line in lines:
+            self._block.append(line + b"\n")
+            if len(self._block) >= archive.max_lines or (
+                len(self._block) >= archive.min_lines
+                and not zlib.crc32(line) & archive.mask
+            ):
+                self._flush()
+        return len(data)
+
+    def close(self):
+        """Store the last block, return the configuration id and its block list."""
+        if self._pending:
+            self._block.append(self._pending)
+            self._pending = b""
+        self._flush()
+        return self._digest.hexdigest(), self.blocks
+
+    def _flush(self):
+        if not self._block:
+            return
+        data = b"".join(self._block)
+        digest = hashlib.sha256(data).digest()
+        self.archive._store(digest, data)
+        self.blocks.append((digest, len(self._block)))
+        self._block = []
+
+
+def _offsets(blocks):
+    offsets = [0]
+    for _, count in blocks:
+        offsets.append(offsets[-1] + count)
+    return offsets
+
+
+def _hunk_header(group, a_start, b_start):
+    first, last = group[0], group[-1]
+    a1, a2, b1, b2 = first[1], last[2], first[3], last[4]
+
+    def span(start, end, offset):
+        length = end - start
+        begin = start + offset + (1 if length else 0)
+        return f"{begin}" if length == 1 else f"{begin},{length}"
+
+    return f"@@ -{span(a1, a2, a_start)} +{span(b1, b2, b_start)} @@\n"
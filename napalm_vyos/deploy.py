@@ -0,0 +1,245 @@
+# Copyright 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Staged configuration deployment across many VyOS devices.
+
+Candidates are loaded and compared on every device in parallel, then
+committed in waves. Each wave is followed by a health gate; when a wave
+fails, every device committed so far is rolled back and the remaining ones
+are discarded.
+
+    >>> deployment = Deployment(drivers, config=change, wave_size=20,
+    ...                         health_check=lambda driver: ...)
+    >>> report = deployment.run()
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("peering.manager.peering")
+
+PENDING = "pending"
+UNCHANGED = "unchanged"
+COMMITTED = "committed"
+FAILED = "failed"
+ROLLED_BACK = "rolled_back"
+DISCARDED = "discarded"
+
+
+class Deployment(object):
+    """
+    Deploy one configuration change to a fleet of VyOSDriver instances.
+
+    :param drivers: dictionary of device name to driver. Drivers which are
+        not open yet are opened during staging.
+    :param config: configuration to load, as accepted by the load methods.
+    :param filename: file to load instead of 'config'.
+    :param replace: use load_replace_candidate instead of load_merge_candidate.
+    :param wave_size: number of devices committed per wave. 'first_wave_size'
+        allows a smaller canary wave.
+    :param concurrency: maximum number of devices worked on at the same time.
+    :param health_check: callable receiving a driver after commit and
+        returning True when the device is healthy. Exceptions count as a
+        failure.
+    :param soak_time: seconds to wait between a commit and its health gate.
+    :param max_failures: failed devices tolerated before the deployment is
+        aborted and rolled back.
+    :param revert_in: commit with commit-confirm and confirm only once the
+        health gate passed, so a device that lost connectivity reverts by
+        itself.
+    """
+
+    def __init__(
+        self,
+        drivers,
+        config=None,
+        filename=None,
+        replace=False,
+        wave_size=10,
+        first_wave_size=None,
+        concurrency=10,
+        health_check=None,
+        soak_time=0,
+        max_failures=0,
+        revert_in=None,
+    ):
+        if not filename and not config:
+            raise ValueError("filename or config param must be provided.")
+
+        self.drivers = drivers
+        self.config = config
+        self.filename = filename
+        self.replace = replace
+        self.wave_size = wave_size
+        self.first_wave_size = first_wave_size or wave_size
+        self.concurrency = concurrency
+        self.health_check = health_check
+        self.soak_time = soak_time
+        self.max_failures = max_failures
+        self.revert_in = revert_in
+
+        self.report = {
+            name: {"status": PENDING, "wave": None, "diff": "", "error": "", "timings": {}}
+            for name in drivers
+        }
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def run(self):
+        """
+        Stage, then commit wave after wave. Returns the report, a dictionary
+        keyed by device name:
+
+        {"status": "committed", "wave": 0, "diff": "...", "error": "",
+         "timings": {"open": 1.2, "stage": 0.8, "commit": 2.1, "health": 0.4}}
+        """
+        staged = self.stage()
+
+        committed = []
+        for index, wave in enumerate(self.waves(staged)):
+            logger.debug(f"Deploying wave {index}: {', '.join(wave)}")
+            for name in wave:
+                self.report[name]["wave"] = index
+
+            done = self._map(self._commit, wave)
+            committed += [name for name in wave if self.report[name]["status"] == COMMITTED]
+
+            if not all(done) and self._abort():
+                self._abort_deployment(committed, staged)
+                break
+
+            if self.soak_time:
+                time.sleep(self.soak_time)
+            healthy = self._map(self._gate, [name for name in wave if name in committed])
+            if not all(healthy) and self._abort():
+                self._abort_deployment(committed, staged)
+                break
+
+        return self.report
+
+    def stage(self):
+        """Load and compare the candidate everywhere, return devices with a diff."""
+        self._map(self._stage, list(self.drivers))
+        return [name for name, result in self.report.items() if result["status"] == PENDING]
+
+    def waves(self, names):
+        """Split 'names' into the waves they are committed in."""
+        if not names:
+            return []
+        waves = [names[:self.first_wave_size]]
+        for start in range(self.first_wave_size, len(names), self.wave_size):
+            waves.append(names[start:start + self.wave_size])
+        return waves
+
+    def _map(self, function, names):
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as pool:
+            return list(pool.map(function, names))
+
+    def _timed(self, name, phase, function, *args, **kwargs):
+        start = time.monotonic()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings = self.report[name]["timings"]
+            timings[phase] = timings.get(phase, 0.0) + time.monotonic() - start
+
+    def _fail(self, name, phase, error):
+        logger.debug(f"Deployment {phase} failed on {name}: {error}")
+        self.report[name]["status"] = FAILED
+        self.report[name]["error"] = f"{phase}: {error}"
+        with self._lock:
+            self._failures += 1
+
+    def _abort(self):
+        with self._lock:
+            return self._failures > self.max_failures
+
+    def _stage(self, name):
+        driver = self.drivers[name]
+        try:
+            if driver.device is None:
+                self._timed(name, "open", driver.open)
+            load = driver.load_replace_candidate if self.replace else driver.load_merge_candidate
+            self._timed(name, "stage", load, filename=self.filename, config=self.config)
+            diff = self._timed(name, "compare", driver.compare_config)
+        except Exception as e:
+            self._fail(name, "stage", e)
+            self._discard(name)
+            return False
+
+        self.report[name]["diff"] = diff
+        if not diff:
+            self.report[name]["status"] = UNCHANGED
+            self._discard(name)
+        return True
+
+    def _commit(self, name):
+        if self._abort():
+            # failed earlier in the wave, left pending to be discarded
+            return False
+        try:
+            self._timed(name, "commit", self.drivers[name].commit_config, revert_in=self.revert_in)
+        except Exception as e:
+            self._fail(name, "commit", e)
+            self._discard(name)
+            return False
+
+        self.report[name]["status"] = COMMITTED
+        return True
+
+    def _gate(self, name):
+        driver = self.drivers[name]
+        try:
+            healthy = True
+            if self.health_check is not None:
+                healthy = self._timed(name, "health", self.health_check, driver)
+            if not healthy:
+                raise ValueError("health check did not pass")
+            if self.revert_in is not None:
+                self._timed(name, "confirm", driver.confirm_commit)
+        except Exception as e:
+            self._fail(name, "health", e)
+            self._rollback(name)
+            return False
+
+        return True
+
+    def _abort_deployment(self, committed, staged):
+        logger.debug(f"Aborting deployment after {self._failures} failures")
+        self._map(self._rollback, [n for n in committed if self.report[n]["status"] == COMMITTED])
+        self._map(self._discard, [n for n in staged if self.report[n]["status"] == PENDING])
+
+    def _rollback(self, name):
+        try:
+            self._timed(name, "rollback", self.drivers[name].rollback)
+        except Exception as e:
+            self.report[name]["status"] = FAILED
+            self.report[name]["error"] += f" rollback: {e}"
+            return False
+
+        if self.report[name]["status"] == COMMITTED:
+            self.report[name]["status"] = ROLLED_BACK
+        else:
+            self.report[name]["error"] += " (rolled back)"
+        return True
+
+    def _discard(self, name):
+        try:
+            self.drivers[name].discard_config()
+        except Exception as e:
+            logger.debug(f"Discarding candidate on {name} failed: {e}")
+        if self.report[name]["status"] == PENDING:
+            self.report[name]["status"] = DISCARDED
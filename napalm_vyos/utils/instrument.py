@@ -0,0 +1,207 @@
+# Copyright 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Timing of the commands sent by the driver and of the getters running them.
+
+Hooks are callables receiving an event name and a record:
+
+    hook("command", {"getter": "get_bgp_neighbors", "command": "show ip bgp summary",
+                     "start": 1700000000000000000, "wall_time": 0.42, "ttfb": 0.05,
+                     "bytes": 1830, "streamed": False, "error": None})
+    hook("getter", {"getter": "get_bgp_neighbors", "start": 1700000000000000000,
+                    "wall_time": 0.45, "command_time": 0.42, "parse_time": 0.03,
+                    "bytes": 1830, "commands": [<command records>], "error": None})
+
+'start' is in nanoseconds since the epoch, durations are in seconds. The time
+to first byte is measured up to the first data read back, usually the echo
+of the command, so it approximates the network round trip while the rest of
+the wall time is the device producing and sending its output. The parse time
+of a getter is its wall time not spent waiting for commands. Commands read
+with _iter_command_chunks are 'streamed': their first byte is output, not
+the echo.
+
+Nothing is measured while no hook is registered.
+"""
+import functools
+import inspect
+import logging
+import time
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+logger = logging.getLogger("peering.manager.peering")
+
+
+class Probe(object):
+    """Measurement of one command, fed with the data read from the channel."""
+
+    def __init__(self, getter, command):
+        self.started = time.perf_counter()
+        self.record = {
+            "getter": getter,
+            "command": command,
+            "start": time.time_ns(),
+            "wall_time": None,
+            "ttfb": None,
+            "bytes": 0,
+            "streamed": False,
+            "error": None,
+        }
+
+    def received(self, data):
+        if data:
+            if self.record["ttfb"] is None:
+                self.record["ttfb"] = time.perf_counter() - self.started
+            self.record["bytes"] += len(data)
+
+
+class Instrumentation(object):
+    """Dispatch command and getter records to the registered hooks."""
+
+    def __init__(self, hooks=None):
+        self.hooks = list(hooks or [])
+        self._getter = None
+
+    def start(self, command):
+        """Return a Probe for 'command', or None when nobody listens."""
+        if not self.hooks:
+            return None
+        return Probe(self._getter["getter"] if self._getter else None, command)
+
+    def finish(self, probe, error=None):
+        if probe is None:
+            return
+        record = probe.record
+        record["wall_time"] = time.perf_counter() - probe.started
+        if error is not None:
+            record["error"] = repr(error)
+
+        if self._getter is not None:
+            self._getter["commands"].append(record)
+            self._getter["command_time"] += record["wall_time"]
+            self._getter["bytes"] += record["bytes"]
+        self.emit("command", record)
+
+    def call(self, name, method, *args, **kwargs):
+        """Run a getter, timing it unless it is nested in another getter."""
+        if not self.hooks or self._getter is not None:
+            return method(*args, **kwargs)
+
+        record = {
+            "getter": name,
+            "start": time.time_ns(),
+            "wall_time": None,
+            "command_time": 0.0,
+            "parse_time": None,
+            "bytes": 0,
+            "commands": [],
+            "error": None,
+        }
+        self._getter = record
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception as e:
+            record["error"] = repr(e)
+            raise
+        finally:
+            self._getter = None
+            record["wall_time"] = time.perf_counter() - started
+            record["parse_time"] = max(0.0, record["wall_time"] - record["command_time"])
+            self.emit("getter", record)
+
+    def emit(self, event, record):
+        for hook in self.hooks:
+            try:
+                hook(event, record)
+            except Exception:
+                # a broken hook must not break the getter it observes
+                logger.exception(f"Instrumentation hook {hook!r} failed")
+
+
+def instrumented(method):
+    """Time every call of a driver method through its Instrumentation."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self.instrumentation.call(method.__name__, method, self, *args, **kwargs)
+
+    # napalm compares driver signatures with getfullargspec, which does not
+    # follow __wrapped__
+    wrapper.__signature__ = inspect.signature(method)
+    return wrapper
+
+
+def log_hook(event, record):
+    """Hook logging records, with the record attached as 'napalm_vyos'."""
+    if event == "getter":
+        logger.debug(
+            f"{record['getter']}: {record['wall_time']:.3f}s, "
+            f"{record['command_time']:.3f}s in {len(record['commands'])} commands, "
+            f"{record['parse_time']:.3f}s parsing, {record['bytes']} bytes",
+            extra={"napalm_vyos": record},
+        )
+    elif record["getter"] is None:
+        logger.debug(
+            f"{record['command']}: {record['wall_time']:.3f}s, {record['bytes']} bytes",
+            extra={"napalm_vyos": record},
+        )
+
+
+class SpanEmitter(object):
+    """
+    Hook emitting records as OpenTelemetry spans, commands as children of
+    the getter running them. Any tracer with the OpenTelemetry start_span
+    signature can be given; by default the global tracer provider is used.
+    """
+
+    def __init__(self, tracer=None, hostname=None):
+        if tracer is None:
+            if trace is None:
+                raise ImportError("SpanEmitter requires the opentelemetry-api package")
+            tracer = trace.get_tracer("napalm_vyos")
+        self.tracer = tracer
+        self.hostname = hostname
+
+    def __call__(self, event, record):
+        if event == "getter":
+            span = self._span(record["getter"], record, None)
+            context = trace.set_span_in_context(span) if trace is not None else None
+            for command in record["commands"]:
+                self._span(command["command"], command, context).end(
+                    end_time=self._end(command)
+                )
+            span.end(end_time=self._end(record))
+        elif record["getter"] is None:
+            self._span(record["command"], record, None).end(end_time=self._end(record))
+
+    def _span(self, name, record, context):
+        attributes = {
+            f"napalm_vyos.{key}": value
+            for key, value in record.items()
+            if isinstance(value, (str, int, float)) and key != "start"
+        }
+        if self.hostname:
+            attributes["net.peer.name"] = self.hostname
+        return self.tracer.start_span(
+            name, context=context, start_time=record["start"], attributes=attributes
+        )
+
+    @staticmethod
+    def _end(record):
+        return record["start"] + int(record["wall_time"] * 1e9)
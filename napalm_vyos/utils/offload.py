@@ -0,0 +1,123 @@
+# Copyright 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Parse stages of the getters, run on a pluggable executor.
+
+Getters read their outputs first, then hand them to run() or run_many()
+with the function parsing them. Without an executor the function runs in
+the calling thread. Otherwise it is submitted to the executor, any
+concurrent.futures one, and the calling thread waits for the result
+without holding the GIL. Drivers polled from many threads thus parse in
+parallel on one process pool shared by all of them:
+
+    >>> pool = ProcessPoolExecutor()
+    >>> drivers = {host: VyOSDriver(host, user, password,
+    ...                             optional_args={"parse_executor": pool})
+    ...            for host in hosts}
+
+Text arguments of SHARED_MEMORY_THRESHOLD characters or more bound for a
+ProcessPoolExecutor are written once to a shared memory segment and only
+its name goes through the pool's pipe, instead of the whole output being
+pickled, written to the pipe in pieces and unpickled. The worker decodes
+the text straight from the mapping. Results come back pickled, they are a
+fraction of the size of the outputs.
+
+The functions must be module level so they can be pickled by reference.
+"""
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import resource_tracker, shared_memory
+
+SHARED_MEMORY_THRESHOLD = 1 << 20
+# Before Python 3.13 every process attaching a segment registers it with its
+# resource tracker. Workers forked before the tracker of the parent started
+# run their own, which would unlink the segments when they exit, so the
+# segments are kept out of the trackers and unlinked here.
+_TRACKED = os.name == "posix" and sys.version_info < (3, 13)
+
+
+class SharedText(object):
+    """Reference to UTF-8 text written to a shared memory segment."""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+    def read(self):
+        segment = _segment(self.name)
+        try:
+            with segment.buf[:self.size] as view:
+                return str(view, "utf-8")
+        finally:
+            segment.close()
+
+
+def run(executor, function, *args):
+    """Return function(*args), run by 'executor' when there is one."""
+    return run_many(executor, function, [args])[0]
+
+
+def run_many(executor, function, calls):
+    """
+    Return [function(*args) for args in calls], all submitted to 'executor'
+    before waiting for the first, so they run in parallel on a pool.
+    """
+    if executor is None:
+        return [function(*args) for args in calls]
+    if not isinstance(executor, ProcessPoolExecutor):
+        futures = [executor.submit(function, *args) for args in calls]
+        return [future.result() for future in futures]
+
+    segments = []
+    futures = []
+    try:
+        for args in calls:
+            shared = [_share(argument, segments) for argument in args]
+            futures.append(executor.submit(_call, function, shared))
+        return [future.result() for future in futures]
+    finally:
+        # the segments may only go once no worker can still be reading them
+        wait(futures)
+        for segment in segments:
+            segment.close()
+            if _TRACKED:
+                # unlink() unregisters it
+                resource_tracker.register(segment._name, "shared_memory")
+            segment.unlink()
+
+
+def _share(argument, segments):
+    if not isinstance(argument, str) or len(argument) < SHARED_MEMORY_THRESHOLD:
+        return argument
+    data = argument.encode()
+    segment = _segment(None, len(data))
+    segments.append(segment)
+    segment.buf[:len(data)] = data
+    return SharedText(segment.name, len(data))
+
+
+def _segment(name, size=0):
+    """Create a segment of 'size' bytes, or attach to 'name', out of the resource trackers."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, create=name is None, size=size, track=False)
+    segment = shared_memory.SharedMemory(name, create=name is None, size=size)
+    if _TRACKED:
+        resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def _call(function, args):
+    return function(*(arg.read() if isinstance(arg, SharedText) else arg for arg in args))
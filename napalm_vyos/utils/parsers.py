@@ -0,0 +1,54 @@
+# Copyright 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Text parsers taking most of the time of their getters, module level so
+they can be handed to offload.run and a process pool.
+"""
+import functools
+import io
+import os
+import re
+
+import textfsm
+
+_TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+_INTERFACE = re.compile(r"(\S+): <.*")
+_COUNTERS = re.compile(r"(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)")
+
+
+def textfsm_records(template, output):
+    """Return the header and the rows of 'output' parsed with a template of the driver."""
+    fsm = textfsm.TextFSM(io.StringIO(_template(template)))
+    return fsm.header, fsm.ParseText(output)
+
+
+@functools.lru_cache(maxsize=None)
+def _template(name):
+    with open(os.path.join(_TEMPLATES, name)) as template_file:
+        return template_file.read()
+
+
+def interface_counter_records(output):
+    """
+    Return (interface, rx, tx) for each interface of 'show interfaces
+    detail', rx and tx being the six counters under the RX: and TX: lines.
+    """
+    interfaces = _INTERFACE.findall(output)
+    count = _COUNTERS.findall(output)
+
+    return [
+        (interface, tuple(map(int, count[2 * j])), tuple(map(int, count[2 * j + 1])))
+        for j, interface in enumerate(interfaces[:len(count) // 2])
+    ]
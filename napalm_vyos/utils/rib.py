@@ -0,0 +1,100 @@
+# Copyright 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""Local longest-prefix-match index over a routing table."""
+import bisect
+import socket
+import time
+
+
+class RouteIndex(object):
+    """
+    Longest-prefix-match index over the prefixes of one address family.
+
+    Prefixes are kept in one hash table per prefix length, so a lookup is at
+    most one masked dictionary probe per distinct length present in the
+    table, longest first. A list sorted by network address answers
+    more-specific queries: every subnet of a prefix lies in the contiguous
+    range between its network and broadcast addresses.
+    """
+
+    def __init__(self, routes, version):
+        """
+        :param routes: dictionary keyed by prefix ("10.0.0.0/24"), as in the
+            output of FRR 'show ip route json'.
+        :param version: 4 or 6.
+        """
+        self.routes = routes
+        self.created = time.monotonic()
+        self._max_prefixlen = 32 if version == 4 else 128
+        self._family = socket.AF_INET if version == 4 else socket.AF_INET6
+        self._by_length = {}
+        self._sorted = []
+
+        for prefix in routes:
+            address, prefixlen = self._parse(prefix)
+            address &= self._mask(prefixlen)
+            self._by_length.setdefault(prefixlen, {})[address] = prefix
+            self._sorted.append((address, prefixlen, prefix))
+
+        self._lengths = sorted(self._by_length, reverse=True)
+        self._sorted.sort()
+
+    def __len__(self):
+        return len(self.routes)
+
+    def age(self):
+        """Seconds since the index was built."""
+        return time.monotonic() - self.created
+
+    def _parse(self, destination):
+        # The ipaddress module is an order of magnitude slower than
+        # inet_pton, which shows when indexing a full table.
+        address, _, prefixlen = destination.partition("/")
+        address = int.from_bytes(socket.inet_pton(self._family, address), "big")
+        return address, int(prefixlen) if prefixlen else self._max_prefixlen
+
+    def _mask(self, prefixlen):
+        return ((1 << prefixlen) - 1) << (self._max_prefixlen - prefixlen)
+
+    def lookup(self, destination):
+        """
+        Return the longest prefix covering 'destination', an address or a
+        prefix, or None.
+        """
+        address, length = self._parse(destination)
+
+        for prefixlen in self._lengths:
+            if prefixlen > length:
+                continue
+            prefix = self._by_length[prefixlen].get(address & self._mask(prefixlen))
+            if prefix is not None:
+                return prefix
+
+        return None
+
+    def longer(self, destination):
+        """Return 'destination' and every more specific prefix in the table."""
+        address, length = self._parse(destination)
+        first = address & self._mask(length)
+        last = first | (self._mask(length) ^ self._mask(self._max_prefixlen))
+
+        prefixes = []
+        index = bisect.bisect_left(self._sorted, (first, length))
+        while index < len(self._sorted) and self._sorted[index][0] <= last:
+            if self._sorted[index][1] >= length:
+                prefixes.append(self._sorted[index][2])
+            index += 1
+
+        return prefixes
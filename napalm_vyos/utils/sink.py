@@ -0,0 +1,61 @@
+# Copyright 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""Writers streaming text to files or file-like objects, compressed on the fly."""
+import contextlib
+import gzip
+import io
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIONS = ("gzip", "zstd")
+SUFFIXES = {".gz": "gzip", ".gzip": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+
+
+@contextlib.contextmanager
+def open_sink(target, compression=None):
+    """
+    Yield a function writing text to 'target', a path or a file-like object.
+
+    :param compression: "gzip", "zstd" or None. For paths, None picks it from
+        the suffix (.gz, .zst). File-like objects given are not closed, and
+        must be binary when compressing.
+    """
+    is_path = isinstance(target, (str, os.PathLike))
+    if compression is None and is_path:
+        compression = SUFFIXES.get(os.path.splitext(os.fspath(target))[1])
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression {compression!r}, use one of {COMPRESSIONS}")
+    if compression == "zstd" and zstandard is None:
+        raise ImportError("zstd compression requires the zstandard package")
+
+    with contextlib.ExitStack() as stack:
+        stream = stack.enter_context(open(target, "wb")) if is_path else target
+        if compression is None and isinstance(stream, io.TextIOBase):
+            yield stream.write
+            return
+        if isinstance(stream, io.TextIOBase):
+            raise TypeError(f"{compression} compression needs a binary file, not {stream!r}")
+
+        if compression == "gzip":
+            stream = stack.enter_context(gzip.GzipFile(fileobj=stream, mode="wb"))
+        elif compression == "zstd":
+            stream = stack.enter_context(
+                zstandard.ZstdCompressor().stream_writer(stream, closefd=False)
+            )
+        yield lambda text: stream.write(text.encode())
@@ -19,10 +19,17 @@ Read napalm.readthedocs.org for more information.
 
 
 """
+import codecs
+import collections
+import io
+import json
 import os
 import re
+import shlex
+import socket
 import tempfile
-import textfsm
+import time
+from concurrent.futures import ProcessPoolExecutor
 import vyattaconfparser
 
 import logging
@@ -36,6 +43,8 @@ cache.clear()
 import napalm.base.constants as C
 from napalm.base.base import NetworkDriver
 from napalm.base.exceptions import (
+    CommandErrorException,
+    CommandTimeoutException,
     CommitError,
     ConnectionException,
     MergeConfigException,
@@ -43,6 +52,12 @@ from napalm.base.exceptions import (
 )
 from netmiko import ConnectHandler, SCPConn, __version__ as netmiko_version
 
+from napalm_vyos.utils import bgp, firewall, iproute, offload, parsers
+from napalm_vyos.utils.capture import Recorder
+from napalm_vyos.utils.instrument import Instrumentation, instrumented
+from napalm_vyos.utils.rib import RouteIndex
+from napalm_vyos.utils.sink import open_sink
+
 
 class VyOSDriver(NetworkDriver):
 
@@ -54,17 +69,79 @@ class VyOSDriver(NetworkDriver):
     _DEST_FILENAME = "/var/tmp/candidate_running.conf"
     _BACKUP_FILENAME = "/var/tmp/backup_running.conf"
     _BOOT_FILENAME = "/config/config.boot"
+    _ACTIVE_CONFIG_COMMAND = "cli-shell-api showCfg --show-active-only"
+    # address families of FRR JSON output, as NAPALM names them
+    _BGP_FAMILIES = {"ipv4Unicast": "ipv4", "ipv6Unicast": "ipv6"}
+    # ntpq association types for the chronyc source modes: server, peer, local clock
+    _CHRONY_MODES = {"^": "u", "=": "s", "#": "l"}
+    # "show version" followed by a marker line for each optional tool that works
+    _CAPABILITIES_COMMAND = (
+        "show version; echo \"@frr $(vtysh -c 'show version' 2>/dev/null | head -n 1)\"; "
+        "ip -j link show lo >/dev/null 2>&1 && echo @ip-json; "
+        "lldpcli -f json show configuration >/dev/null 2>&1 && echo @lldp-json; "
+        "command -v chronyc >/dev/null && echo @chrony; "
+        "sudo -n nft -j list tables >/dev/null 2>&1 && echo @nft-json"
+    )
+    _FIREWALL_FIELDS = (
+        "family", "table", "chain", "rule", "packets", "bytes",
+        "packets_delta", "bytes_delta", "packets_rate", "bytes_rate",
+    )
+    _ENVIRONMENT_COMMAND = (
+        "cat /proc/stat /proc/meminfo; grep -H . "
+        "/sys/class/thermal/thermal_zone*/{type,temp,trip_point_*} "
+        "/sys/class/hwmon/hwmon*/{name,temp*,fan*} 2>/dev/null"
+    )
+    _ARCHIVE_FILENAME = "/config/archive/config.boot.{}.gz"
+    _ROLLBACK_FILENAME = "/var/tmp/rollback_running.conf"
+    _COMMIT_SECONDS = 120
+    _COMMIT_ERRORS = ("Commit failed", "Failed to generate committed config")
+    _STREAM_BEGIN = "__napalm_vyos_begin__"
+    _STREAM_END = "__napalm_vyos_end__"
+    _TRACEROUTE_PROBES = 3
+    # prompt round trip netmiko's default delays are sized for
+    _REFERENCE_RTT = 0.1
+    _DELAY_FACTOR_RANGE = (0.1, 10)
+    _RTT_SMOOTHING = 0.2
+    # seconds between two prompt probes after the one of open()
+    _RTT_PROBE_INTERVAL = 300
+    _LLDP_CAPABILITIES = {
+        "bridge": "bridge",
+        "docsis": "docsis-cable-device",
+        "other": "other",
+        "repeater": "repeater",
+        "router": "router",
+        "station": "station",
+        "tel": "telephone",
+        "wlan": "wlan-access-point",
+    }
 
     def __init__(self, hostname, username, password, timeout=60, optional_args=None):
         self.hostname = hostname
         self.username = username
         self.password = password
         self.timeout = timeout
+        self.port = 22
         self.device = None
         self._scp_client = None
         self._new_config = None
         self._old_config = None
         self._ssh_usekeys = False
+        self._pending_commit = False
+        self._route_cache = {}
+        self.route_cache_ttl = 0
+        self.instrumentation = Instrumentation()
+        self.global_delay_factor = 1
+        self.auto_tune = False
+        self.rtt = None
+        self._rtt_probed = None
+        self.delay_factor = 1
+        self.recorder = None
+        self._cpu_times = {}
+        self._firewall_counters = {}
+        self._firewall_polled = None
+        self.parse_executor = None
+        self.capabilities_ttl = 0
+        self._capabilities = None
 
         # Netmiko possible arguments
         netmiko_argument_map = {
@@ -84,6 +161,7 @@ class VyOSDriver(NetworkDriver):
         fields = netmiko_version.split(".")
         fields = [int(x) for x in fields]
         maj_ver, min_ver, bug_fix = fields
+        self._netmiko_major = maj_ver
         if maj_ver >= 2 or maj_ver == 1 and min_ver >= 1:
             netmiko_argument_map["allow_agent"] = False
         # Build dict of any optional Netmiko args
@@ -96,6 +174,17 @@ class VyOSDriver(NetworkDriver):
                     pass
             self.global_delay_factor = optional_args.get("global_delay_factor", 1)
             self.port = optional_args.get("port", 22)
+            self.route_cache_ttl = optional_args.get("route_cache_ttl", 0)
+            self.capabilities_ttl = optional_args.get("capabilities_ttl", 0)
+            self.instrumentation.hooks.extend(optional_args.get("instrumentation_hooks", []))
+            self.auto_tune = optional_args.get("auto_tune", False)
+            self.parse_executor = optional_args.get("parse_executor")
+            if optional_args.get("record"):
+                self.recorder = Recorder(optional_args["record"])
+
+        self.delay_factor = self.global_delay_factor
+        if self.auto_tune:
+            self.instrumentation.hooks.insert(0, self._observe_timing)
 
     def open(self):
         self.device = ConnectHandler(
@@ -111,13 +200,25 @@ class VyOSDriver(NetworkDriver):
         except:
             raise ConnectionException("Failed to open connection ")
 
+        self._capabilities = None
+        if self.auto_tune:
+            self._tune_timing(self._measure_rtt())
+        if self.recorder is not None:
+            self.recorder.metadata.update(
+                hostname=self.hostname, base_prompt=self.device.base_prompt
+            )
+
     def close(self):
         self.device.disconnect()
+        if self.recorder is not None:
+            self.recorder.metadata["rtt"] = self.rtt
+            self.recorder.save()
 
     def is_alive(self):
         """Returns a flag with the state of the SSH connection."""
         return {"is_alive": self.device.remote_conn.transport.is_active()}
 
+    @instrumented
     def load_replace_candidate(self, filename=None, config=None):
         """
         Only configuration files are supported with load_replace_candidate.
@@ -139,10 +240,10 @@ class VyOSDriver(NetworkDriver):
         if os.path.exists(cfg_filename) is not True:
             raise ReplaceConfigException("config file is not found")
         self._scp_client.scp_transfer_file(cfg_filename, self._DEST_FILENAME)
-        self.device.send_command(
+        self._send_command(
             f"cp {self._BOOT_FILENAME} {self._BACKUP_FILENAME}"
         )
-        output_loadcmd = self.device.send_config_set(
+        output_loadcmd = self._send_config_set(
             [f"load {self._DEST_FILENAME}"]
         )
         match_loaded = re.findall("Load complete.", output_loadcmd)
@@ -157,6 +258,7 @@ class VyOSDriver(NetworkDriver):
         if not match_loaded and not match_notchanged:
             raise ReplaceConfigException(f"Failed replace config: {output_loadcmd}")
 
+    @instrumented
     def load_merge_candidate(self, filename=None, config=None):
         """
         Only configuration in set-format is supported with load_merge_candidate.
@@ -176,23 +278,25 @@ class VyOSDriver(NetworkDriver):
         if os.path.exists(cfg_filename) is not True:
             raise MergeConfigException("config file is not found")
         with open(cfg_filename) as f:
-            self.device.send_command(
+            self._send_command(
                 f"cp {self._BOOT_FILENAME} {self._BACKUP_FILENAME}"
             )
             self._new_config = f.read()
             cfg = [x for x in self._new_config.split("\n") if x]
-            output_loadcmd = self.device.send_config_set(cfg)
+            output_loadcmd = self._send_config_set(cfg)
             match_setfailed = re.findall("Delete failed", output_loadcmd)
             match_delfailed = re.findall("Set failed", output_loadcmd)
 
             if match_setfailed or match_delfailed:
                 raise MergeConfigException(f"Failed merge config: {output_loadcmd}")
 
+    @instrumented
     def discard_config(self):
         self.device.exit_config_mode()
 
+    @instrumented
     def compare_config(self):
-        output_compare = self.device.send_config_set(["compare"])
+        output_compare = self._send_config_set(["compare"])
         if match := re.findall(
             "No changes between working and active configurations", output_compare
         ):
@@ -200,65 +304,159 @@ class VyOSDriver(NetworkDriver):
         else:
             return "".join(output_compare.splitlines(True)[1:-1])
 
-    def commit_config(self, message=""):
-        if message:
-            raise NotImplementedError(
-                "Commit message not implemented for this platform"
-            )
+    @instrumented
+    def commit_config(self, message="", revert_in=None):
+        """
+        Commit, save and leave configuration mode in a single round trip.
 
-        try:
-            self.device.commit()
-        except ValueError as e:
-            raise CommitError("Failed to commit config on the device") from e
+        With 'revert_in' (seconds, rounded up to whole minutes) the change is
+        applied with 'commit-confirm' and only saved by confirm_commit(). If
+        it is not confirmed in time, the device reverts it by itself, which
+        means a reboot on images older than VyOS 1.4. Either way the session
+        is back in op mode when this returns.
+        """
+        if self._pending_commit:
+            raise CommitError("A commit-confirm is pending, confirm or roll it back first")
+
+        if revert_in is not None:
+            minutes = max(1, -(-revert_in // self._MINUTE_SECONDS))
+            output = self._run_config_pipeline(f"commit-confirm {minutes}", answer="y")
+            # no change means no commit to confirm either
+            self._pending_commit = "No configuration changes to commit" not in output
+        else:
+            commit = "commit"
+            if message:
+                commit += f" comment {shlex.quote(message)}"
+            self._run_config_pipeline(commit, "save", "exit")
 
-        self.device.send_config_set(["save"])
-        self.device.exit_config_mode()
+        self._route_cache.clear()
 
-    def rollback(self):
-        """Rollback configuration to filename or to self.rollback_cfg file."""
-        filename = None
-        if filename is None:
-            filename = self._BACKUP_FILENAME
+    @instrumented
+    def confirm_commit(self):
+        if not self._pending_commit:
+            raise CommitError("No pending commit-confirm to confirm")
 
-            output_loadcmd = self.device.send_config_set([f"load {filename}"])
-            if match := re.findall("Load complete.", output_loadcmd):
-                self.device.send_config_set(["commit", "save"])
-            else:
+        self._run_config_pipeline("confirm", "save", "exit")
+        self._pending_commit = False
+
+    def has_pending_commit(self):
+        return self._pending_commit
+
+    @instrumented
+    def rollback(self, revision=None):
+        """
+        Rollback configuration to the backup taken by the last load, or to
+        'revision' of the on-box commit archive (0 being the running config,
+        1 the one before the last commit), which requires
+        'system config-management commit-revisions' to be configured.
+
+        A pending commit-confirm is confirmed once the previous configuration
+        is committed, so the device does not revert a second time. The session
+        is back in op mode afterwards, also when the load or commit failed.
+        """
+        filename = self._BACKUP_FILENAME
+        if revision is not None:
+            filename = self._ROLLBACK_FILENAME
+            # silent unless the revision is missing from the archive
+            output = self._send_command(
+                f"zcat {self._ARCHIVE_FILENAME.format(int(revision))} > {filename}"
+            )
+            if output.strip():
                 raise ReplaceConfigException(
-                    f"Failed rollback config: {output_loadcmd}"
+                    f"Failed rollback config: revision {revision} not found: {output}"
                 )
 
-    def get_environment(self):
-        """
-        'vmstat' output:
-        procs -----------memory---------- ---swap-- -----io---- -system-- ----cpu----
-        r  b   swpd   free   buff  cache   si   so    bi    bo   in   cs us sy id wa
-        0  0      0  61404 139624 139360    0    0     0     0    9   14  0  0 100  0
-        """
-        output_cpu_list = []
-        output_cpu = self.device.send_command("vmstat")
-        output_cpu = str(output_cpu)
-        output_cpu_list = output_cpu.split("\n")
-        if len(output_cpu_list[-1]) > 0:
-            output_cpu_list = output_cpu_list[-1]
-        else:
-            output_cpu_list = output_cpu_list[-2]
-        output_cpu_idle = output_cpu_list.split()[-2]
-        cpu = 100 - int(output_cpu_idle)
+        commands = [f"load {filename}", "commit"]
+        if self._pending_commit:
+            commands.append("confirm")
+        commands += ["save", "exit"]
 
+        loaded = False
+        try:
+            output_loadcmd = self._run_config_pipeline(*commands)
+            loaded = "Load complete" in output_loadcmd
+        finally:
+            # the chain stops in configuration mode at a failed load or commit
+            if not loaded:
+                self.device.exit_config_mode()
+        if not loaded:
+            raise ReplaceConfigException(f"Failed rollback config: {output_loadcmd}")
+
+        self._pending_commit = False
+        self._route_cache.clear()
+
+    def _run_config_pipeline(self, *commands, answer=None):
         """
-        'free' output:
-                     total       used       free     shared    buffers     cached
-        Mem:        508156     446784      61372          0     139624     139360
-        -/+ buffers/cache:     167800     340356
-        Swap:            0          0          0
+        Run 'commands' in configuration mode as one command line chained with
+        '&&', so a whole commit sequence costs a single round trip and stops
+        at the first failing step. 'answer' replies to a confirmation
+        question asked by the last command, after which configuration mode is
+        left: the change is committed, leaving does not need a save.
         """
-        output_ram = self.device.send_command("free").split("\n")[1]
-        available_ram, used_ram = output_ram.split()[1:3]
+        self.device.config_mode()
+
+        prompt = rf"{re.escape(self.device.base_prompt)}\S*\s?[\$#]\s*$"
+        expect_string = rf"(\[confirm\]|\[Y/n\]|{prompt})" if answer else prompt
+        output = self._send_command(
+            " && ".join(commands),
+            expect_string=expect_string,
+            strip_prompt=False,
+            strip_command=False,
+            **self._command_timeout_args(self._COMMIT_SECONDS),
+        )
+        answered = answer and re.search(r"\[confirm\]|\[Y/n\]", output)
+        if answered:
+            output += self._send_command(
+                answer,
+                expect_string=prompt,
+                strip_prompt=False,
+                strip_command=False,
+                **self._command_timeout_args(self._COMMIT_SECONDS),
+            )
+            # read the rest of the commit up to the prompt, so the next
+            # command cannot take it for its own
+            if not re.search(prompt, output):
+                stop_at = time.monotonic() + self._command_deadline(self._COMMIT_SECONDS)
+                output = self._read_until_base_prompt(output, stop_at)
+
+        if any(error in output for error in self._COMMIT_ERRORS):
+            raise CommitError(f"Failed to commit config on the device: {output}")
+        if answered:
+            output += self._send_command(
+                "exit",
+                expect_string=rf"{re.escape(self.device.base_prompt)}\S*\s?\$\s*$",
+                strip_prompt=False,
+                strip_command=False,
+            )
+        if "No configuration changes to commit" in output:
+            # nothing was saved or exited after the no-op commit
+            self.device.exit_config_mode()
+
+        return output
+
+    @instrumented
+    def get_environment(self):
+        cpus, total_ram, used_ram, sensors = self._environment_records()
+
+        temperature = {
+            name: {
+                "temperature": sensor["temperature"],
+                "is_alert": sensor["is_alert"],
+                "is_critical": sensor["is_critical"],
+            }
+            for name, sensor in sensors.items()
+            if "temperature" in sensor
+        }
+        fans = {
+            name: {"status": sensor["rpm"] > 0}
+            for name, sensor in sensors.items()
+            if "rpm" in sensor
+        }
 
         return {
-            "fans": {"invalid": {"status": False}},
-            "temperature": {
+            "fans": fans or {"invalid": {"status": False}},
+            "temperature": temperature
+            or {
                 "invalid": {
                     "temperature": 0.0,
                     "is_alert": False,
@@ -266,15 +464,125 @@ class VyOSDriver(NetworkDriver):
                 }
             },
             "power": {"invalid": {"status": True, "capacity": 0.0, "output": 0.0}},
-            "cpu": {
-                "0": {"%usage": float(cpu)},
-            },
+            "cpu": {cpu: {"%usage": usage} for cpu, usage in cpus.items()},
             "memory": {
-                "available_ram": int(available_ram),
-                "used_ram": int(used_ram),
+                "available_ram": total_ram,
+                "used_ram": used_ram,
             },
         }
 
+    def _environment_records(self):
+        """
+        Return the usage in percent of each CPU core, the total and used
+        memory in KiB and the sensors found, read with a single command.
+
+        The usage is computed from the /proc/stat counters since the previous
+        call, or since boot on the first one. Used memory is what is not
+        MemAvailable. Sensors are thermal zones and hwmon temperatures and
+        fans:
+
+        {"coretemp Core 0": {"temperature": 45.0, "is_alert": False, "is_critical": False},
+         "nct6775 fan1": {"rpm": 1200}}
+        """
+        output = self._send_command(self._ENVIRONMENT_COMMAND)
+
+        times = {}
+        memory = {}
+        files = {}
+        for line in output.splitlines():
+            if line.startswith("/sys/"):
+                path, _, value = line.partition(":")
+                directory, _, name = path.rpartition("/")
+                files.setdefault(directory, {})[name] = value.strip()
+            elif line.startswith("cpu") and line[3:4].isdigit():
+                fields = line.split()
+                # user nice system idle iowait irq softirq steal, guest is in user
+                counters = [int(value) for value in fields[1:9]]
+                times[fields[0][3:]] = (sum(counters), sum(counters[3:5]))
+            elif line.endswith(" kB"):
+                key, _, value = line.partition(":")
+                memory[key] = int(value.split()[0])
+
+        cpus = {}
+        for cpu, (total, idle) in times.items():
+            previous_total, previous_idle = self._cpu_times.get(cpu, (0, 0))
+            if total <= previous_total:
+                # no tick since the last call, or the counters were reset
+                previous_total = previous_idle = 0
+            elapsed = total - previous_total
+            busy = elapsed - (idle - previous_idle)
+            cpus[cpu] = round(100.0 * busy / elapsed, 1) if elapsed else 0.0
+        self._cpu_times = times
+
+        total_ram = memory.get("MemTotal", 0)
+        available = memory.get("MemAvailable")
+        if available is None:
+            # kernels older than 3.14
+            available = sum(memory.get(key, 0) for key in ("MemFree", "Buffers", "Cached"))
+
+        return cpus, total_ram, total_ram - available, self._sensors(files)
+
+    @staticmethod
+    def _sensors(files):
+        """Build the sensors from the contents of their sysfs files by directory."""
+        sensors = {}
+
+        def add(name, device, sensor):
+            if name in sensors:
+                name = f"{name} ({device})"
+            sensors[name] = sensor
+
+        def temperature(celsius, alert, critical):
+            return {
+                "temperature": celsius,
+                "is_alert": alert is not None and celsius >= alert,
+                "is_critical": critical is not None and celsius >= critical,
+            }
+
+        def millidegrees(value):
+            return int(value) / 1000.0 if value and value.lstrip("-").isdigit() else None
+
+        zones, chips = {}, {}
+        for directory, values in sorted(files.items()):
+            device = directory.rsplit("/", 1)[-1]
+            (zones if device.startswith("thermal_zone") else chips)[device] = values
+
+        for device, values in zones.items():
+            celsius = millidegrees(values.get("temp"))
+            if celsius is None:
+                continue
+            trips = {}
+            for name, value in values.items():
+                if name.startswith("trip_point_") and name.endswith("_type"):
+                    trip = millidegrees(values.get(name[:-len("_type")] + "_temp"))
+                    if trip is not None:
+                        trips[value] = min(trip, trips.get(value, trip))
+            alert = min((trips[t] for t in ("passive", "hot") if t in trips), default=None)
+            add(values.get("type", device), device,
+                temperature(celsius, alert, trips.get("critical")))
+
+        # thermal zones are also registered as hwmon devices named after their type
+        types = {values.get("type") for values in zones.values()}
+        for device, values in chips.items():
+            chip = values.get("name", device)
+            if chip in types:
+                continue
+            for name, value in sorted(values.items()):
+                sensor, _, kind = name.partition("_")
+                if kind != "input":
+                    continue
+                label = values.get(f"{sensor}_label", sensor)
+                if sensor.startswith("temp") and millidegrees(value) is not None:
+                    add(f"{chip} {label}", device, temperature(
+                        millidegrees(value),
+                        millidegrees(values.get(f"{sensor}_max")),
+                        millidegrees(values.get(f"{sensor}_crit")),
+                    ))
+                elif sensor.startswith("fan") and value.isdigit():
+                    add(f"{chip} {label}", device, {"rpm": int(value)})
+        return sensors
+
+    @instrumented
     def get_interfaces(self):
         """
         "show interfaces" output example:
@@ -288,7 +596,7 @@ class VyOSDriver(NetworkDriver):
         lo               127.0.0.1/8                       u/u
                          ::1/128
         """
-        output_iface = self.device.send_command("show interfaces")
+        output_iface = self._send_command("show interfaces")
 
         # Collect all interfaces' name and status
         match = re.findall(r"(\S+)\s+[:\-\d/\.]+\s+([uAD])/([uAD])", output_iface)
@@ -300,10 +608,10 @@ class VyOSDriver(NetworkDriver):
             for iface_name, state, link in match
         }
 
-        output_conf = self.device.send_command("show configuration")
+        output_conf = self._send_command("show configuration")
 
         # Convert the configuration to dictionary
-        config = vyattaconfparser.parse_conf(output_conf)
+        config = self._parse(vyattaconfparser.parse_conf, output_conf)
 
         iface_dict = {}
 
@@ -334,6 +642,7 @@ class VyOSDriver(NetworkDriver):
 
         return iface_dict
 
+    @instrumented
     def get_arp_table(self, vrf=""):
         # 'age' is not implemented yet
 
@@ -348,11 +657,9 @@ class VyOSDriver(NetworkDriver):
         """
 
         if vrf:
-            raise NotImplementedError(
-                "VRF support has not been added for this getter on this platform."
-            )
+            return self._get_vrf_arp_table(vrf)
 
-        output = self.device.send_command("show arp")
+        output = self._send_command("show arp")
         output = output.split("\n")
 
         # Skip the header line
@@ -377,6 +684,206 @@ class VyOSDriver(NetworkDriver):
 
         return arp_table
 
+    def _get_vrf_arp_table(self, vrf):
+        """
+        ARP entries of the interfaces of 'vrf', "default" for the interfaces
+        in no VRF. The neighbors of all VRFs and the VRF of each link are
+        read with one command and split here.
+        """
+        if not self.capabilities["ip_json"]:
+            raise NotImplementedError("VRFs need iproute2 JSON output, VyOS 1.3 or later.")
+
+        neighbors, links = iproute.json_documents(
+            self._send_command("ip -j -s -4 neigh show; ip -j -d link show")
+        )
+        members = iproute.vrf_members(links)
+        return [
+            {
+                "interface": entry.get("dev", ""),
+                "mac": entry.get("lladdr") or "00:00:00:00:00:00",
+                "ip": entry["dst"],
+                "age": float(entry.get("confirmed", 0)),
+            }
+            for entry in neighbors
+            if members.get(entry.get("dev"), "default") == vrf
+        ]
+
+    @instrumented
+    def get_network_instances(self, name=""):
+        """
+        Return the default instance and every VRF with their interfaces, as
+        found from the kind and master of each link. Route distinguishers
+        belong to the BGP configuration of VRFs and are left empty.
+        """
+        if self.capabilities["ip_json"]:
+            links = json.loads(self._send_command("ip -j -d link show") or "[]")
+            names = [link["ifname"] for link in links]
+            members = iproute.vrf_members(links)
+        else:
+            # images without JSON output predate VRF support
+            output = self._send_command("ip -o link show")
+            names = re.findall(r"^\d+: ([^:@\s]+)", output, re.M)
+            members = {}
+
+        instances = {}
+        for vrf in ["default"] + sorted(set(members.values())):
+            instances[vrf] = {
+                "name": vrf,
+                "type": "DEFAULT_INSTANCE" if vrf == "default" else "L3VRF",
+                "state": {"route_distinguisher": ""},
+                "interfaces": {"interface": {}},
+            }
+        for interface in names:
+            vrf = members.get(interface, "default")
+            if interface != vrf:
+                instances[vrf]["interfaces"]["interface"][interface] = {}
+
+        if name:
+            return {name: instances[name]} if name in instances else {}
+        return instances
+
+    @instrumented
+    def get_mac_address_table(self):
+        """
+        Return the forwarding entries of the bridges, from 'bridge -j -s fdb
+        show' decoded in one pass, or its text output on images without JSON
+        support. The own addresses of ports (flagged 'self' without a master
+        bridge) are left out. 'moves' is not tracked by Linux bridges.
+        """
+        if self.capabilities["ip_json"]:
+            return iproute.json_records(
+                self._send_command("bridge -j -s fdb show"), iproute.fdb_record, iproute.is_bridged
+            )
+        entries = iproute.parse_fdb_text(self._send_command("bridge -s fdb show"))
+        return [iproute.fdb_record(entry) for entry in entries if iproute.is_bridged(entry)]
+
+    def iter_mac_address_table(self):
+        """
+        Yield the entries of get_mac_address_table one at a time, as they
+        are read from the channel, so a large table is never held in memory.
+        """
+        if self.capabilities["ip_json"]:
+            stream = self._iter_command_chunks("bridge -j -s fdb show")
+            entries = iproute.iter_json_array(stream)
+        else:
+            stream = self._iter_command_lines("bridge -s fdb show")
+            entries = (entry for line in stream for entry in iproute.parse_fdb_text(line))
+        try:
+            for entry in entries:
+                if iproute.is_bridged(entry):
+                    yield iproute.fdb_record(entry)
+        finally:
+            # the JSON parser stops at the end of the array
+            self._drain(stream)
+
+    @instrumented
+    def get_ipv6_neighbors_table(self):
+        """
+        Return the IPv6 neighbor cache, from 'ip -j -s -6 neigh show' decoded
+        in one pass, or its text output on images without JSON support.
+        'age' is the time since the neighbor was last confirmed reachable.
+        """
+        if self.capabilities["ip_json"]:
+            return iproute.json_records(
+                self._send_command("ip -j -s -6 neigh show"), iproute.neighbor_record
+            )
+        entries = iproute.parse_neigh_text(self._send_command("ip -s -6 neigh show"))
+        return [iproute.neighbor_record(entry) for entry in entries]
+
+    def iter_ipv6_neighbors(self):
+        """Yield the entries of get_ipv6_neighbors_table one at a time, as they are read."""
+        if self.capabilities["ip_json"]:
+            stream = self._iter_command_chunks("ip -j -s -6 neigh show")
+            entries = iproute.iter_json_array(stream)
+        else:
+            stream = self._iter_command_lines("ip -s -6 neigh show")
+            entries = (entry for line in stream for entry in iproute.parse_neigh_text(line))
+        try:
+            for entry in entries:
+                yield iproute.neighbor_record(entry)
+        finally:
+            self._drain(stream)
+
+    @instrumented
+    def get_firewall_counters(self, columnar=False):
+        """
+        Return the packet and byte counters of every firewall and NAT rule,
+        with their increase since the previous call in this session and the
+        rate of that increase per second:
+
+        [{"family": "ip", "table": "vyos_filter", "chain": "NAME_WAN-IN",
+          "rule": "WAN-IN-10", "packets": 1207, "bytes": 86904,
+          "packets_delta": 12, "bytes_delta": 864,
+          "packets_rate": 0.4, "bytes_rate": 28.8}]
+
+        A rule seen for the first time, or whose counters went back as the
+        ruleset was reloaded, counts everything since it was loaded as its
+        delta. Rates are 0.0 on the first call.
+
+        With 'columnar', one list per field is returned instead of a
+        dictionary per rule, {"family": [...], "table": [...], ...}, which
+        is far smaller for thousands of rules.
+        """
+        rules = self._firewall_rule_records()
+        now = time.monotonic()
+        interval = now - self._firewall_polled if self._firewall_polled is not None else 0.0
+
+        previous = self._firewall_counters
+        counters = {}
+        rows = []
+        for family, table, chain, rule_id, rule, packets, octets in rules:
+            key = (family, table, chain, rule_id)
+            counters[key] = (packets, octets)
+            last_packets, last_octets = previous.get(key, (0, 0))
+            if packets < last_packets or octets < last_octets:
+                last_packets = last_octets = 0
+            packets_delta = packets - last_packets
+            octets_delta = octets - last_octets
+            rows.append((
+                family, table, chain, rule, packets, octets, packets_delta, octets_delta,
+                round(packets_delta / interval, 3) if interval else 0.0,
+                round(octets_delta / interval, 3) if interval else 0.0,
+            ))
+        self._firewall_counters = counters
+        self._firewall_polled = now
+
+        if columnar:
+            columns = list(zip(*rows)) or [()] * len(self._FIREWALL_FIELDS)
+            return {field: list(column) for field, column in zip(self._FIREWALL_FIELDS, columns)}
+        return [dict(zip(self._FIREWALL_FIELDS, row)) for row in rows]
+
+    def _firewall_rule_records(self):
+        """
+        Return the counted rules of the ruleset as firewall.parse_* tuples,
+        read with a single command.
+
+        The firewall and NAT live in nftables from VyOS 1.4 on. Older images
+        keep the firewall in iptables, VyOS 1.3 already having NAT in
+        nftables, so both are read there, and the tables iptables-nft also
+        shows in nftables are only counted once.
+        """
+        version = re.match(r"(\d+)\.(\d+)", self.capabilities["version"])
+        legacy = version is not None and (int(version[1]), int(version[2])) < (1, 4)
+        commands = []
+        if self.capabilities["nft_json"]:
+            commands.append("sudo nft -j list ruleset")
+        if legacy or not commands:
+            commands.append("sudo iptables-save -c; sudo ip6tables-save -c")
+        output = self._send_command("; ".join(commands))
+
+        split = output.find("# Generated by")
+        if split < 0:
+            split = len(output)
+        rules = firewall.parse_nft_ruleset(output[:split])
+        tables = {(rule[0], rule[1]) for rule in rules}
+        rules += [
+            rule
+            for rule in firewall.parse_iptables_save(output[split:])
+            if (rule[0], rule[1]) not in tables
+        ]
+        return rules
+
+    @instrumented
     def get_ntp_stats(self):
         """
         'ntpq -np' output example
@@ -387,7 +894,25 @@ class VyOSDriver(NetworkDriver):
          133.130.120.204 133.243.238.164  2 u   46   64  377    7.717  987996. 1669.77
         """
 
-        output = self.device.send_command("ntpq -np")
+        if self.capabilities["chrony"]:
+            return [
+                {
+                    "remote": source["address"],
+                    "referenceid": "",
+                    "synchronized": source["state"] == "*",
+                    "stratum": source["stratum"],
+                    "type": self._CHRONY_MODES.get(source["mode"], source["mode"]),
+                    "when": source["last_rx"],
+                    "hostpoll": source["poll"],
+                    "reachability": source["reach"],
+                    "delay": 0.0,
+                    "offset": source["offset"],
+                    "jitter": source["error"],
+                }
+                for source in self._chrony_sources()
+            ]
+
+        output = self._send_command("ntpq -np")
         output = output.split("\n")[2:]
         ntp_stats = []
 
@@ -432,8 +957,12 @@ class VyOSDriver(NetworkDriver):
 
         return ntp_stats
 
+    @instrumented
     def get_ntp_peers(self):
-        output = self.device.send_command("ntpq -np")
+        if self.capabilities["chrony"]:
+            return {source["address"]: {} for source in self._chrony_sources()}
+
+        output = self._send_command("ntpq -np")
         output_peers = output.split("\n")[2:]
         ntp_peers = {}
 
@@ -444,8 +973,103 @@ class VyOSDriver(NetworkDriver):
 
         return ntp_peers
 
+    def _chrony_sources(self):
+        """
+        Sources of chronyd, from the CSV output of 'chronyc -c -n sources':
+
+        ^,*,192.0.2.1,2,6,377,23,-0.000012839,-0.000015108,0.020164719
+
+        Mode, state, address, stratum, log2 of the polling interval,
+        reachability register in octal, seconds since the last sample, then
+        the adjusted and measured offsets and the error bound in seconds.
+        Offset and error are returned in milliseconds, as ntpq shows them.
+        """
+        sources = []
+        for line in self._send_command("chronyc -c -n sources").splitlines():
+            fields = line.split(",")
+            if len(fields) < 10:
+                continue
+            sources.append(
+                {
+                    "mode": fields[0],
+                    "state": fields[1],
+                    "address": fields[2],
+                    "stratum": int(fields[3]),
+                    "poll": 2 ** int(fields[4]),
+                    "reach": int(fields[5], 8),
+                    "last_rx": fields[6],
+                    "offset": round(float(fields[7]) * 1000, 3),
+                    "error": round(float(fields[9]) * 1000, 3),
+                }
+            )
+        return sources
+
+    @instrumented
     def get_bgp_neighbors(self):
-        # 'description', 'sent_prefixes' and 'received_prefixes' are not implemented yet
+        """
+        Return the BGP peers of the default instance, as "global", and of
+        every VRF, from one 'show bgp vrf all summary json' on FRR. Images
+        running Quagga only report the default instance.
+        """
+        if not self.capabilities["frr_version"]:
+            return self._get_bgp_neighbors_text()
+
+        bgp_neighbor_data = {}
+        for vrf, afi, table in self._bgp_summary_tables():
+            instance = bgp_neighbor_data.setdefault(
+                "global" if vrf == "default" else vrf, {"router_id": "", "peers": {}}
+            )
+            instance["router_id"] = table.get("routerId", instance["router_id"])
+            for address, peer in table["peers"].items():
+                state = peer.get("state", "")
+                record = instance["peers"].setdefault(
+                    address,
+                    {
+                        "description": peer.get("desc", ""),
+                        "is_enabled": "Admin" not in state
+                        and peer.get("peerState") != "Admin",
+                        "local_as": int(peer.get("localAs", table.get("as", 0))),
+                        "is_up": state == "Established",
+                        "remote_id": address,
+                        "uptime": self._bgp_json_uptime(peer),
+                        "remote_as": int(peer.get("remoteAs", 0)),
+                        "address_family": {},
+                    },
+                )
+                received = int(peer.get("pfxRcd", -1))
+                record["address_family"][afi] = {
+                    "received_prefixes": received,
+                    "accepted_prefixes": received,
+                    "sent_prefixes": int(peer.get("pfxSnt", -1)),
+                }
+
+        return bgp_neighbor_data
+
+    def _bgp_summary_tables(self):
+        """
+        Return (vrf, afi, table) for the BGP table of every address family of
+        every VRF in 'show bgp vrf all summary json', 'table' holding the
+        FRR JSON objects of its peers under "peers".
+        """
+        summary = json.loads(self._send_command("show bgp vrf all summary json") or "{}")
+        tables = []
+        for vrf, families in summary.items():
+            for family, table in families.items():
+                afi = self._BGP_FAMILIES.get(family)
+                # address families and VRFs without BGP have no table
+                if afi is None or not isinstance(table, dict) or "peers" not in table:
+                    continue
+                tables.append((vrf, afi, table))
+        return tables
+
+    @staticmethod
+    def _bgp_json_uptime(peer):
+        if peer.get("peerUptime") == "never":
+            return -1
+        return int(peer.get("peerUptimeMsec", 0)) // 1000
+
+    def _get_bgp_neighbors_text(self):
+        # 'description' and 'sent_prefixes' are not implemented yet
 
         """
         'show ip bgp summary' output example:
@@ -460,16 +1084,7 @@ class VyOSDriver(NetworkDriver):
         192.168.1.4     4 64522       0       0        0    0    0 never    Active
         """
 
-        output = self.device.send_command("show ip bgp summary")
-
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        template_path = os.path.join(current_dir, "templates", "bgp_sum.template")
-
-        # Assuming you've got a TextFSM template ready to parse the `bgp_detail` output
-        with open(template_path) as template_file:
-            fsm = textfsm.TextFSM(template_file)
-            header = fsm.header
-            result = fsm.ParseText(output)
+        header, result = self._bgp_summary_records()
 
         bgp_neighbor_data = {"global": {"router_id": "", "peers": {}}}
 
@@ -493,13 +1108,111 @@ class VyOSDriver(NetworkDriver):
                     self._bgp_time_conversion(neighbor[header.index("UP_TIME")])
                 ),
                 "remote_as": int(neighbor[header.index("NEIGHBOR_AS")]),
+                "address_family": {},
             }
+            received = neighbor[header.index("STATE_PREFIX_RECEIVED")]
+            if received.isdigit():
+                # Quagga only lists IPv4 unicast peers in this table
+                peer_dict["address_family"]["ipv4"] = {
+                    "received_prefixes": int(received),
+                    "accepted_prefixes": int(received),
+                    "sent_prefixes": -1,
+                }
 
             bgp_neighbor_data["global"]["peers"][peer_id] = peer_dict
 
         return bgp_neighbor_data
 
+    def _bgp_summary_records(self):
+        """Return the TextFSM header and rows parsed from 'show ip bgp summary'."""
+        output = self._send_command("show ip bgp summary")
+        return self._parse(parsers.textfsm_records, "bgp_sum.template", output)
+
+    @instrumented
     def get_bgp_neighbors_detail(self, neighbor_address=""):
+        """
+        Return the details of the BGP peers of the default instance, as
+        "global", and of every VRF, from one 'show bgp vrf all neighbors
+        json' on FRR. Images running Quagga only report the default instance
+        and are asked about each peer in turn.
+        """
+        if not self.capabilities["frr_version"]:
+            return self._get_bgp_neighbors_detail_text()
+
+        output = self._send_command("show bgp vrf all neighbors json")
+        bgp_neighbor_data = {}
+        for vrf, peers in json.loads(output or "{}").items():
+            instance = bgp_neighbor_data.setdefault("global" if vrf == "default" else vrf, {})
+            for address, peer in peers.items():
+                # the other keys are 'vrfId' and 'vrfName'
+                if not isinstance(peer, dict):
+                    continue
+                if neighbor_address and address != neighbor_address:
+                    continue
+                record = self._bgp_neighbor_detail_record(vrf, address, peer)
+                instance.setdefault(record["remote_as"], []).append(record)
+
+        return bgp_neighbor_data
+
+    @staticmethod
+    def _bgp_neighbor_detail_record(vrf, address, peer):
+        stats = peer.get("messageStats", {})
+        families = list(peer.get("addressFamilyInfo", {}).values())
+        accepted = sum(int(family.get("acceptedPrefixCounter", 0)) for family in families)
+        sent = sum(int(family.get("sentPrefixCounter", 0)) for family in families)
+        policies = families[0] if families else {}
+        holdtime = int(peer.get("bgpTimerHoldTimeMsecs", 0)) // 1000
+        keepalive = int(peer.get("bgpTimerKeepAliveIntervalMsecs", 0)) // 1000
+        state = peer.get("bgpState", "")
+
+        return {
+            "up": state == "Established",
+            "local_as": int(peer.get("localAs", 0)),
+            "remote_as": int(peer.get("remoteAs", 0)),
+            "router_id": peer.get("remoteRouterId", ""),
+            "local_address": peer.get("hostLocal", ""),
+            "routing_table": vrf,
+            "local_address_configured": "updateSource" in peer,
+            "local_port": int(peer.get("portLocal", 0)),
+            "remote_address": address,
+            "remote_port": int(peer.get("portForeign", 0)),
+            "multihop": int(peer.get("externalBgpNbrMaxHopsAway", 1)) > 1,
+            "multipath": False,
+            "remove_private_as": any(
+                family.get("privateAsNumsRemovedInUpdatesToNbr")
+                or family.get("privateAsNumsAllRemovedInUpdatesToNbr")
+                for family in families
+            ),
+            "import_policy": policies.get("routeMapForIncomingAdvertisements", ""),
+            "export_policy": policies.get("routeMapForOutgoingAdvertisements", ""),
+            "input_messages": int(stats.get("totalRecv", 0)),
+            "output_messages": int(stats.get("totalSent", 0)),
+            "input_updates": int(stats.get("updatesRecv", 0)),
+            "output_updates": int(stats.get("updatesSent", 0)),
+            "messages_queued_out": int(stats.get("depthOutq", 0)),
+            "connection_state": state.lower(),
+            "previous_connection_state": peer.get("lastResetDueTo", ""),
+            "last_event": "",
+            "suppress_4byte_as": "4byteAs" not in peer.get("neighborCapabilities", {}),
+            "local_as_prepend": peer.get("localAsNoPrepend") is False,
+            "holdtime": holdtime,
+            "configured_holdtime": int(
+                peer.get("bgpTimerConfiguredHoldTimeMsecs", holdtime * 1000)
+            ) // 1000,
+            "keepalive": keepalive,
+            "configured_keepalive": int(
+                peer.get("bgpTimerConfiguredKeepAliveIntervalMsecs", keepalive * 1000)
+            ) // 1000,
+            # FRR counts the prefixes accepted after the inbound policy only
+            "active_prefix_count": accepted,
+            "received_prefix_count": accepted,
+            "accepted_prefix_count": accepted,
+            "suppressed_prefix_count": 0,
+            "advertised_prefix_count": sent,
+            "flap_count": int(peer.get("connectionsDropped", 0)),
+        }
+
+    def _get_bgp_neighbors_detail_text(self):
 
         def safe_int(value, default=0):
             try:
@@ -509,26 +1222,22 @@ class VyOSDriver(NetworkDriver):
 
         bgp_neighbor_data = {"global": {}}
 
-        neighbors = self.get_bgp_neighbors()
-
-        for neighbor in neighbors["global"]["peers"]:
-
-            output = self.device.send_command(f"show ip bgp neighbor {neighbor}")
+        neighbors = self._get_bgp_neighbors_text()
 
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            template_path = os.path.join(
-                current_dir, "templates", "bgp_details.template"
-            )
-
-            with open(template_path) as template_file:
-                fsm = textfsm.TextFSM(template_file)
-                result = fsm.ParseText(output)
+        # all outputs are read before parsing, so a parse executor gets them at once
+        peers = list(neighbors["global"]["peers"])
+        outputs = [self._send_command(f"show ip bgp neighbor {neighbor}") for neighbor in peers]
+        parsed = offload.run_many(
+            self.parse_executor,
+            parsers.textfsm_records,
+            [("bgp_details.template", output) for output in outputs],
+        )
 
-                if not result:
-                    continue
+        for neighbor, (header, result) in zip(peers, parsed):
 
+            if result:
                 neighbors_dicts = [
-                    dict(zip(fsm.header, neighbor)) for neighbor in result
+                    dict(zip(header, neighbor)) for neighbor in result
                 ]
 
                 for neighbor_detail in neighbors_dicts:
@@ -629,6 +1338,103 @@ class VyOSDriver(NetworkDriver):
 
         return bgp_neighbor_data
 
+    def iter_bgp_routes(
+        self,
+        afi="ipv4",
+        neighbor=None,
+        direction="received",
+        output_format="json",
+        processes=0,
+        chunk_lines=20000,
+    ):
+        """
+        Yield the BGP routes of an address family one record at a time, as the
+        table is read from the channel, so a full table is never held in
+        memory:
+
+        {"prefix": "10.0.0.0/24", "next_hop": "192.168.1.1", "as_path": "64519",
+         "origin": "IGP", "med": 0, "local_pref": None, "weight": 0,
+         "valid": True, "best": True, "peer": "192.168.1.1"}
+
+        With a 'neighbor', the routes received from it (which requires
+        soft-reconfiguration inbound) or advertised to it are read instead of
+        the local table, depending on 'direction'.
+
+        'output_format' selects the FRR 'json' or 'text' output. Text tables
+        may be parsed by a pool of 'processes' worker processes, in chunks of
+        about 'chunk_lines' lines. JSON is decoded by the C accelerated json
+        module and is always parsed in this process.
+        """
+        if afi not in ("ipv4", "ipv6"):
+            raise ValueError(f"Unsupported address family: {afi}")
+        if direction not in ("received", "advertised"):
+            raise ValueError(f"Unsupported direction: {direction}")
+        if output_format not in ("json", "text"):
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+        command = f"show bgp {afi} unicast"
+        if neighbor:
+            command += f" neighbors {neighbor} {direction}-routes"
+        peer = neighbor or ""
+
+        if output_format == "json":
+            chunks = self._iter_command_chunks(f"{command} json")
+            try:
+                for prefix, paths in bgp.iter_json_routes(chunks):
+                    yield from bgp.json_route_records(prefix, paths, peer)
+            finally:
+                # the parser stops at the end of the routes object
+                self._drain(chunks)
+        else:
+            yield from self._iter_text_bgp_routes(command, peer, processes, chunk_lines)
+
+    def _iter_text_bgp_routes(self, command, peer, processes, chunk_lines):
+        lines = self._iter_command_lines(command)
+        try:
+            yield from self._parse_text_bgp_routes(lines, peer, processes, chunk_lines)
+        finally:
+            self._drain(lines)
+
+    def _parse_text_bgp_routes(self, lines, peer, processes, chunk_lines):
+        # Skip the table version, status and origin code legends
+        columns = None
+        for line in lines:
+            columns = bgp.text_columns(line)
+            if columns is not None:
+                break
+        if columns is None:
+            return
+
+        chunks = self._iter_text_route_chunks(lines, columns, chunk_lines)
+        if not processes:
+            for chunk in chunks:
+                yield from bgp.parse_text_lines(chunk, columns, peer)
+            return
+
+        # Bound the chunks in flight so a slow consumer does not let the whole
+        # table pile up in memory.
+        with ProcessPoolExecutor(processes) as pool:
+            pending = collections.deque()
+            for chunk in chunks:
+                pending.append(pool.submit(bgp.parse_text_lines, chunk, columns, peer))
+                if len(pending) > 2 * processes:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    @staticmethod
+    def _iter_text_route_chunks(lines, columns, chunk_lines):
+        # Chunks are only cut before a network so all paths of a prefix stay
+        # together.
+        chunk = []
+        for line in lines:
+            if len(chunk) >= chunk_lines and bgp.starts_prefix(line, columns):
+                yield chunk
+                chunk = []
+            chunk.append(line)
+        if chunk:
+            yield chunk
+
     def _bgp_time_conversion(self, bgp_uptime):
         if "never" in bgp_uptime:
             return -1
@@ -660,10 +1466,111 @@ class VyOSDriver(NetworkDriver):
                 + seconds
             )
 
+    @instrumented
     def get_lldp_neighbors(self):
+        if not self.capabilities["lldp_json"]:
+            return self._get_lldp_neighbors_text()
+        neighbors = self._get_lldp_neighbors_json()
+
+        lldp = {}
+        for interface, neighbor in neighbors:
+            lldp.setdefault(interface, []).append(
+                {
+                    "hostname": neighbor["remote_system_name"],
+                    "port": neighbor["remote_port"],
+                }
+            )
+
+        return lldp
+
+    @instrumented
+    def get_lldp_neighbors_detail(self, interface=""):
+        if not self.capabilities["lldp_json"]:
+            raise NotImplementedError(
+                "lldpcli JSON output is not available on this device."
+            )
+        neighbors = self._get_lldp_neighbors_json()
+
+        lldp = {}
+        for iface, neighbor in neighbors:
+            if not interface or iface == interface:
+                lldp.setdefault(iface, []).append(neighbor)
+
+        return lldp
+
+    def _get_lldp_neighbors_json(self):
+        """Return (interface, neighbor detail) pairs from lldpcli."""
+        output = self._send_command("lldpcli -f json show neighbors details")
+        return self._parse_lldp_neighbors_json(output)
+
+    @classmethod
+    def _parse_lldp_neighbors_json(cls, output):
+        """
+        'lldpcli -f json show neighbors details' output example:
+        {"lldp": {"interface": [
+          {"eth1": {"via": "LLDP", "rid": "2", "age": "1 day, 18:17:44",
+            "chassis": {"branch": {"id": {"type": "mac", "value": "52:54:00:99:84:8a"},
+                                   "descr": "VyOS 1.3", "mgmt-ip": "10.0.0.3",
+                                   "capability": [{"type": "Router", "enabled": true}]}},
+            "port": {"id": {"type": "ifname", "value": "eth0"}, "descr": "to DC"}}},
+          {"eth2": {...}}
+        ]}}
+
+        lldpd collapses lists holding a single element into that element, so
+        'interface' and 'capability' may be either. A port with several
+        neighbors is listed once per neighbor. A chassis without a system
+        name is not keyed by it.
+        """
+
+        def _as_list(value):
+            return value if isinstance(value, list) else [value]
+
+        lldp = json.loads(output).get("lldp") or {}
+        neighbors = []
+
+        for entry in _as_list(lldp.get("interface", [])):
+            for interface, details in entry.items():
+                chassis = details.get("chassis", {})
+                if "id" in chassis:
+                    system_name = ""
+                else:
+                    system_name, chassis = next(iter(chassis.items()), ("", {}))
+                port = details.get("port", {})
+
+                capabilities = _as_list(chassis.get("capability", []))
+                capab = [
+                    cls._LLDP_CAPABILITIES.get(c["type"].lower(), "other")
+                    for c in capabilities
+                ]
+                enabled_capab = [
+                    cls._LLDP_CAPABILITIES.get(c["type"].lower(), "other")
+                    for c in capabilities
+                    if c.get("enabled")
+                ]
+
+                neighbors.append(
+                    (
+                        interface,
+                        {
+                            "parent_interface": interface,
+                            "remote_port": port.get("id", {}).get("value", ""),
+                            "remote_port_description": port.get("descr", ""),
+                            "remote_chassis_id": chassis.get("id", {}).get("value", ""),
+                            "remote_system_name": system_name,
+                            "remote_system_description": chassis.get("descr", ""),
+                            "remote_system_capab": capab,
+                            "remote_system_enable_capab": enabled_capab,
+                        },
+                    )
+                )
+
+        return neighbors
+
+    def _get_lldp_neighbors_text(self):
+        # Used on images without lldpcli JSON support.
         # Multiple neighbors per port are not implemented
         # The show lldp neighbors commands lists port descriptions, not IDs
-        output = self.device.send_command("show lldp neighbors detail")
+        output = self._send_command("show lldp neighbors detail")
         pattern = r"""(?s)Interface: +(?P<interface>\S+), [^\n]+
 .+?
  +SysName: +(?P<hostname>\S+)
@@ -683,6 +1590,7 @@ class VyOSDriver(NetworkDriver):
             for match in re.finditer(pattern, output)
         }
 
+    @instrumented
     def get_interfaces_counters(self):
         # 'rx_unicast_packet', 'rx_broadcast_packets', 'tx_unicast_packets',
         # 'tx_multicast_packets' and 'tx_broadcast_packets' are not implemented yet
@@ -698,43 +1606,39 @@ class VyOSDriver(NetworkDriver):
         TX:  bytes    packets     errors    dropped    carrier collisions
           32776498     279273          0          0          0          0
         """
-        output = self.device.send_command("show interfaces detail")
-        interfaces = re.findall(r"(\S+): <.*", output)
-        # count = re.findall("(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+", output)
-        count = re.findall(r"(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)", output)
         counters = {}
-
-        for j, i in enumerate(count):
-            if j % 2 == 0:
-                rx_errors = i[2]
-                rx_discards = i[3]
-                rx_octets = i[0]
-                rx_unicast_packets = i[1]
-                rx_multicast_packets = i[5]
-                rx_broadcast_packets = -1
-            else:
-                counters[interfaces[j // 2]] = {
-                    "tx_errors": int(i[2]),
-                    "tx_discards": int(i[3]),
-                    "tx_octets": int(i[0]),
-                    "tx_unicast_packets": int(i[1]),
-                    "tx_multicast_packets": -1,
-                    "tx_broadcast_packets": -1,
-                    "rx_errors": int(rx_errors),
-                    "rx_discards": int(rx_discards),
-                    "rx_octets": int(rx_octets),
-                    "rx_unicast_packets": int(rx_unicast_packets),
-                    "rx_multicast_packets": int(rx_multicast_packets),
-                    "rx_broadcast_packets": int(rx_broadcast_packets),
-                }
+        for interface, rx, tx in self._interface_counter_records():
+            counters[interface] = {
+                "tx_errors": tx[2],
+                "tx_discards": tx[3],
+                "tx_octets": tx[0],
+                "tx_unicast_packets": tx[1],
+                "tx_multicast_packets": -1,
+                "tx_broadcast_packets": -1,
+                "rx_errors": rx[2],
+                "rx_discards": rx[3],
+                "rx_octets": rx[0],
+                "rx_unicast_packets": rx[1],
+                "rx_multicast_packets": rx[5],
+                "rx_broadcast_packets": -1,
+            }
         return counters
 
+    def _interface_counter_records(self):
+        """
+        Return (interface, rx, tx) for each interface of 'show interfaces
+        detail', rx and tx being the six counters under the RX: and TX: lines.
+        """
+        output = self._send_command("show interfaces detail")
+        return self._parse(parsers.interface_counter_records, output)
+
+    @instrumented
     def get_snmp_information(self):
         # 'acl' is not implemented yet
 
-        output = self.device.send_command("show configuration")
+        output = self._send_command("show configuration")
         # convert the configuration to dictionary
-        config = vyattaconfparser.parse_conf(output)
+        config = self._parse(vyattaconfparser.parse_conf, output)
 
         snmp = {"community": {}}
         try:
@@ -760,28 +1664,15 @@ class VyOSDriver(NetworkDriver):
         except KeyError:
             return {}
 
+    @instrumented
     def get_facts(self):
-        output_uptime = self.device.send_command("cat /proc/uptime | awk '{print $1}'")
+        output_uptime = self._send_command("cat /proc/uptime | awk '{print $1}'")
 
         uptime = int(float(output_uptime))
 
-        output = self.device.send_command("show version").split("\n")
-        ver_str = [line for line in output if "Version" in line][0]
-        version = self.parse_version(ver_str)
-
-        above_1_1 = not version.startswith("1.0") and not version.startswith("1.1")
-        if above_1_1:
-            sn_str = [line for line in output if "Hardware S/N" in line][0]
-            hwmodel_str = [line for line in output if "Hardware model" in line][0]
-        else:
-            sn_str = [line for line in output if "S/N" in line][0]
-            hwmodel_str = [line for line in output if "HW model" in line][0]
-
-        snumber = self.parse_snumber(sn_str)
-        hwmodel = self.parse_hwmodel(hwmodel_str)
-
-        output = self.device.send_command("show configuration")
-        config = vyattaconfparser.parse_conf(output)
+        capabilities = self.capabilities
+        output = self._send_command("show configuration")
+        config = self._parse(vyattaconfparser.parse_conf, output)
 
         if "host-name" in config["system"]:
             hostname = config["system"]["host-name"]
@@ -801,9 +1692,9 @@ class VyOSDriver(NetworkDriver):
         facts = {
             "uptime": int(uptime),
             "vendor": "VyOS",
-            "os_version": version,
-            "serial_number": snumber,
-            "model": hwmodel,
+            "os_version": capabilities["version"],
+            "serial_number": capabilities["serial_number"],
+            "model": capabilities["model"],
             "hostname": hostname,
             "fqdn": fqdn,
             "interface_list": iface_list,
@@ -825,8 +1716,9 @@ class VyOSDriver(NetworkDriver):
         model = model_str.split(":")
         return model[1].strip()
 
+    @instrumented
     def get_interfaces_ip(self):
-        output = self.device.send_command("show interfaces")
+        output = self._send_command("show interfaces")
         output = output.split("\n")
 
         # delete the header line and the interfaces which has no ip address
@@ -859,6 +1751,31 @@ class VyOSDriver(NetworkDriver):
 
         return ifaces_ip
 
+    @instrumented
+    def get_vrf_interfaces_ip(self, vrf):
+        """
+        get_interfaces_ip for the interfaces of 'vrf', "default" for the
+        interfaces in no VRF, from the links and addresses of all VRFs read
+        at once. Link-local addresses are left out, as 'show interfaces' does.
+        """
+        if not self.capabilities["ip_json"]:
+            raise NotImplementedError("VRFs need iproute2 JSON output, VyOS 1.3 or later.")
+
+        links = json.loads(self._send_command("ip -j -d addr show") or "[]")
+        members = iproute.vrf_members(links)
+        ifaces_ip = {}
+        for link in links:
+            if members.get(link["ifname"], "default") != vrf:
+                continue
+            for address in link.get("addr_info", []):
+                if address.get("scope") == "link":
+                    continue
+                family = "ipv6" if address["family"] == "inet6" else "ipv4"
+                ifaces_ip.setdefault(link["ifname"], {}).setdefault(family, {})[
+                    address["local"]
+                ] = {"prefix_length": int(address["prefixlen"])}
+        return ifaces_ip
+
     @staticmethod
     def _get_ip_version(ip_address):
         if ":" in ip_address:
@@ -866,8 +1783,99 @@ class VyOSDriver(NetworkDriver):
         elif "." in ip_address:
             return "ipv4"
 
+    @instrumented
+    def get_route_to(self, destination="", protocol="", longer=False):
+        """
+        Routes come from the zebra RIB ('show ip route json').
+
+        With the 'route_cache_ttl' optional argument set, the whole RIB of an
+        address family is pulled once into a local RouteIndex and lookups are
+        answered from it until it is 'route_cache_ttl' seconds old. Committing
+        or rolling back a configuration drops the cached tables.
+        """
+        if destination:
+            afis = ["ipv6" if ":" in destination else "ipv4"]
+        else:
+            afis = ["ipv4", "ipv6"]
+
+        routes = {}
+        for afi in afis:
+            if self.route_cache_ttl:
+                table = self._get_cached_routes(afi, destination, longer)
+            else:
+                table = self._get_routes(afi, destination, longer)
+
+            for prefix, entries in table.items():
+                prefix_routes = self._route_entries(entries, protocol)
+                if prefix_routes:
+                    routes[prefix] = prefix_routes
+
+        return routes
+
+    def _get_routes(self, afi, destination="", longer=False):
+        command = "show ip route " if afi == "ipv4" else "show ipv6 route "
+        if destination:
+            command += f"{destination} "
+            if longer:
+                command += "longer-prefixes "
+        command += "json"
+
+        output = self._send_command(command)
+        return json.loads(output) if output.strip() else {}
+
+    def _get_cached_routes(self, afi, destination="", longer=False):
+        index = self._route_cache.get(afi)
+        if index is None or index.age() > self.route_cache_ttl:
+            index = RouteIndex(self._get_routes(afi), 4 if afi == "ipv4" else 6)
+            self._route_cache[afi] = index
+
+        if not destination:
+            return index.routes
+        if longer:
+            prefixes = index.longer(destination)
+        else:
+            prefixes = [index.lookup(destination)]
+
+        return {prefix: index.routes[prefix] for prefix in prefixes if prefix}
+
+    def _route_entries(self, entries, protocol=""):
+        """
+        Build NAPALM routes, one per next hop, from the FRR entries of a
+        prefix:
+
+        [{"prefix": "10.0.0.0/24", "protocol": "bgp", "selected": true,
+          "distance": 20, "metric": 0, "uptime": "1d02h03m",
+          "nexthops": [{"ip": "192.0.2.1", "interfaceName": "eth0",
+                        "active": true, "fib": true}]}]
+        """
+        routes = []
+        for entry in entries:
+            if protocol and entry["protocol"] != protocol.lower():
+                continue
+
+            selected = entry.get("selected", False)
+            for nexthop in entry.get("nexthops", []):
+                routes.append(
+                    {
+                        "protocol": entry["protocol"],
+                        "current_active": selected,
+                        "last_active": selected,
+                        "age": int(self._bgp_time_conversion(entry.get("uptime", "never"))),
+                        "next_hop": nexthop.get("ip", ""),
+                        "outgoing_interface": nexthop.get("interfaceName", ""),
+                        "selected_next_hop": selected and nexthop.get("fib", False),
+                        "preference": entry.get("distance", 0),
+                        "inactive_reason": "",
+                        "routing_table": entry.get("vrfName", "default"),
+                        "protocol_attributes": {"metric": entry.get("metric", 0)},
+                    }
+                )
+
+        return routes
+
+    @instrumented
     def get_users(self):
-        output = self.device.send_command("show configuration commands").split("\n")
+        output = self._send_command("show configuration commands").split("\n")
 
         user_conf = [x.split() for x in output if "login user" in x]
 
@@ -895,6 +1903,7 @@ class VyOSDriver(NetworkDriver):
 
         return user_auth
 
+    @instrumented
     def ping(
         self,
         destination,
@@ -905,7 +1914,7 @@ class VyOSDriver(NetworkDriver):
         count=C.PING_COUNT,
         vrf=C.PING_VRF,
     ):
-        # does not support multiple destination yet
+        # use ping_many to probe multiple destinations in one round trip
 
         deadline = timeout * count
 
@@ -916,66 +1925,629 @@ class VyOSDriver(NetworkDriver):
         command += "count %d " % count
         if source != "":
             command += f"interface {source} "
+        if vrf != "":
+            command += f"vrf {vrf} "
+
+        output_ping = self._send_command(
+            command, **self._command_timeout_args(deadline)
+        )
+
+        return self._parse_ping_output(destination, output_ping)
+
+    @instrumented
+    def ping_many(
+        self,
+        destinations,
+        source=C.PING_SOURCE,
+        ttl=C.PING_TTL,
+        timeout=C.PING_TIMEOUT,
+        size=C.PING_SIZE,
+        count=C.PING_COUNT,
+        vrf=C.PING_VRF,
+        deadline=None,
+    ):
+        """
+        Ping several destinations concurrently in a single shell invocation.
 
+        All probes are started in the background on the device and their
+        summaries are collected in one round trip. Every output line is
+        prefixed with its destination so the interleaved output can be
+        demultiplexed locally.
+
+        'deadline' bounds the whole batch and defaults to 'timeout * count',
+        the deadline of a single ping. With 'vrf' the probes run in the
+        routing table of that VRF.
+
+        Returns a dictionary keyed by destination, each value having the
+        same structure as the one returned by ping().
+        """
+        destinations = list(dict.fromkeys(destinations))
+        if not destinations:
+            return {}
+
+        if deadline is None:
+            deadline = timeout * count
+
+        probe = f"/bin/ping -q -n -c {count} -s {size} -t {ttl} -w {deadline} "
+        if source != "":
+            probe += f"-I {source} "
+        probe = self._vrf_exec(vrf) + probe
+
+        command = (
+            f"for d in {' '.join(map(shlex.quote, destinations))}; do "
+            f'{probe}$d 2>&1 | sed "s/^/$d /" & done; wait'
+        )
+
+        output = self._send_command(
+            command, **self._command_timeout_args(deadline)
+        )
+
+        lines = {destination: [] for destination in destinations}
+        for line in output.splitlines():
+            destination, _, text = line.partition(" ")
+            if destination in lines:
+                lines[destination].append(text)
+
+        return {
+            destination: self._parse_ping_output(
+                destination, "\n".join(lines[destination])
+            )
+            for destination in destinations
+        }
+
+    @staticmethod
+    def _vrf_exec(vrf):
+        """Prefix running a shell command in 'vrf', as the op mode ping and traceroute do."""
+        return f"sudo ip vrf exec {shlex.quote(vrf)} " if vrf != "" else ""
+
+    @staticmethod
+    def _parse_ping_output(destination, output_ping):
+        """
+        Build the NAPALM ping structure from the statistics footer of ping:
+
+        --- 8.8.8.8 ping statistics ---
+        5 packets transmitted, 5 received, 0% packet loss, time 4006ms
+        rtt min/avg/max/mdev = 0.112/0.117/0.136/0.011 ms
+        """
         ping_result = {}
-        output_ping = self.device.send_command(command)
 
-        err = "Unknown host" if "Unknown host" in output_ping else ""
-        if err:
-            ping_result["error"] = err
+        if re.search(r"(?i)unknown host|not known", output_ping):
+            ping_result["error"] = "Unknown host"
+            return ping_result
+
+        # 'packet_info' example:
+        # ('5', '5') from "5 packets transmitted, 5 received, ..."
+        packet_info = re.search(
+            r"(\d+) packets transmitted, (\d+) (?:packets )?received", output_ping
+        )
+        if packet_info is None:
+            ping_result["error"] = output_ping.strip() or "No reply"
+            return ping_result
+
+        sent = int(packet_info[1])
+        received = int(packet_info[2])
+        lost = sent - received
+
+        # 'rtt_info' example:
+        # ["0.307/0.396/0.480/0.061"]
+        match = re.search(r"([\d\.]+)/([\d\.]+)/([\d\.]+)/([\d\.]+)", output_ping)
+
+        if match is not None:
+            rtt_min = float(match[1])
+            rtt_avg = float(match[2])
+            rtt_max = float(match[3])
+            rtt_stddev = float(match[4])
+            results = [{"ip_address": destination, "rtt": rtt_avg}]
         else:
-            # 'packet_info' example:
-            # ['5', 'packets', 'transmitted,' '5', 'received,' '0%', 'packet',
-            # 'loss,', 'time', '3997ms']
-            packet_info = output_ping.split("\n")
+            # no reply at all, ping omits the rtt line
+            rtt_min = rtt_avg = rtt_max = rtt_stddev = 0.0
+            results = []
+
+        ping_result["success"] = {
+            "probes_sent": sent,
+            "packet_loss": lost,
+            "rtt_min": rtt_min,
+            "rtt_max": rtt_max,
+            "rtt_avg": rtt_avg,
+            "rtt_stddev": rtt_stddev,
+            "results": results,
+        }
 
-            packet_info = (
-                packet_info[-2] if len(packet_info[-1]) > 0 else packet_info[-3]
-            )
-            packet_info = [x.strip() for x in packet_info.split()]
+        return ping_result
 
-            sent = int(packet_info[0])
-            received = int(packet_info[3])
-            lost = sent - received
+    @instrumented
+    def traceroute(
+        self,
+        destination,
+        source=C.TRACEROUTE_SOURCE,
+        ttl=C.TRACEROUTE_TTL,
+        timeout=C.TRACEROUTE_TIMEOUT,
+        vrf=C.TRACEROUTE_VRF,
+    ):
+        return self.traceroute_many(
+            [destination], source=source, ttl=ttl, timeout=timeout, vrf=vrf
+        )[destination]
+
+    @instrumented
+    def traceroute_many(
+        self,
+        destinations,
+        source=C.TRACEROUTE_SOURCE,
+        ttl=C.TRACEROUTE_TTL,
+        timeout=C.TRACEROUTE_TIMEOUT,
+        vrf=C.TRACEROUTE_VRF,
+        deadline=None,
+    ):
+        """
+        Trace the path to several destinations concurrently.
 
-            # 'rtt_info' example:
-            # ["0.307/0.396/0.480/0.061"]
-            rtt_info = output_ping.split("\n")
+        Like ping_many, every trace runs in the background of a single shell
+        invocation with its output lines prefixed by the destination. Hops
+        are parsed as the lines are read from the channel. 'deadline' bounds
+        the whole batch on the device (default 'timeout * ttl'); traces still
+        running at that point are stopped and return the hops seen so far.
+        With 'vrf' the traces run in the routing table of that VRF.
 
-            rtt_info = rtt_info[-1] if len(rtt_info[-1]) > 0 else rtt_info[-2]
-            match = re.search(r"([\d\.]+)/([\d\.]+)/([\d\.]+)/([\d\.]+)", rtt_info)
+        Returns a dictionary keyed by destination, each value having the
+        same structure as the one returned by traceroute().
+        """
+        destinations = list(dict.fromkeys(destinations))
+        if not destinations:
+            return {}
 
-            if match is not None:
-                rtt_min = float(match[1])
-                rtt_avg = float(match[2])
-                rtt_max = float(match[3])
-                rtt_stddev = float(match[4])
+        if deadline is None:
+            deadline = timeout * ttl
+
+        probe = (
+            f"timeout {deadline} {self._vrf_exec(vrf)}/usr/bin/traceroute -n "
+            f"-q {self._TRACEROUTE_PROBES} -m {ttl} -w {timeout} "
+        )
+        if source != "":
+            probe += f"-s {source} "
+
+        command = (
+            f"for d in {' '.join(map(shlex.quote, destinations))}; do "
+            f'{probe}$d 2>&1 | sed "s/^/$d /" & done; wait'
+        )
+
+        hops = {destination: {} for destination in destinations}
+        errors = {}
+        for line in self._iter_command_lines(command, deadline):
+            destination, _, text = line.partition(" ")
+            if destination not in hops:
+                continue
+            if re.search(r"(?i)unknown host|not known", text):
+                errors[destination] = "Unknown host"
+                continue
+            hop = self._parse_traceroute_line(text, timeout)
+            if hop is not None:
+                hop_index, probes = hop
+                hops[destination][hop_index] = {"probes": probes}
+
+        traceroute_result = {}
+        for destination in destinations:
+            if destination in errors:
+                traceroute_result[destination] = {"error": errors[destination]}
             else:
-                rtt_min = None
-                rtt_avg = None
-                rtt_max = None
-                rtt_stddev = None
-
-            ping_result["success"] = {}
-            ping_result["success"] = {
-                "probes_sent": sent,
-                "packet_loss": lost,
-                "rtt_min": rtt_min,
-                "rtt_max": rtt_max,
-                "rtt_avg": rtt_avg,
-                "rtt_stddev": rtt_stddev,
-                "results": [{"ip_address": destination, "rtt": rtt_avg}],
-            }
+                traceroute_result[destination] = {"success": hops[destination]}
 
-            return ping_result
+        return traceroute_result
+
+    @staticmethod
+    def _parse_traceroute_line(line, timeout):
+        """
+        Parse one hop of 'traceroute -n' output:
+
+         3  192.0.2.1  1.234 ms 192.0.2.5  1.520 ms *
+
+        Returns None for lines which do not describe a hop, such as the
+        "traceroute to ..." header.
+        """
+        fields = line.split()
+        if not fields or not fields[0].isdigit():
+            return None
+
+        probes = {}
+        ip_address = C.TRACEROUTE_NULL_IP_ADDRESS
+        for index, field in enumerate(fields[1:], start=1):
+            if field == "*":
+                probes[len(probes) + 1] = {
+                    "rtt": timeout * 1000.0,
+                    "ip_address": C.TRACEROUTE_NULL_IP_ADDRESS,
+                    "host_name": C.TRACEROUTE_NULL_HOST_NAME,
+                }
+            elif fields[index + 1:index + 2] == ["ms"]:
+                probes[len(probes) + 1] = {
+                    "rtt": float(field),
+                    "ip_address": ip_address,
+                    "host_name": ip_address,
+                }
+            elif field != "ms" and not field.startswith("!"):
+                # anything but the unit and annotations such as !H is an address
+                ip_address = field
+
+        return int(fields[0]), probes
+
+    def _parse(self, function, *args):
+        """Run the parse stage function(*args) on the parse executor, see utils.offload."""
+        return offload.run(self.parse_executor, function, *args)
+
+    @property
+    def capabilities(self):
+        """
+        What the device runs and supports, probed with one command the first
+        time it is needed in a session:
+
+        {"version": "1.4-rolling-202301260317", "above_1_1": True,
+         "model": "Standard PC (i440FX + PIIX, 1996)", "serial_number": "0",
+         "frr_version": "8.4.2", "ip_json": True, "lldp_json": True,
+         "chrony": True, "nft_json": True}
+
+        Getters use it to pick their commands without trying them first.
+        With the 'capabilities_ttl' optional argument set, the probe result
+        is also cached for the host for that many seconds, across sessions.
+        """
+        if self._capabilities is None:
+            key = f"napalm_vyos.capabilities.{self.hostname}:{self.port}"
+            capabilities = cache.get(key) if self.capabilities_ttl else None
+            if capabilities is None:
+                capabilities = self._probe_capabilities()
+                if self.capabilities_ttl:
+                    cache.set(key, capabilities, self.capabilities_ttl)
+            self._capabilities = capabilities
+        return self._capabilities
+
+    def _probe_capabilities(self):
+        output = self._send_command(self._CAPABILITIES_COMMAND)
+        fields = {}
+        markers = {}
+        for line in output.splitlines():
+            if line.startswith("@"):
+                marker, _, value = line[1:].partition(" ")
+                markers[marker] = value.strip()
+            elif ":" in line:
+                key, _, value = line.partition(":")
+                fields.setdefault(key.strip(), value.strip())
+
+        version = self.parse_version(fields["Version"]) if "Version" in fields else ""
+        above_1_1 = not version.startswith("1.0") and not version.startswith("1.1")
+        if above_1_1:
+            model, serial_number = fields.get("Hardware model"), fields.get("Hardware S/N")
+        else:
+            model, serial_number = fields.get("HW model"), fields.get("HW S/N")
+
+        # 'FRRouting 8.4.2 (vyos) on Linux(5.15.90-amd64-vyos).', Quagga before 1.2
+        frr = re.match(r"FRRouting (\S+)", markers.get("frr", ""))
+        return {
+            "version": version,
+            "above_1_1": above_1_1,
+            "model": model,
+            "serial_number": serial_number,
+            "frr_version": frr[1] if frr else None,
+            "ip_json": "ip-json" in markers,
+            "lldp_json": "lldp-json" in markers,
+            "chrony": "chrony" in markers,
+            "nft_json": "nft-json" in markers,
+        }
+
+    @property
+    def timing(self):
+        """
+        Timing settings of the session, as tuned from the measured prompt
+        round trip time:
+
+        {"rtt": 0.012, "delay_factor": 0.12, "read_timeout": 60}
+        """
+        return {
+            "rtt": self.rtt,
+            "delay_factor": self.delay_factor,
+            "read_timeout": self._command_deadline(0),
+        }
+
+    def _command_deadline(self, seconds):
+        # devices slower than netmiko expects get proportionally more time
+        return seconds + self.timeout * max(1, self.delay_factor)
+
+    def _command_timeout_args(self, seconds):
+        """
+        Keyword arguments letting send_command wait at least 'seconds' for
+        the prompt, on top of the usual session timeout.
+        """
+        if self._netmiko_major >= 4:
+            return {"read_timeout": self._command_deadline(seconds)}
+        # Netmiko < 4 waits for 500 loops of 0.2 seconds scaled by delay_factor
+        return {"delay_factor": self._command_deadline(seconds) / 100}
+
+    def _measure_rtt(self, samples=3):
+        """Median time the device takes to answer an empty line with its prompt."""
+        self.device.clear_buffer()
+        rtts = []
+        for _ in range(samples):
+            stop_at = time.monotonic() + self.timeout
+            started = time.perf_counter()
+            self.device.write_channel(self.device.RETURN)
+            buffer = ""
+            while not (
+                self.device.base_prompt in buffer and buffer.rstrip().endswith(("$", "#"))
+            ):
+                if time.monotonic() > stop_at:
+                    raise CommandTimeoutException(f"No prompt for {self.timeout}s")
+                chunk = self.device.read_channel()
+                if not chunk:
+                    time.sleep(0.001)
+                buffer += chunk
+            rtts.append(time.perf_counter() - started)
+
+        self._rtt_probed = time.monotonic()
+        return sorted(rtts)[len(rtts) // 2]
+
+    def _tune_timing(self, rtt):
+        """Fold an RTT sample into the session timing settings."""
+        if self.rtt is None:
+            self.rtt = rtt
+        else:
+            self.rtt += self._RTT_SMOOTHING * (rtt - self.rtt)
+
+        low, high = self._DELAY_FACTOR_RANGE
+        delay_factor = round(min(high, max(low, self.rtt / self._REFERENCE_RTT)), 2)
+        if delay_factor != self.delay_factor:
+            logger.debug(
+                f"{self.hostname}: rtt {self.rtt:.4f}s, delay factor "
+                f"{self.delay_factor} -> {delay_factor}"
+            )
+            self.delay_factor = delay_factor
+            if self.device is not None:
+                self.device.global_delay_factor = delay_factor
+
+    def _observe_timing(self, event, record):
+        # Commands are no RTT samples: send_command reads their echo after
+        # the sleeps of netmiko's find_prompt() and clear_buffer(), which
+        # scale with the delay factor, so a higher factor would make the next
+        # samples slower in turn. The bare prompt probe of open() is repeated
+        # instead, once a getter returned and the session sits at its prompt.
+        if (
+            event == "getter"
+            and record["error"] is None
+            and self._rtt_probed is not None
+            and time.monotonic() - self._rtt_probed >= self._RTT_PROBE_INTERVAL
+        ):
+            self._tune_timing(self._measure_rtt(samples=1))
+
+    def _send_command(self, command, **kwargs):
+        return self._send_recorded(self.device.send_command, command, command, **kwargs)
+
+    def _send_config_set(self, config_commands, **kwargs):
+        label = "; ".join(config_commands)
+        return self._send_recorded(
+            self.device.send_config_set, label, config_commands, **kwargs
+        )
 
-    def get_config(self, retrieve="all", full=False, sanitized=False):
+    def _send_recorded(self, send, label, *args, **kwargs):
+        """Same as _send_instrumented, saving the output when recording."""
+        if self.recorder is None:
+            return self._send_instrumented(send, label, *args, **kwargs)
+
+        start = time.time_ns()
+        started = time.perf_counter()
+        output = self._send_instrumented(send, label, *args, **kwargs)
+        self.recorder.add(label, output, start, time.perf_counter() - started)
+        return output
+
+    def _send_instrumented(self, send, label, *args, **kwargs):
+        """
+        Call a netmiko send method, feeding what it reads from the channel
+        to an instrumentation probe when hooks are registered.
+        """
+        if "read_timeout" not in kwargs and "delay_factor" not in kwargs:
+            kwargs.update(self._command_timeout_args(0))
+
+        probe = self.instrumentation.start(label)
+        if probe is None:
+            return send(*args, **kwargs)
+
+        own_reader = "read_channel" in vars(self.device)
+        read_channel = getattr(self.device, "read_channel", None)
+
+        def probed_read_channel():
+            data = read_channel()
+            probe.received(data)
+            return data
+
+        if read_channel is not None:
+            self.device.read_channel = probed_read_channel
+        error = None
+        try:
+            output = send(*args, **kwargs)
+            if not probe.record["bytes"]:
+                # the connection did not read through read_channel
+                probe.received(output)
+            return output
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if own_reader:
+                self.device.read_channel = read_channel
+            elif read_channel is not None:
+                del self.device.read_channel
+            self.instrumentation.finish(probe, error)
+
+    def _iter_command_chunks(self, command, deadline=0):
+        """
+        Same as _stream_command_chunks, recording the command for the
+        instrumentation hooks, and its output when recording.
+        """
+        return self._observe_chunks(command, self._stream_command_chunks(command, deadline))
+
+    def _iter_exec_chunks(self, command):
+        """Same as _exec_command_chunks, recorded as _iter_command_chunks."""
+        return self._observe_chunks(command, self._exec_command_chunks(command))
+
+    def _observe_chunks(self, command, chunks):
+        if self.recorder is not None:
+            chunks = self.recorder.stream(command, chunks)
+
+        probe = self.instrumentation.start(command)
+        if probe is None:
+            yield from chunks
+            return
+
+        probe.record["streamed"] = True
+        error = None
+        try:
+            for chunk in chunks:
+                probe.received(chunk)
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.instrumentation.finish(probe, error)
+
+    def _stream_command_chunks(self, command, deadline=0):
+        """
+        Run 'command' in the op-mode shell and yield its output in chunks as
+        they are read from the channel, instead of buffering it whole as
+        send_command does.
+
+        The output is framed by two markers whose echo differs from what they
+        print, so the command echo, its line wrapping and the prompt are
+        never mistaken for output. CommandTimeoutException is raised when no
+        data arrives for 'deadline' plus the session timeout.
+        """
+        self.device.write_channel(
+            f"{self._echo_marker(self._STREAM_BEGIN)}; {command}; "
+            f"{self._echo_marker(self._STREAM_END)}{self.device.RETURN}"
+        )
+
+        idle_timeout = deadline + self.timeout
+        stop_at = time.monotonic() + idle_timeout
+        started = False
+        buffer = ""
+        while True:
+            chunk = self.device.read_channel()
+            if not chunk:
+                if time.monotonic() > stop_at:
+                    self.device.write_channel("\x03")
+                    self.device.find_prompt()
+                    raise CommandTimeoutException(
+                        f"No output for {idle_timeout}s: {command}"
+                    )
+                time.sleep(0.02)
+                continue
+
+            stop_at = time.monotonic() + idle_timeout
+            buffer += chunk
+            if not started:
+                begin = buffer.find(self._STREAM_BEGIN + "\n")
+                if begin == -1:
+                    begin = buffer.find(self._STREAM_BEGIN + "\r\n")
+                if begin == -1:
+                    continue
+                started = True
+                buffer = buffer[buffer.index("\n", begin) + 1:]
+
+            end = buffer.find(self._STREAM_END)
+            if end != -1:
+                if end:
+                    yield buffer[:end]
+                self._read_until_base_prompt(buffer[end:], stop_at)
+                return
+
+            # keep enough to recognise an end marker split across two reads
+            keep = len(self._STREAM_END)
+            if len(buffer) > keep:
+                yield buffer[:-keep]
+                buffer = buffer[-keep:]
+
+    def _exec_command_chunks(self, command):
+        """
+        Run 'command' on an exec channel of the SSH connection, next to the
+        interactive shell, and yield its output as it is received. There is
+        no echo, prompt or terminal processing to strip, but neither the CLI
+        op-mode commands: this is for plain shell commands.
+        CommandErrorException is raised when the command fails.
+        """
+        channel = self.device.remote_conn.transport.open_session(timeout=self.timeout)
+        try:
+            channel.settimeout(self._command_deadline(0))
+            channel.exec_command(command)
+            decoder = codecs.getincrementaldecoder("utf-8")("replace")
+            while True:
+                try:
+                    data = channel.recv(65536)
+                except socket.timeout:
+                    raise CommandTimeoutException(
+                        f"No output for {self._command_deadline(0)}s: {command}"
+                    )
+                if not data:
+                    break
+                text = decoder.decode(data)
+                if text:
+                    yield text
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+
+            status = channel.recv_exit_status()
+            if status:
+                error = channel.recv_stderr(65536).decode(errors="replace").strip()
+                raise CommandErrorException(f"{command} exited with {status}: {error}")
+        finally:
+            channel.close()
+
+    def _iter_command_lines(self, command, deadline=0):
+        """Same as _iter_command_chunks, one output line at a time."""
+        buffer = ""
+        for chunk in self._iter_command_chunks(command, deadline):
+            buffer += chunk
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                yield line.rstrip("\r")
+        if buffer.rstrip("\r"):
+            yield buffer.rstrip("\r")
+
+    @staticmethod
+    def _drain(chunks):
+        """
+        Read what is left of a streamed command up to its prompt, once its
+        parser is done or its consumer stopped early, so the session stays
+        in step for the next command.
+        """
+        for _ in chunks:
+            pass
+
+    def _read_until_base_prompt(self, buffer, stop_at):
+        # Consume the prompt printed after the output, so the next command
+        # does not read it back.
+        while self.device.base_prompt not in buffer and time.monotonic() < stop_at:
+            chunk = self.device.read_channel()
+            if not chunk:
+                time.sleep(0.02)
+            buffer += chunk
+        return buffer
+
+    @staticmethod
+    def _echo_marker(marker):
+        # The quotes vanish once the shell runs echo, but not from the echo of
+        # the command line itself.
+        return f'echo {marker[:2]}""{marker[2:]}'
+
+    @instrumented
+    def get_config(
+        self, retrieve="all", full=False, sanitized=False, sinks=None, compression=None
+    ):
         """
         Return the configuration of a device.
         :param retrieve: String to determine which configuration type you want to retrieve, default is all of them.
                               The rest will be set to "".
         :param full: Boolean to retrieve all the configuration. (Not supported)
         :param sanitized: Boolean to remove secret data. (Only supported for 'running')
+        :param sinks: Where to stream the stores to instead of returning them: a
+            dictionary of store to path or file-like object, or a path with a
+            '{store}' placeholder. Stores streamed are returned as "".
+        :param compression: "gzip" or "zstd" for the sinks. Paths ending in .gz
+            or .zst are compressed accordingly by default.
         :return: The object returned is a dictionary with a key for each configuration store:
             - running(string) - Representation of the native running configuration
             - candidate(string) - Representation of the candidate configuration.
@@ -986,24 +2558,45 @@ class VyOSDriver(NetworkDriver):
                 "ERROR: Not a valid option to retrieve.\nPlease select from 'running', 'candidate', "
                 "'startup', or 'all'"
             )
-        else:
-            config_dict = {"running": "", "startup": "", "candidate": ""}
-            if retrieve in ["running", "all"]:
-                config_dict["running"] = self._get_running_config(sanitized)
-            if retrieve in ["startup", "all"]:
-                config_dict["startup"] = self.device.send_command(
-                    f"cat {self._BOOT_FILENAME}"
-                )
-            if retrieve in ["candidate", "all"]:
-                config_dict["candidate"] = self._new_config or ""
+        if isinstance(sinks, (str, os.PathLike)):
+            template = os.fspath(sinks)
+            sinks = {store: template.format(store=store) for store in ("running", "startup",
+                                                                       "candidate")}
+
+        config_dict = {"running": "", "startup": "", "candidate": ""}
+        for store in config_dict:
+            if retrieve not in [store, "all"]:
+                continue
+            if sinks is not None and store in sinks:
+                with open_sink(sinks[store], compression) as write:
+                    for chunk in self._config_chunks(store, sanitized):
+                        write(chunk)
+            else:
+                buffer = io.StringIO()
+                for chunk in self._config_chunks(store, sanitized):
+                    buffer.write(chunk)
+                config_dict[store] = buffer.getvalue()
 
         return config_dict
 
-    def _get_running_config(self, sanitized):
-        if sanitized:
-            return self.device.send_command("show configuration")
-        self.device.config_mode()
-        config = self.device.send_command("show")
-        config = config[: config.rfind("\n")]
-        self.device.exit_config_mode()
-        return config
+    def _config_chunks(self, store, sanitized):
+        """
+        Yield a configuration store in chunks as read from the device. The
+        running configuration is read in op mode, the startup one on an exec
+        channel when the connection allows it.
+        """
+        if store == "candidate":
+            if self._new_config:
+                yield self._new_config
+            return
+
+        if store == "running":
+            command = "show configuration" if sanitized else self._ACTIVE_CONFIG_COMMAND
+            chunks = self._iter_command_chunks(command)
+        elif getattr(getattr(self.device, "remote_conn", None), "transport", None) is not None:
+            chunks = self._iter_exec_chunks(f"cat {self._BOOT_FILENAME}")
+        else:
+            chunks = self._iter_command_chunks(f"cat {self._BOOT_FILENAME}")
+
+        for chunk in chunks:
+            yield chunk.replace("\r", "")
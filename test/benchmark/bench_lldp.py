@@ -0,0 +1,131 @@
+"""
+Benchmark the LLDP getters on a synthetic 48-port switch.
+
+Compares the lldpcli JSON backend with the legacy regex over
+'show lldp neighbors detail', two neighbors per port. Every second
+neighbor is a host announcing its MAC address as port ID, which the
+regex cannot match without scanning into the following blocks.
+
+    python test/benchmark/bench_lldp.py [ports] [neighbors_per_port]
+"""
+import json
+import sys
+import timeit
+
+from napalm_vyos import vyos
+
+
+class BenchDevice(object):
+    """Serve pre-generated outputs instead of a device."""
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+
+    def send_command(self, command, **kwargs):
+        return self.outputs[command]
+
+
+def port_id(port, rid):
+    if (port + rid) % 2:
+        return "mac", "52:54:00:{:02x}:{:02x}:01".format(port, rid)
+    return "ifname", "eth{}".format(rid)
+
+
+def synthetic_text(ports, per_port):
+    blocks = []
+    for port in range(ports):
+        for rid in range(per_port):
+            blocks.append(
+                "Interface:    eth{port}, via: LLDP, RID: {rid}, Time: 1 day, 18:17:44\n"
+                "  Chassis:     \n"
+                "    ChassisID:    mac 52:54:00:{port:02x}:{rid:02x}:8a\n"
+                "    SysName:      sw{port}-{rid}\n"
+                "    SysDescr:     VyOS 1.3-rolling-202005151915\n"
+                "    MgmtIP:       10.0.{port}.{rid}\n"
+                "    Capability:   Bridge, off\n"
+                "    Capability:   Router, on\n"
+                "  Port:        \n"
+                "    PortID:       {port_id[0]} {port_id[1]}\n"
+                "    PortDescr:    uplink\n"
+                "    TTL:          120\n"
+                "    PMD autoneg:  supported: yes, enabled: yes\n"
+                "      Adv:          1000Base-T, HD: no, FD: yes\n"
+                "      MAU oper type: 1000BaseTFD - Four-pair Category 5 UTP, full duplex mode\n"
+                "  LLDP-MED:    \n"
+                "    Device Type:  Network Connectivity Device\n"
+                "    Capability:   Capabilities, yes\n"
+                "    Capability:   Inventory, yes\n"
+                "    Inventory:   \n"
+                "      Software Revision: 4.19.122-amd64-vyos\n"
+                "      Manufacturer: QEMU\n".format(port=port, rid=rid, port_id=port_id(port, rid))
+            )
+    line = "-" * 79 + "\n"
+    return line + "LLDP neighbors:\n" + line + line.join(blocks) + line
+
+
+def synthetic_json(ports, per_port):
+    interfaces = []
+    for port in range(ports):
+        for rid in range(per_port):
+            interfaces.append({
+                "eth{}".format(port): {
+                    "via": "LLDP",
+                    "rid": str(rid),
+                    "age": "1 day, 18:17:44",
+                    "chassis": {
+                        "sw{}-{}".format(port, rid): {
+                            "id": {"type": "mac",
+                                   "value": "52:54:00:{:02x}:{:02x}:8a".format(port, rid)},
+                            "descr": "VyOS 1.3-rolling-202005151915",
+                            "mgmt-ip": "10.0.{}.{}".format(port, rid),
+                            "capability": [{"type": "Bridge", "enabled": False},
+                                           {"type": "Router", "enabled": True}],
+                        }
+                    },
+                    "port": {
+                        "id": dict(zip(("type", "value"), port_id(port, rid))),
+                        "descr": "uplink",
+                        "ttl": "120",
+                        "auto-negotiation": {
+                            "supported": True, "enabled": True,
+                            "advertised": {"type": "1000Base-T", "hd": False, "fd": True},
+                            "current": "1000BaseTFD - Four-pair Category 5 UTP",
+                        },
+                    },
+                    "lldp-med": {
+                        "device-type": "Network Connectivity Device",
+                        "capability": [{"type": "Capabilities", "available": True},
+                                       {"type": "Inventory", "available": True}],
+                        "inventory": {"software": "4.19.122-amd64-vyos",
+                                      "manufacturer": "QEMU"},
+                    },
+                }
+            })
+    return json.dumps({"lldp": {"interface": interfaces}}, indent=2)
+
+
+def main(ports=48, per_port=2, number=200):
+    text = synthetic_text(ports, per_port)
+    driver = vyos.VyOSDriver("bench", "bench", "bench")
+    driver.device = BenchDevice({
+        "show lldp neighbors detail": text,
+        "lldpcli -f json show neighbors details": synthetic_json(ports, per_port),
+        vyos.VyOSDriver._CAPABILITIES_COMMAND: "Version:          VyOS 1.4\n@lldp-json\n",
+    })
+
+    cases = [
+        ("regex text", driver._get_lldp_neighbors_text),
+        ("lldpcli json", driver.get_lldp_neighbors),
+        ("lldpcli json detail", driver.get_lldp_neighbors_detail),
+    ]
+    print("{} ports, {} neighbors per port, {} bytes of text".format(
+        ports, per_port, len(text)))
+    for name, getter in cases:
+        neighbors = sum(len(n) for n in getter().values())
+        seconds = min(timeit.repeat(getter, number=number, repeat=5)) / number
+        print("{:<20} {:>8.1f} us/call  {:>4} neighbors".format(
+            name, seconds * 1e6, neighbors))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,211 @@
+"""
+Benchmark how the parsing of many devices polled at once scales over cores.
+
+Every one of 'devices' synthetic devices, with the bench_scale outputs at
+'scale' and Quagga BGP text for the TextFSM parsers, is polled from its own
+thread for the getters whose parsing is CPU bound. Outputs are served from
+memory, after an optional per command 'latency', so the time is mostly
+parsing: GIL bound when it runs inline, spread over the workers of a
+process pool given as parse executor. Pools are timed with the outputs
+over offload.SHARED_MEMORY_THRESHOLD handed over in shared memory, and with
+all of them pickled. The speedup is over inline parsing.
+
+    python test/benchmark/bench_offload.py [--devices 16] [--scale 0.25] [--workers 1 2 4]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import bench_scale
+from bench_scale import peer_address
+
+from napalm_vyos import vyos
+from napalm_vyos.utils import offload
+
+GETTERS = (
+    "get_interfaces_counters", "get_facts", "get_snmp_information", "get_bgp_neighbors_detail"
+)
+
+NEIGHBOR_DETAIL = (
+    "BGP neighbor is {ip}, remote AS {asn}, local AS 64520, external link\n"
+    "  Local Role: undefined\n"
+    "  Remote Role: undefined\n"
+    " Description: peer{n}\n"
+    "  BGP version 4, remote router ID {rid}, local router ID 192.168.1.2\n"
+    "  BGP state = Established, up for 4d23h40m\n"
+    "  Last read 00:00:02, Last write 00:00:02\n"
+    "  Hold time is 180 seconds, keepalive interval is 60 seconds\n"
+    "  Configured hold time is 180 seconds, keepalive interval is 60 seconds\n"
+    "  Configured conditional advertisements interval is 60 seconds\n"
+    "  Neighbor capabilities:\n"
+    "    4 Byte AS: advertised and received\n"
+    "    Extended Message: advertised and received\n"
+    "    AddPath:\n"
+    "      IPv4 Unicast: RX advertised and received\n"
+    "    Long-lived Graceful Restart: advertised and received\n"
+    "    Route refresh: advertised and received(new)\n"
+    "    Enhanced Route Refresh: advertised and received\n"
+    "    Address Family IPv4 Unicast: advertised and received\n"
+    "    Hostname Capability: advertised (name: vyos,domain name: n/a) "
+    "received (name: peer{n},domain name: n/a)\n"
+    "    Version Capability: not advertised not received\n"
+    "    Graceful Restart Capability: advertised and received\n"
+    "      Remote Restart timer is 120 seconds\n"
+    "      Address families by peer:\n"
+    "        none\n"
+    "  Graceful restart information:\n"
+    "    End-of-RIB send: IPv4 Unicast\n"
+    "    End-of-RIB received: IPv4 Unicast\n"
+    "    Local GR Mode: Helper*\n"
+    "    Remote GR Mode: Helper\n"
+    "    R bit: False\n"
+    "    N bit: False\n"
+    "    Timers:\n"
+    "      Configured Restart Time(sec): 120\n"
+    "      Received Restart Time(sec): 120\n"
+    "  Message statistics:\n"
+    "    Inq depth is 0\n"
+    "    Outq depth is 0\n"
+    "                         Sent       Rcvd\n"
+    "    Opens:                  2          1\n"
+    "    Notifications:          0          0\n"
+    "    Updates:              {updates:>3}        {updates:>3}\n"
+    "    Keepalives:         7189       7226\n"
+    "    Route Refresh:          0          0\n"
+    "    Capability:             0          0\n"
+    "    Total:              7192       7230\n"
+    "  Minimum time between advertisement runs is 0 seconds\n"
+    "\n"
+    " For address family: IPv4 Unicast\n"
+    "  Update group 1, subgroup 1\n"
+    "  Packet Queue length 0\n"
+    "  Community attribute sent to this neighbor(all)\n"
+    "  {prefixes} accepted prefixes\n"
+    "\n"
+    "  Connections established 1; dropped 0\n"
+    "  Last reset 4d23h40m,  Waiting for peer OPEN\n"
+    "Local host: 192.168.1.2, Local port: 179\n"
+    "Foreign host: {ip}, Foreign port: {port}\n"
+    "Nexthop: 192.168.1.2\n"
+    "Nexthop global: fe80::5054:ff:fe12:3456\n"
+    "Nexthop local: fe80::5054:ff:fe12:3456\n"
+    "BGP connection: shared network\n"
+    "BGP Connect Retry Timer in Seconds: 120\n"
+    "Estimated round trip time: 1 ms\n"
+    "Read thread: on  Write thread: on  FD used: 26\n"
+    "\n"
+)
+
+
+def synthetic_bgp_summary_text(peers):
+    lines = [
+        "",
+        "IPv4 Unicast Summary (VRF default):",
+        "BGP router identifier 192.168.1.2, local AS number 64520 vrf-id 0",
+        "BGP table version 4",
+        f"RIB entries {peers * 2}, using {peers * 192} bytes of memory",
+        f"Peers {peers}, using {peers * 723} KiB of memory",
+        "",
+        "Neighbor        V         AS   MsgRcvd   MsgSent   TblVer  InQ OutQ  Up/Down "
+        "State/PfxRcd   PfxSnt Desc",
+    ]
+    for n in range(peers):
+        if n % 20 == 19:
+            uptime, state = "never", "Active"
+        else:
+            uptime, state = "4d23h40m", str(n % 100)
+        lines.append(f"{peer_address(n):<15} 4 {65000 + n % 500:>10} {7226:>9} {7189:>9} "
+                     f"{0:>8} {0:>4} {0:>4} {uptime:>8} {state:>12} {n % 50:>8} peer{n}")
+    lines += ["", f"Total number of neighbors {peers}"]
+    return "\n".join(lines) + "\n"
+
+
+def synthetic_bgp_neighbor_text(n):
+    return NEIGHBOR_DETAIL.format(
+        ip=peer_address(n), asn=65000 + n % 500, n=n, rid=f"10.255.{n // 256}.{n % 256}",
+        updates=n % 100, prefixes=n % 100, port=40000 + n,
+    )
+
+
+class LatencyDevice(bench_scale.BenchDevice):
+    """Serve pre-generated outputs after waiting 'latency' seconds, as a device would."""
+
+    def __init__(self, outputs, latency):
+        super().__init__(outputs)
+        self.latency = latency
+
+    def send_command(self, command, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return super().send_command(command, **kwargs)
+
+
+def synthetic_outputs(scale):
+    peers = max(1, int(bench_scale.BGP_PEERS * scale))
+    outputs = bench_scale.synthetic_outputs(scale)
+    # no FRR marker, BGP is read as text and parsed with TextFSM
+    outputs[vyos.VyOSDriver._CAPABILITIES_COMMAND] = bench_scale.VERSION
+    outputs["show ip bgp summary"] = synthetic_bgp_summary_text(peers)
+    for n in range(peers):
+        outputs[f"show ip bgp neighbor {peer_address(n)}"] = synthetic_bgp_neighbor_text(n)
+    return outputs
+
+
+def poll(outputs, devices, latency, parse_executor):
+    """Poll every device once from its own thread, return the wall time."""
+    drivers = []
+    for n in range(devices):
+        driver = vyos.VyOSDriver(f"bench{n}", "bench", "bench",
+                                 optional_args={"parse_executor": parse_executor})
+        driver.device = LatencyDevice(outputs, latency)
+        drivers.append(driver)
+
+    def run(driver):
+        for getter in GETTERS:
+            getattr(driver, getter)()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(devices) as threads:
+        list(threads.map(run, drivers))
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--devices", type=int, default=16, help="devices polled at once")
+    parser.add_argument("--scale", type=float, default=0.25,
+                        help="fraction of the bench_scale sizes for each device")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per command")
+    parser.add_argument("--workers", type=int, nargs="*",
+                        help="pool sizes to time, powers of two up to the cores by default")
+    args = parser.parse_args(argv)
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or [2 ** n for n in range(cores.bit_length()) if 2 ** n <= cores]
+    outputs = synthetic_outputs(args.scale)
+    print(f"{args.devices} devices of {outputs['show interfaces detail'].count(': <')} "
+          f"interfaces, {outputs['show ip bgp summary'].count(' peer')} BGP peers and "
+          f"{outputs['show configuration'].count(chr(10)) + 1} config lines, {cores} cores")
+
+    inline = poll(outputs, args.devices, args.latency, None)
+    print(f"{'parse executor':<26} {'seconds':>9} {'speedup':>8}")
+    print(f"{'inline':<26} {inline:>9.3f} {1:>8.2f}")
+
+    threshold = offload.SHARED_MEMORY_THRESHOLD
+    for count in workers:
+        for handoff, minimum in (("shared memory", threshold), ("pickled", float("inf"))):
+            offload.SHARED_MEMORY_THRESHOLD = minimum
+            with ProcessPoolExecutor(count) as pool:
+                # start the workers outside of the timing
+                list(pool.map(abs, range(count)))
+                seconds = poll(outputs, args.devices, args.latency, pool)
+            print(f"{f'{count} workers, {handoff}':<26} {seconds:>9.3f} "
+                  f"{inline / seconds:>8.2f}")
+    offload.SHARED_MEMORY_THRESHOLD = threshold
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,537 @@
+"""
+Benchmark the getters on synthetic outputs of a very large device.
+
+Generates 10k interfaces, 100k ARP, bridge FDB and IPv6 neighbor entries,
+1,000 BGP peers spread over VRFs
+(summary and neighbor detail), a 100k line configuration and 256 CPU cores with their
+sensors and 10k firewall rules, then times the parse path of
+every getter fed from them (best of 'repeat' runs) and its memory high-water
+mark (tracemalloc peak, a separate run as tracing slows the parsers down).
+
+Results are compared with the baselines stored in scale_baseline.json for the
+same scale; a getter slower or hungrier than its baseline by more than the
+threshold is flagged and the benchmark exits with status 1. Timings depend on
+the machine: save the baselines on the one the comparison runs on.
+
+    python test/benchmark/bench_scale.py [--scale 0.1] [--repeat 3] [--threshold 0.25] [--save]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+from napalm_vyos import vyos
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scale_baseline.json")
+
+INTERFACES = 10000
+ARP_ENTRIES = 100000
+FDB_ENTRIES = 100000
+IPV6_NEIGHBORS = 100000
+BGP_PEERS = 1000
+CONFIG_LINES = 100000
+USERS = 100
+CPU_CORES = 256
+FIREWALL_RULES = 10000
+
+# increases below these are noise, whatever the threshold
+MIN_DELTA = {"seconds": 0.001, "peak_bytes": 65536}
+
+VERSION = (
+    "Version:          VyOS 1.4-rolling-202301260317\n"
+    "Release train:    current\n"
+    "Built by:         autobuild@vyos.net\n"
+    "Built on:         Thu 26 Jan 2023 03:17 UTC\n"
+    "Build UUID:       2f2ef4c6-5a15-4c5e-b7ea-2ef3de44bd06\n"
+    "Architecture:     x86_64\n"
+    "Boot via:         installed image\n"
+    "System type:      KVM guest\n"
+    "Hardware vendor:  QEMU\n"
+    "Hardware model:   Standard PC (i440FX + PIIX, 1996)\n"
+    "Hardware S/N:     0\n"
+    "Hardware UUID:    9728b94a-52fa-4c1a-ac83-7c6ca76f6f13\n"
+)
+
+CAPABILITIES = (
+    "@frr FRRouting 8.4.2 (vyos) on Linux(5.15.90-amd64-vyos).\n"
+    "@ip-json\n"
+    "@lldp-json\n"
+    "@chrony\n"
+    "@nft-json\n"
+)
+
+MEMINFO = (
+    "MemTotal:       263921400 kB\n"
+    "MemFree:        201427820 kB\n"
+    "MemAvailable:   240124508 kB\n"
+    "Buffers:          1049212 kB\n"
+    "Cached:          36228640 kB\n"
+    "SwapTotal:              0 kB\n"
+)
+
+INTERFACE_DETAIL = (
+    "{0}: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc pfifo_fast state UP group "
+    "default qlen 1000\n"
+    "    link/ether {1} brd ff:ff:ff:ff:ff:ff\n"
+    "    inet {2}/24 brd 10.{3}.{4}.255 scope global {0}\n"
+    "    RX:  bytes    packets     errors    dropped    overrun      mcast\n"
+    "    {5:>10} {6:>10} {7:>10} {8:>10} {9:>10} {10:>10}\n"
+    "    TX:  bytes    packets     errors    dropped    carrier collisions\n"
+    "    {11:>10} {12:>10} {13:>10} {14:>10} {15:>10} {16:>10}\n"
+)
+
+class BenchDevice(object):
+    """Serve pre-generated outputs instead of a device."""
+
+    RETURN = "\n"
+    base_prompt = "vyos@vyos"
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.channel = []
+
+    def send_command(self, command, **kwargs):
+        return self.outputs[command]
+
+    def write_channel(self, out_data):
+        """Queue the output of a framed command, in 64 KiB reads."""
+        match = re.match(r"^echo (\S+); (.*); echo (\S+)\n$", out_data, re.DOTALL)
+        begin, command, end = (match.group(i).replace('""', "") for i in (1, 2, 3))
+        output = f"{begin}\n{self.outputs[command].rstrip()}\n{end}\n{self.base_prompt}:~$ "
+        self.channel = [output[i:i + 65536] for i in range(0, len(output), 65536)]
+
+    def read_channel(self):
+        return self.channel.pop(0) if self.channel else ""
+
+
+def interface_name(n):
+    return f"eth{n}"
+
+
+def interface_address(n):
+    return f"10.{n // 256 % 256}.{n % 256}.1"
+
+
+def mac_address(n, prefix="00:50:56"):
+    return f"{prefix}:{n >> 16 & 255:02x}:{n >> 8 & 255:02x}:{n & 255:02x}"
+
+
+def peer_address(n):
+    return f"172.{16 + n // 65536}.{n // 256 % 256}.{n % 256}"
+
+
+def synthetic_config(interfaces, peers, users, lines):
+    """
+    Return the configuration tree as (path, value) leaves, the interfaces,
+    system, BGP and SNMP sections padded with firewall rules up to 'lines'
+    lines once rendered.
+    """
+    leaves = []
+    for n in range(interfaces):
+        path = ("interfaces", f"ethernet {interface_name(n)}")
+        leaves += [
+            (path, f"address {interface_address(n)}/24"),
+            (path, f"description \"port {n}\""),
+            (path, "duplex auto"),
+            (path, f"hw-id {mac_address(n)}"),
+            (path, "speed auto" if n % 2 else "speed 1000"),
+        ]
+    for n in range(peers):
+        path = ("protocols", "bgp 64520", f"neighbor {peer_address(n)}")
+        leaves.append((path, f"remote-as {65000 + n % 500}"))
+    for n in range(users):
+        path = ("system", "login", f"user user{n}")
+        leaves += [
+            (path + ("authentication",), f"encrypted-password $6$salt{n}$hash"),
+            (path + ("authentication", f"public-keys user{n}@example.net"),
+             f"key AAAAB3NzaC1yc2E{n}"),
+            (path + ("authentication", f"public-keys user{n}@example.net"), "type ssh-rsa"),
+            (path, f"level {'admin' if n % 2 else 'operator'}"),
+        ]
+    leaves += [
+        (("system",), "host-name vyos-scale"),
+        (("system",), "domain-name example.net"),
+        (("service", "snmp", "community public"), "authorization ro"),
+        (("service", "snmp"), "contact noc@example.net"),
+        (("service", "snmp"), "location lab"),
+    ]
+
+    # a rule renders as 7 lines, the firewall and name blocks add 4
+    missing = lines - render_config(leaves).count("\n") - 1 - 4
+    for rule in range(1, -(-missing // 7) + 1):
+        path = ("firewall", "name WAN-IN", f"rule {rule}")
+        leaves += [
+            (path, "action accept"),
+            (path + ("destination",), f"port {1024 + rule % 60000}"),
+            (path, "protocol tcp"),
+        ]
+    return leaves
+
+
+def render_config(leaves):
+    """Render leaves as 'show configuration' does, grouping them by path."""
+    tree = {}
+    for path, value in leaves:
+        node = tree
+        for element in path:
+            node = node.setdefault(element, {})
+        node.setdefault(None, []).append(value)
+
+    out = []
+
+    def render(node, depth):
+        indent = "    " * depth
+        for value in node.get(None, []):
+            out.append(f"{indent}{value}")
+        for key, child in node.items():
+            if key is not None:
+                out.append(f"{indent}{key} {{")
+                render(child, depth + 1)
+                out.append(f"{indent}}}")
+
+    render(tree, 0)
+    return "\n".join(out)
+
+
+def render_commands(leaves):
+    """Render leaves as 'show configuration commands' does."""
+    lines = []
+    for path, value in leaves:
+        key, _, argument = value.partition(" ")
+        words = " ".join(path + (key,))
+        if argument and not argument.startswith("'"):
+            argument = "'" + argument.strip('"') + "'"
+        lines.append(f"set {words} {argument}".rstrip())
+    return "\n".join(lines)
+
+
+def synthetic_interfaces(interfaces):
+    lines = [
+        "Codes: S - State, L - Link, u - Up, D - Down, A - Admin Down",
+        "Interface        IP Address                        S/L  Description",
+        "---------        ----------                        ---  -----------",
+    ]
+    for n in range(interfaces):
+        state = "u/D" if n % 10 == 9 else "u/u"
+        lines.append(f"{interface_name(n):<16} {interface_address(n) + '/24':<33} "
+                     f"{state}  port {n}")
+    lines.append(f"{'lo':<16} {'127.0.0.1/8':<33} u/u")
+    lines.append(f"{'':<16} ::1/128")
+    return "\n".join(lines) + "\n"
+
+
+def synthetic_interfaces_detail(interfaces):
+    blocks = []
+    for n in range(interfaces):
+        blocks.append(INTERFACE_DETAIL.format(
+            interface_name(n), mac_address(n), interface_address(n), n // 256 % 256, n % 256,
+            35960043 + n, 464584 + n, 0, n % 7, 0, n % 11,
+            32776498 + n, 279273 + n, 0, 0, 0, 0,
+        ))
+    return "".join(blocks)
+
+
+def synthetic_arp(entries):
+    lines = ["Address                  HWtype  HWaddress           Flags Mask            Iface"]
+    for n in range(entries):
+        address = f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}"
+        interface = interface_name(n % 48)
+        if n % 100 == 99:
+            lines.append(f"{address:<24}         (incomplete)                              "
+                         f"{interface}")
+        else:
+            lines.append(f"{address:<24} ether   {mac_address(n, '52:54:00')}   C"
+                         f"                     {interface}")
+    return "\n".join(lines) + "\n"
+
+
+def synthetic_fdb(entries):
+    records = []
+    for n in range(entries):
+        records.append({"mac": mac_address(n, "52:54:00"), "ifname": interface_name(n % 48),
+                        "vlan": 1 + n % 4094, "used": n % 300, "updated": n % 300,
+                        "flags": [], "flags_ext": [], "master": "br0", "state": ""})
+        if n % 1000 == 0:
+            # own addresses of the ports, left out of the table
+            records.append({"mac": "33:33:00:00:00:01", "ifname": interface_name(n % 48),
+                            "flags": ["self"], "flags_ext": [], "state": "permanent"})
+    return json.dumps(records, separators=(",", ":")) + "\n"
+
+
+def synthetic_ipv6_neighbors(entries):
+    states = ["REACHABLE", "STALE", "STALE", "DELAY", "FAILED"]
+    records = []
+    for n in range(entries):
+        record = {"dst": f"2001:db8:{n >> 16:x}:{n & 0xffff:x}::1",
+                  "dev": interface_name(n % 48), "used": n % 60, "confirmed": n % 900,
+                  "updated": n % 60, "probes": 0, "state": [states[n % 5]]}
+        if n % 5 != 4:
+            record["lladdr"] = mac_address(n, "52:54:01")
+        records.append(record)
+    return json.dumps(records, separators=(",", ":")) + "\n"
+
+
+def peer_vrf(n):
+    """One peer in ten is in one of three customer VRFs."""
+    return f"CUSTOMER{n % 3}" if n % 10 == 9 else "default"
+
+
+def synthetic_bgp_summary(peers):
+    summary = {}
+    for n in range(peers):
+        vrf = peer_vrf(n)
+        table = summary.setdefault(vrf, {}).setdefault("ipv4Unicast", {
+            "routerId": "192.168.1.2", "as": 64520, "vrfName": vrf, "peers": {},
+        })
+        peer = {"remoteAs": 65000 + n % 500, "localAs": 64520, "version": 4,
+                "msgRcvd": 7226, "msgSent": 7189, "tableVersion": 0, "outq": 0, "inq": 0,
+                "desc": f"peer{n}", "connectionsEstablished": 1, "connectionsDropped": 0}
+        if n % 20 == 19:
+            peer.update(peerUptime="never", peerUptimeMsec=0, state="Active",
+                        peerState="OK")
+        else:
+            peer.update(peerUptime="4d23h40m", peerUptimeMsec=430800000,
+                        pfxRcd=n % 100, pfxSnt=n % 50, state="Established", peerState="OK")
+        table["peers"][peer_address(n)] = peer
+    return json.dumps(summary, separators=(",", ":")) + "\n"
+
+
+def synthetic_bgp_neighbors(peers):
+    neighbors = {}
+    for n in range(peers):
+        vrf = peer_vrf(n)
+        instance = neighbors.setdefault(vrf, {"vrfId": 0, "vrfName": vrf})
+        instance[peer_address(n)] = {
+            "remoteAs": 65000 + n % 500, "localAs": 64520, "nbrExternalLink": True,
+            "nbrDesc": f"peer{n}", "bgpVersion": 4,
+            "remoteRouterId": f"10.255.{n // 256}.{n % 256}", "localRouterId": "192.168.1.2",
+            "bgpState": "Established", "bgpTimerUpMsec": 430800000,
+            "bgpTimerHoldTimeMsecs": 180000, "bgpTimerKeepAliveIntervalMsecs": 60000,
+            "bgpTimerConfiguredHoldTimeMsecs": 180000,
+            "bgpTimerConfiguredKeepAliveIntervalMsecs": 60000,
+            "neighborCapabilities": {"4byteAs": "advertisedAndReceived",
+                                     "routeRefresh": "advertisedAndReceivedOldNew"},
+            "messageStats": {"depthInq": 0, "depthOutq": 0, "opensSent": 2, "opensRecv": 1,
+                             "updatesSent": n % 100, "updatesRecv": n % 100,
+                             "keepalivesSent": 7189, "keepalivesRecv": 7226,
+                             "totalSent": 7192, "totalRecv": 7230},
+            "addressFamilyInfo": {"ipv4Unicast": {
+                "updateGroupId": 1, "subGroupId": 1, "packetQueueLength": 0,
+                "commAttriSentToNbr": "all", "acceptedPrefixCounter": n % 100,
+                "sentPrefixCounter": n % 50,
+            }},
+            "connectionsEstablished": 1, "connectionsDropped": 0,
+            "lastResetDueTo": "Waiting for peer OPEN",
+            "hostLocal": "192.168.1.2", "portLocal": 179,
+            "hostForeign": peer_address(n), "portForeign": 40000 + n,
+            "nexthop": "192.168.1.2", "bgpConnection": "sharedNetwork",
+            "connectRetryTimer": 120, "readThread": "on", "writeThread": "on",
+        }
+    return json.dumps(neighbors, separators=(",", ":")) + "\n"
+
+
+def synthetic_environment(cores):
+    stat = ["cpu  0 0 0 0 0 0 0 0 0 0"]
+    for n in range(cores):
+        stat.append(f"cpu{n} {24985 + n} 58 {11203 + n} {2914120 - n} 1795 0 902 0 0 0")
+    stat += ["ctxt 8134557", "btime 1700000000"]
+
+    # a package thermal zone and a coretemp chip per 8 cores, a sensor per core
+    sensors = []
+    for package in range((cores + 7) // 8):
+        zone = f"/sys/class/thermal/thermal_zone{package}"
+        sensors += [f"{zone}/type:x86_pkg_temp", f"{zone}/temp:{40000 + package * 100}",
+                    f"{zone}/trip_point_0_type:critical", f"{zone}/trip_point_0_temp:100000"]
+        hwmon = f"/sys/class/hwmon/hwmon{package}"
+        sensors.append(f"{hwmon}/name:coretemp")
+        for n in range(package * 8, min(cores, package * 8 + 8)):
+            sensor = f"{hwmon}/temp{n % 8 + 1}"
+            sensors += [f"{sensor}_label:Core {n}", f"{sensor}_input:{45000 + n * 10}",
+                        f"{sensor}_max:84000", f"{sensor}_crit:100000"]
+    return "\n".join(stat) + "\n" + MEMINFO + "\n".join(sensors) + "\n"
+
+
+def synthetic_ruleset(rules):
+    """Firewall rules in 100 rule sets of the forward chain, and NAT rules."""
+    items = [{"metainfo": {"version": "1.0.6", "json_schema_version": 1}},
+             {"table": {"family": "ip", "name": "vyos_filter", "handle": 1}}]
+    for n in range(rules):
+        chain, number = f"NAME_SET{n % 100}", 10 * (n // 100 + 1)
+        if n < 100:
+            items.append({"chain": {"family": "ip", "table": "vyos_filter", "name": chain,
+                                    "handle": n + 1}})
+        table, comment = "vyos_filter", f"SET{n % 100}-{number}"
+        if n % 20 == 19:
+            table, chain, comment = "vyos_nat", "POSTROUTING", f"SRC-NAT-{n}"
+        items.append({"rule": {
+            "family": "ip", "table": table, "chain": chain, "handle": 1000 + n,
+            "comment": comment,
+            "expr": [
+                {"match": {"op": "==", "left": {"payload": {"protocol": "ip", "field": "saddr"}},
+                           "right": {"prefix": {"addr": peer_address(n), "len": 32}}}},
+                {"match": {"op": "==", "left": {"payload": {"protocol": "tcp", "field": "dport"}},
+                           "right": 1024 + n % 60000}},
+                {"counter": {"packets": n * 37, "bytes": n * 2960}},
+                {"accept": None},
+            ],
+        }})
+    return json.dumps({"nftables": items}, separators=(",", ":")) + "\n"
+
+
+def synthetic_outputs(scale):
+    interfaces = max(1, int(INTERFACES * scale))
+    peers = max(1, int(BGP_PEERS * scale))
+    leaves = synthetic_config(interfaces, peers, USERS, int(CONFIG_LINES * scale))
+    config = render_config(leaves)
+
+    outputs = {
+        "show interfaces": synthetic_interfaces(interfaces),
+        "show interfaces detail": synthetic_interfaces_detail(interfaces),
+        "show arp": synthetic_arp(max(1, int(ARP_ENTRIES * scale))),
+        "show bgp vrf all summary json": synthetic_bgp_summary(peers),
+        "show bgp vrf all neighbors json": synthetic_bgp_neighbors(peers),
+        "bridge -j -s fdb show": synthetic_fdb(max(1, int(FDB_ENTRIES * scale))),
+        "ip -j -s -6 neigh show": synthetic_ipv6_neighbors(
+            max(1, int(IPV6_NEIGHBORS * scale))
+        ),
+        "show configuration": config,
+        "show configuration commands": render_commands(leaves),
+        vyos.VyOSDriver._ACTIVE_CONFIG_COMMAND: config,
+        f"cat {vyos.VyOSDriver._BOOT_FILENAME}": config,
+        vyos.VyOSDriver._CAPABILITIES_COMMAND: VERSION + CAPABILITIES,
+        "cat /proc/uptime | awk '{print $1}'": "1893341.53",
+        "sudo nft -j list ruleset": synthetic_ruleset(max(1, int(FIREWALL_RULES * scale))),
+        vyos.VyOSDriver._ENVIRONMENT_COMMAND: synthetic_environment(
+            max(1, int(CPU_CORES * scale))
+        ),
+    }
+    return outputs
+
+
+def getters(driver):
+    return [
+        ("get_interfaces", driver.get_interfaces, len),
+        ("get_interfaces_ip", driver.get_interfaces_ip, len),
+        ("get_interfaces_counters", driver.get_interfaces_counters, len),
+        ("get_arp_table", driver.get_arp_table, len),
+        ("get_mac_address_table", driver.get_mac_address_table, len),
+        # streamed tables are counted, not kept, as a consumer would
+        ("iter_mac_address_table",
+         lambda: sum(1 for _ in driver.iter_mac_address_table()), int),
+        ("get_ipv6_neighbors_table", driver.get_ipv6_neighbors_table, len),
+        ("iter_ipv6_neighbors", lambda: sum(1 for _ in driver.iter_ipv6_neighbors()), int),
+        ("get_bgp_neighbors", driver.get_bgp_neighbors,
+         lambda result: sum(len(instance["peers"]) for instance in result.values())),
+        ("get_bgp_neighbors_detail", driver.get_bgp_neighbors_detail,
+         lambda result: sum(len(peers) for instance in result.values()
+                            for peers in instance.values())),
+        ("get_facts", driver.get_facts, lambda result: len(result["interface_list"])),
+        ("get_snmp_information", driver.get_snmp_information,
+         lambda result: len(result["community"])),
+        ("get_users", driver.get_users, len),
+        ("get_environment", driver.get_environment, lambda result: len(result["cpu"])),
+        ("get_firewall_counters", driver.get_firewall_counters, len),
+        ("get_firewall_columnar",
+         lambda: driver.get_firewall_counters(columnar=True), lambda result: len(result["rule"])),
+        ("get_config", driver.get_config,
+         lambda result: result["running"].count("\n") + result["startup"].count("\n")),
+    ]
+
+
+def measure(function, repeat):
+    """Return the best wall time of 'repeat' calls, the peak memory and the result."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        del result
+
+    tracemalloc.start()
+    try:
+        result = function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def compare(results, baseline, threshold):
+    """Return the (getter, metric, baseline, measured) exceeding the threshold."""
+    regressions = []
+    for name, measured in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric, noise in MIN_DELTA.items():
+            if measured[metric] > max(reference[metric] * (1 + threshold),
+                                      reference[metric] + noise):
+                regressions.append((name, metric, reference[metric], measured[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="fraction of the default sizes to generate")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per getter")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative increase over the baseline flagged as regression")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file")
+    parser.add_argument("--save", action="store_true",
+                        help="store the results as baseline for this scale")
+    parser.add_argument("--only", nargs="*", help="getters to run")
+    args = parser.parse_args(argv)
+
+    outputs = synthetic_outputs(args.scale)
+    driver = vyos.VyOSDriver("bench", "bench", "bench")
+    driver.device = BenchDevice(outputs)
+
+    print(f"scale {args.scale}: {outputs['show interfaces detail'].count(': <')} interfaces, "
+          f"{outputs['show arp'].count(chr(10)) - 1} ARP entries, "
+          f"{outputs['show bgp vrf all summary json'].count('remoteAs')} BGP peers, "
+          f"{outputs['show configuration'].count(chr(10)) + 1} config lines")
+    print(f"{'getter':<26} {'seconds':>9} {'peak MB':>9} {'items':>8}")
+
+    results = {}
+    for name, getter, count in getters(driver):
+        if args.only and name not in args.only:
+            continue
+        seconds, peak, result = measure(getter, args.repeat)
+        results[name] = {"seconds": round(seconds, 6), "peak_bytes": peak}
+        print(f"{name:<26} {seconds:>9.4f} {peak / 1e6:>9.1f} {count(result):>8}")
+
+    try:
+        with open(args.baseline) as baseline_file:
+            baselines = json.load(baseline_file)
+    except FileNotFoundError:
+        baselines = {}
+    key = str(args.scale)
+
+    if args.save:
+        baselines[key] = dict(baselines.get(key, {}), **results)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        print(f"baseline for scale {key} saved to {args.baseline}")
+        return 0
+
+    if key not in baselines:
+        print(f"no baseline for scale {key} in {args.baseline}, run with --save")
+        return 0
+
+    regressions = compare(results, baselines[key], args.threshold)
+    for name, metric, reference, measured in regressions:
+        print(f"REGRESSION {name} {metric}: {measured} vs baseline {reference} "
+              f"(+{(measured / reference - 1) * 100:.0f}%)")
+    if not regressions:
+        print(f"no regression beyond {args.threshold:.0%} of the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Benchmark VyOSDriver end to end over SSH against the VyOS simulator.
+
+For each injected round trip latency, measures open(), a getter sending two
+small commands (get_environment), a getter reading one large output
+(get_interfaces_counters) and the throughput of that read, with buffered
+send_command and with the streamed reader.
+
+    python test/benchmark/bench_ssh.py [size_bytes] [bandwidth_bytes_per_s]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator import VyOSSimulator  # noqa: E402
+from napalm_vyos.vyos import VyOSDriver  # noqa: E402
+
+LATENCIES = (0.0, 0.01, 0.05)
+
+INTERFACE = (
+    "eth{0}: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc pfifo_fast state UP group "
+    "default qlen 1000\n"
+    "    link/ether 00:50:56:86:{1:02x}:{2:02x} brd ff:ff:ff:ff:ff:ff\n"
+    "    inet 10.{1}.{2}.1/24 brd 10.{1}.{2}.255 scope global eth{0}\n"
+    "    RX:  bytes    packets     errors    dropped    overrun      mcast\n"
+    "      35960043     464584          0        221          0        407\n"
+    "    TX:  bytes    packets     errors    dropped    carrier collisions\n"
+    "      32776498     279273          0          0          0          0\n"
+)
+
+
+def synthetic_interfaces(size):
+    blocks = []
+    total = 0
+    while total < size:
+        n = len(blocks)
+        blocks.append(INTERFACE.format(n, n // 256 % 256, n % 256))
+        total += len(blocks[-1])
+    return "".join(blocks), len(blocks)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main(size=2000000, bandwidth=None):
+    output, interfaces = synthetic_interfaces(size)
+    print(f"{interfaces} interfaces, {len(output)} bytes of 'show interfaces detail'"
+          + (f", {bandwidth} B/s" if bandwidth else ""))
+    print(f"{'latency':>8} {'open':>7} {'env':>7} {'counters':>9} {'MB/s':>6} {'stream':>7}"
+          f" {'MB/s':>6}")
+
+    for latency in LATENCIES:
+        simulator = VyOSSimulator(
+            cases=["test_get_environment/normal"],
+            outputs={"show interfaces detail": output},
+            latency=latency,
+            bandwidth=bandwidth,
+        )
+        port = simulator.start()
+        device = VyOSDriver("127.0.0.1", "vyos", "vyos", timeout=60,
+                            optional_args={"port": port})
+        try:
+            open_time, _ = timed(device.open)
+            environment_time, _ = timed(device.get_environment)
+            counters_time, counters = timed(device.get_interfaces_counters)
+            assert len(counters) == interfaces
+            stream_time, received = timed(
+                lambda: sum(map(len, device._iter_command_chunks("show interfaces detail")))
+            )
+        finally:
+            device.close()
+            simulator.stop()
+
+        print(f"{latency:>7.3f}s {open_time:>6.2f}s {environment_time:>6.3f}s "
+              f"{counters_time:>8.3f}s {len(output) / counters_time / 1e6:>6.1f} "
+              f"{stream_time:>6.3f}s {received / stream_time / 1e6:>6.1f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,73 @@
+"""End-to-end tests of VyOSDriver over SSH against the VyOS simulator."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator import VyOSSimulator  # noqa: E402
+from napalm_vyos.vyos import VyOSDriver  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def simulator():
+    simulator = VyOSSimulator(
+        cases=["test_get_environment/normal", "test_traceroute/normal"],
+        files={"/config/config.boot": "system {\n    host-name vyos\n}\n"},
+    )
+    simulator.port = simulator.start()
+    yield simulator
+    simulator.stop()
+
+
+@pytest.fixture(scope="module")
+def device(simulator):
+    device = VyOSDriver("127.0.0.1", "vyos", "vyos", timeout=10,
+                        optional_args={"port": simulator.port, "auto_tune": True})
+    device.open()
+    yield device
+    device.close()
+
+
+def test_open(device):
+    """open() prepares the session and measures the round trip time."""
+    assert device.device.base_prompt == "vyos@vyos"
+    assert device.timing["rtt"] > 0
+
+
+def test_get_environment(device):
+    """Replayed command outputs go through netmiko prompt handling."""
+    assert device.get_environment()["memory"] == {"available_ram": 250112,
+                                                  "used_ram": 84380}
+
+
+def test_traceroute_streamed(device):
+    """Streamed commands are framed and read back over the channel."""
+    assert sorted(device.traceroute("8.8.8.8")["success"]) == [1, 2, 3, 4]
+
+
+def test_scp_upload(device, simulator):
+    """Candidate files are uploaded with SCP."""
+    device._scp_client.scp_transfer_file(__file__, device._DEST_FILENAME)
+    with open(__file__, "rb") as f:
+        assert simulator.files[device._DEST_FILENAME] == f.read()
+
+
+def test_commit_confirm(device):
+    """commit-confirm and its confirmation both leave the session in op mode."""
+    device.load_merge_candidate(config="set system host-name confirmed\n")
+    device.commit_config(revert_in=60)
+    assert not device.device.check_config_mode()
+    device.confirm_commit()
+    assert not device.device.check_config_mode()
+    assert device.device.find_prompt() == "vyos@vyos:~$"
+    assert device.get_environment()["memory"]["used_ram"] == 84380
+
+
+def test_delay_factor_stable(device):
+    """Command round trips do not feed back into the delay factor."""
+    delay_factor = device.delay_factor
+    for _ in range(30):
+        device.get_environment()
+    assert device.delay_factor == pytest.approx(delay_factor, rel=0.5)
@@ -0,0 +1,544 @@
+"""
+SSH server emulating a VyOS device, for integration tests and benchmarks.
+
+The op-mode and config-mode prompts, the commands netmiko and the driver
+rely on (configure, set, load, compare, commit, save, exit...) and SCP
+transfers are emulated. Any other command is answered with the output
+recorded for it under test/unit/mocked_data, so VyOSDriver goes through
+paramiko, netmiko's prompt handling and SCP like against a real router.
+
+Network latency, bandwidth, device processing time and output sizes can be
+injected:
+
+    >>> simulator = VyOSSimulator(latency=0.02, bandwidth=1000000)
+    >>> port = simulator.start()
+    >>> driver = VyOSDriver("127.0.0.1", "vyos", "vyos", optional_args={"port": port})
+
+It can also run standalone:
+
+    python test/simulator.py --port 12206 --latency 0.05
+"""
+import argparse
+import os
+import re
+import shlex
+import socket
+import threading
+import time
+
+import paramiko
+from napalm.base.test.double import BaseTestDouble
+
+MOCKED_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "unit", "mocked_data")
+
+
+class VyOSSimulator(object):
+    """
+    SSH server answering like a VyOS router.
+
+    :param mocked_data: directory laid out as test/unit/mocked_data.
+    :param cases: "test_name/case" directories searched first, in order,
+        for a command output. All others are searched after them.
+    :param outputs: dictionary of command to output, searched before the
+        mocked data. Values may be callables returning the output.
+    :param files: dictionary of path to content of the emulated filesystem,
+        read by load, cat and SCP.
+    :param password: password accepted, any when None. Public keys are
+        always accepted.
+    :param latency: seconds added before answering anything sent by the
+        client, as a network round trip would.
+    :param bandwidth: bytes per second output is sent at, unlimited when None.
+    :param command_time: seconds the device spends on each command.
+    :param output_repeat: times the output of replayed commands is repeated,
+        to grow them to a given size.
+    """
+
+    def __init__(
+        self,
+        mocked_data=MOCKED_DATA,
+        cases=(),
+        outputs=None,
+        files=None,
+        hostname="vyos",
+        username="vyos",
+        password=None,
+        latency=0.0,
+        bandwidth=None,
+        command_time=0.0,
+        output_repeat=1,
+    ):
+        self.outputs = dict(outputs or {})
+        self.files = {path: _as_bytes(content) for path, content in (files or {}).items()}
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.command_time = command_time
+        self.output_repeat = output_repeat
+        self.commands = []
+
+        self._index = self._index_mocked_data(mocked_data, cases)
+        self._host_key = paramiko.ECDSAKey.generate()
+        self._socket = None
+        self._threads = []
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _index_mocked_data(mocked_data, cases):
+        index = {}
+        directories = [os.path.join(mocked_data, case) for case in cases]
+        for root, _, _ in sorted(os.walk(mocked_data)):
+            if root not in directories:
+                directories.append(root)
+
+        for directory in directories:
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith(".text"):
+                    index.setdefault(filename[:-len(".text")], os.path.join(directory, filename))
+        return index
+
+    def output(self, command):
+        """Return the recorded output of 'command', or None."""
+        if command in self.outputs:
+            output = self.outputs[command]
+            return output() if callable(output) else output
+
+        path = self._index.get(BaseTestDouble.sanitize_text(command))
+        if path is None:
+            return None
+        with open(path) as f:
+            output = f.read()
+        if self.output_repeat > 1:
+            output = (output.rstrip("\n") + "\n") * self.output_repeat
+        return output
+
+    def start(self, address="127.0.0.1", port=0):
+        """Listen on address:port in the background, return the port."""
+        self._stop.clear()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((address, port))
+        self._socket.listen(16)
+        self._socket.settimeout(0.2)
+        self._spawn(self._accept)
+        return self._socket.getsockname()[1]
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _spawn(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _accept(self):
+        while not self._stop.is_set():
+            try:
+                client, _ = self._socket.accept()
+            except socket.timeout:
+                continue
+            self._spawn(self._serve, client)
+
+    def _serve(self, client):
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self._host_key)
+        server = _Server(self)
+        try:
+            transport.start_server(server=server)
+        except (paramiko.SSHException, EOFError):
+            return
+
+        while transport.is_active() and not self._stop.is_set():
+            channel = transport.accept(0.2)
+            if channel is None:
+                continue
+            request = server.wait_request(channel)
+            if request is None:
+                channel.close()
+            elif request == "shell":
+                self._spawn(self._shell, channel)
+            else:
+                self._spawn(self._exec, channel, request)
+        transport.close()
+
+    def send(self, channel, text):
+        """Send 'text' at the configured bandwidth, with terminal line endings."""
+        data = text.replace("\r\n", "\n").replace("\n", "\r\n").encode()
+        if not self.bandwidth:
+            channel.sendall(data)
+            return
+        chunk = max(1024, int(self.bandwidth / 50))
+        for start in range(0, len(data), chunk):
+            channel.sendall(data[start:start + chunk])
+            time.sleep(min(chunk, len(data) - start) / self.bandwidth)
+
+    def _shell(self, channel):
+        session = Session(self)
+        self.send(channel, f"Welcome to VyOS\n{session.prompt()}")
+        line = ""
+        while not self._stop.is_set():
+            try:
+                data = channel.recv(65536)
+            except (socket.timeout, EOFError):
+                continue
+            if not data:
+                break
+            if self.latency:
+                time.sleep(self.latency)
+
+            try:
+                line = self._type(channel, session, line, data.decode(errors="replace"))
+            except OSError:
+                # the client hung up while we were answering
+                break
+        channel.close()
+
+    def _type(self, channel, session, line, text):
+        """Echo typed text and run completed lines, return the pending line."""
+        echo = ""
+        for char in text:
+            if char == "\x03":
+                self.send(channel, echo + f"^C\n{session.prompt()}")
+                echo = line = ""
+            elif char == "\n":
+                self.send(channel, echo + "\n")
+                echo = ""
+                output = session.run(line)
+                line = ""
+                self.send(channel, output + session.prompt())
+            elif char != "\r":
+                echo += char
+                line += char
+        if echo:
+            self.send(channel, echo)
+        return line
+
+    def _exec(self, channel, command):
+        words = shlex.split(command)
+        if words[:1] == ["scp"] and "-t" in words:
+            self._scp_sink(channel, words[-1])
+        elif words[:1] == ["scp"] and "-f" in words:
+            self._scp_source(channel, words[-1])
+        else:
+            if self.latency:
+                time.sleep(self.latency)
+            self.send(channel, Session(self).run(command))
+            channel.send_exit_status(0)
+        channel.close()
+
+    def _scp_sink(self, channel, path):
+        reader = channel.makefile("rb")
+        channel.sendall(b"\0")
+        while True:
+            header = reader.readline()
+            if not header:
+                break
+            if header[:1] == b"C":
+                _, size, name = header[1:].decode().rstrip("\n").split(" ", 2)
+                channel.sendall(b"\0")
+                data = reader.read(int(size))
+                reader.read(1)
+                if self.bandwidth:
+                    time.sleep(len(data) / self.bandwidth)
+                target = path.rstrip("/") + "/" + name if path.endswith("/") else path
+                self.files[target] = data
+                self.commands.append(f"scp -t {target}")
+            elif header[:1] not in (b"T", b"D", b"E"):
+                break
+            channel.sendall(b"\0")
+        channel.send_exit_status(0)
+
+    def _scp_source(self, channel, path):
+        reader = channel.makefile("rb")
+        self.commands.append(f"scp -f {path}")
+        data = self.files.get(path)
+        if data is None:
+            channel.sendall(f"\x01scp: {path}: No such file or directory\n".encode())
+            channel.send_exit_status(1)
+            return
+        reader.read(1)
+        channel.sendall(f"C0644 {len(data)} {os.path.basename(path)}\n".encode())
+        reader.read(1)
+        if self.bandwidth:
+            time.sleep(len(data) / self.bandwidth)
+        channel.sendall(data + b"\0")
+        reader.read(1)
+        channel.send_exit_status(0)
+
+
+class Session(object):
+    """State of one emulated CLI session."""
+
+    FRAMED = re.compile(r"^echo (\S+); (.*); echo (\S+)$", re.DOTALL)
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.config_mode = False
+        self.changes = []
+        self.question = None
+
+    def prompt(self):
+        user = f"{self.simulator.username}@{self.simulator.hostname}"
+        if self.question is not None:
+            return ""
+        return f"{user}# " if self.config_mode else f"{user}:~$ "
+
+    def run(self, line):
+        """Run a command line, return its output followed by '[edit]' in config mode."""
+        self.simulator.commands.append(line)
+        if self.question is not None:
+            answer, self.question = self.question, None
+            output = answer(line)
+        else:
+            output = self._run_line(line)
+        if self.simulator.command_time:
+            time.sleep(self.simulator.command_time)
+        if output and not output.endswith("\n"):
+            output += "\n"
+        if self.config_mode and self.question is None:
+            output += "[edit]\n"
+        return output
+
+    def _run_line(self, line):
+        line = line.strip()
+        framed = self.FRAMED.match(line)
+        if framed is not None:
+            begin, command, end = framed.groups()
+            output = self._run_chain(command)
+            if output and not output.endswith("\n"):
+                output += "\n"
+            return f"{self._echo(begin)}\n{output}{self._echo(end)}"
+        return self._run_chain(line)
+
+    def _run_chain(self, line):
+        # configuration commands are emulated, so that modes change as on a
+        # device, even where a test double recorded the whole chain
+        output = None if self.config_mode else self.simulator.output(line)
+        if output is not None:
+            return output
+
+        outputs = []
+        for command in line.split(" && "):
+            output, success = self._run_command(command.strip())
+            if output:
+                outputs.append(output.rstrip("\n") + "\n")
+            if not success or self.question is not None:
+                break
+        return "".join(outputs)
+
+    @staticmethod
+    def _echo(word):
+        return word.replace('""', "")
+
+    def _run_command(self, command):
+        """Return the output of one command and whether it succeeded."""
+        words = command.split()
+        if not words:
+            return "", True
+
+        if self.config_mode:
+            handler = getattr(self, f"_config_{words[0].replace('-', '_')}", None)
+        else:
+            handler = getattr(self, f"_op_{words[0]}", None)
+        if handler is not None:
+            return handler(words[1:], command)
+
+        output = self.simulator.output(command)
+        if output is not None:
+            return output, True
+        if self.config_mode:
+            return f"\n  Invalid command: [{command}]\n", False
+        if words[0] in ("show", "clear", "reset", "monitor", "restart"):
+            return f"\n  Invalid command: {command}\n", False
+        return f"-vbash: {words[0]}: command not found", False
+
+    def _op_configure(self, args, command):
+        self.config_mode = True
+        return "", True
+
+    def _op_set(self, args, command):
+        # set terminal width/length
+        return "", True
+
+    def _op_echo(self, args, command):
+        return " ".join(self._echo(word) for word in args), True
+
+    def _op_cat(self, args, command):
+        return self._read(args[0])
+
+    def _op_cp(self, args, command):
+        data = self.simulator.files.get(args[0])
+        if data is None:
+            return f"cp: cannot stat '{args[0]}': No such file or directory", False
+        self.simulator.files[args[1]] = data
+        return "", True
+
+    def _read(self, path):
+        data = self.simulator.files.get(path)
+        if data is None:
+            return f"cat: {path}: No such file or directory", False
+        return data.decode(errors="replace"), True
+
+    def _config_set(self, args, command):
+        self.changes.append(f"+{command}")
+        return "", True
+
+    def _config_delete(self, args, command):
+        self.changes.append(f"-{command[len('delete '):]}")
+        return "", True
+
+    def _config_load(self, args, command):
+        data = self.simulator.files.get(args[0])
+        message = f"Loading configuration from '{args[0]}'...\n"
+        if data is None:
+            return message + "Failed to parse specified config file", False
+        self.changes.append(f"+loaded {args[0]}")
+        return message + "Load complete.  Use 'commit' to make changes effective.", True
+
+    def _config_compare(self, args, command):
+        if not self.changes:
+            return "No changes between working and active configurations.", True
+        return "\n".join(self.changes), True
+
+    def _config_commit(self, args, command):
+        if not self.changes:
+            return "No configuration changes to commit", True
+        self.changes = []
+        return "", True
+
+    def _config_commit_confirm(self, args, command):
+        def answer(line):
+            if line.strip().lower().startswith("y"):
+                self._config_commit([], "commit")
+                return "commit confirm will be automatically reboot in "\
+                       f"{args[0] if args else 10} minutes unless confirmed"
+            return "commit-confirm canceled"
+
+        self.question = answer
+        return "commit-confirm will automatically reboot in 10 minutes unless changes\n"\
+               "are confirmed.\nProceed? [confirm]", True
+
+    def _config_confirm(self, args, command):
+        return "", True
+
+    def _config_save(self, args, command):
+        return "Saving configuration to '/config/config.boot'...\nDone", True
+
+    def _config_discard(self, args, command):
+        self.changes = []
+        return "  Changes have been discarded", True
+
+    def _config_show(self, args, command):
+        output = self.simulator.output(command) or self.simulator.output("show configuration")
+        return output or "", True
+
+    def _config_run(self, args, command):
+        self.config_mode = False
+        try:
+            return self._run_command(" ".join(args))
+        finally:
+            self.config_mode = True
+
+    def _config_exit(self, args, command):
+        if self.changes and args[:1] != ["discard"]:
+            return "Cannot exit: configuration modified.\n"\
+                   "Use 'exit discard' to discard the changes and exit.", False
+        self.changes = []
+        self.config_mode = False
+        return "exit", True
+
+
+class _Server(paramiko.ServerInterface):
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.requests = {}
+        self.events = {}
+        self._lock = threading.Lock()
+
+    def _event(self, channel_id):
+        with self._lock:
+            return self.events.setdefault(channel_id, threading.Event())
+
+    def wait_request(self, channel, timeout=10):
+        if not self._event(channel.get_id()).wait(timeout):
+            return None
+        return self.requests.pop(channel.get_id())
+
+    def get_allowed_auths(self, username):
+        return "password,publickey"
+
+    def check_auth_password(self, username, password):
+        if self.simulator.password is None or password == self.simulator.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth,
+                                  pixelheight, modes):
+        return True
+
+    def check_channel_window_change_request(self, channel, width, height, pixelwidth,
+                                            pixelheight):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.requests[channel.get_id()] = "shell"
+        self._event(channel.get_id()).set()
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        self.requests[channel.get_id()] = command.decode()
+        self._event(channel.get_id()).set()
+        return True
+
+
+def _as_bytes(content):
+    return content.encode() if isinstance(content, str) else content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12206)
+    parser.add_argument("--password", default=None)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--bandwidth", type=int, default=None, help="bytes per second")
+    parser.add_argument("--command-time", type=float, default=0.0, help="seconds")
+    parser.add_argument("--output-repeat", type=int, default=1)
+    parser.add_argument("--case", action="append", default=[], help="test_name/case")
+    args = parser.parse_args()
+
+    simulator = VyOSSimulator(
+        cases=args.case,
+        password=args.password,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        command_time=args.command_time,
+        output_repeat=args.output_repeat,
+    )
+    port = simulator.start(args.address, args.port)
+    print(f"Listening on {args.address}:{port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 """Test fixtures."""
 from builtins import super
+import re
 
 import pytest
 from napalm.base.test import conftest as parent_conftest
@@ -47,20 +48,58 @@ class PatchedVyOSDriver(vyos.VyOSDriver):
     def open(self):
         pass
 
+    @property
+    def capabilities(self):
+        # each test case stands for another device, probe it every time
+        return self._probe_capabilities()
+
 
 class FakeVyOSDevice(BaseTestDouble):
     """VyOS device test double."""
 
+    RETURN = '\n'
+    base_prompt = 'vyos@vyos'
+
     def __init__(self):
         self.mode_config = False
+        self.channel = []
+        self.history = []
 
     def send_command(self, command, **kwargs):
+        self.history.append(command)
         filename = '{}.text'.format(self.sanitize_text(command))
         full_path = self.find_file(filename)
-        return self.read_txt_file(full_path)
+        output = self.read_txt_file(full_path)
+        if self.mode_config and command.split(' && ')[-1] == 'exit':
+            self.mode_config = False
+        if kwargs.get('strip_prompt') is False:
+            # as netmiko, up to the prompt of the mode the command ends in
+            output += '{}{} '.format(self.base_prompt, '#' if self.mode_config else ':~$')
+        return output
 
     def config_mode(self):
+        self.history.append('configure')
         self.mode_config = True
 
     def exit_config_mode(self):
+        self.history.append('exit')
         self.mode_config = False
+
+    def check_config_mode(self, *args, **kwargs):
+        return self.mode_config
+
+    def write_channel(self, out_data):
+        """Queue the mocked output of a framed command, in small chunks."""
+        match = re.match(r'^echo (\S+); (.*); echo (\S+)\n$', out_data, re.DOTALL)
+        if match is None:
+            return
+        begin, command, end = (match.group(i).replace('""', '') for i in (1, 2, 3))
+        output = '{}\n{}\n{}\n{}:~$ '.format(
+            begin, self.send_command(command).rstrip('\n'), end, self.base_prompt)
+        self.channel = [output[i:i + 64] for i in range(0, len(output), 64)]
+
+    def read_channel(self):
+        return self.channel.pop(0) if self.channel else ''
+
+    def find_prompt(self):
+        return '{}:~$'.format(self.base_prompt)
@@ -0,0 +1,141 @@
+"""Tests for the deduplicated configuration archive."""
+
+import os
+import random
+import re
+
+from napalm_vyos.archive import ConfigArchive
+from napalm_vyos.utils.capture import ReplayDevice
+from napalm_vyos.vyos import VyOSDriver
+
+CONFIG = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "mocked_data", "test_get_config", "normal"
+)
+
+
+def config(rules):
+    lines = ["firewall {", "    name WAN-IN {"]
+    for rule, port in rules:
+        lines += [f"        rule {rule} {{", "            action accept",
+                  "            destination {", f"                port {port}",
+                  "            }", "        }"]
+    return "\n".join(lines + ["    }", "}"]) + "\n"
+
+
+def patch(text, diff):
+    """Apply a unified diff, checking its context and removed lines."""
+    old = text.splitlines(True)
+    new = []
+    position = 0
+    for line in diff.splitlines(True)[2:]:
+        hunk = re.match(r"@@ -(\d+)(?:,(\d+))? ", line)
+        if hunk:
+            start = int(hunk.group(1)) - (hunk.group(2) != "0")
+            new += old[position:start]
+            position = start
+        elif line[0] == "+":
+            new.append(line[1:])
+        else:
+            assert old[position] == line[1:]
+            position += 1
+            if line[0] == " ":
+                new.append(line[1:])
+    return "".join(new + old[position:])
+
+
+def test_history_and_dedup(tmp_path):
+    """Unchanged snapshots write nothing, small changes only a few blocks."""
+    archive = ConfigArchive(str(tmp_path), block_lines=16)
+    rules = [(rule, 1000 + rule) for rule in range(1, 2001)]
+    first = archive.add("r1", "running", config(rules), timestamp=100)
+    stored = archive.stats()
+
+    assert archive.add("r1", "running", config(rules), timestamp=200) == first
+    assert archive.stats() == stored
+    assert archive.history("r1") == [(100.0, first)]
+
+    rules[1000] = (1001, 22)
+    second = archive.add("r1", "running", config(rules), timestamp=300)
+    assert archive.stats()["objects"] - stored["objects"] <= 3
+    assert archive.history("r1") == [(100.0, first), (300.0, second)]
+
+    assert archive.get("r1", 250) == config(rules[:1000] + [(1001, 2001)] + rules[1001:])
+    assert archive.get("r1") == config(rules)
+    assert archive.get("r1", 50) is None
+    assert archive.diff("r1", 100, 250) == ""
+
+
+def test_single_block(tmp_path):
+    """Configurations of one block, whose id is the digest of that block."""
+    archive = ConfigArchive(str(tmp_path))
+    short = "system {\n    host-name vyos\n}\n"
+    archive.add("r1", "running", short, timestamp=1)
+    assert archive.get("r1") == short
+
+    # the text of a block already stored for another configuration
+    archive = ConfigArchive(str(tmp_path / "blocks"), block_lines=8)
+    long_id = archive.add("r1", "running", config([(rule, 22) for rule in range(50)]),
+                          timestamp=1)
+    digest, _ = archive._blocks(long_id)[1]
+    block = archive._read(digest).decode()
+    assert archive.add("r2", "running", block, timestamp=1) == digest.hex()
+    assert archive.get("r2") == block
+    assert archive.diff("r2", 0, 1).endswith(
+        "".join("+" + line for line in block.splitlines(True))
+    )
+
+
+def test_history_out_of_order(tmp_path):
+    """Snapshots backfilled with older timestamps are found by time."""
+    archive = ConfigArchive(str(tmp_path))
+    late = archive.add("r1", "running", config([(1, 22)]), timestamp=300)
+    early = archive.add("r1", "running", config([(1, 80)]), timestamp=100)
+
+    assert archive.history("r1") == [(100.0, early), (300.0, late)]
+    assert archive.at("r1", 50) is None
+    assert archive.at("r1", 100) == early
+    assert archive.at("r1", 299) == early
+    assert archive.at("r1") == late
+
+
+def test_diff_applies(tmp_path):
+    """Diffs read from the changed blocks only turn one configuration into the other."""
+    archive = ConfigArchive(str(tmp_path), block_lines=8)
+    rng = random.Random(4)
+    rules = [(rule, rule) for rule in range(500)]
+    before = config(rules)
+    archive.add("r1", "running", before, timestamp=1)
+    for _ in range(5):
+        rules.insert(rng.randrange(len(rules)), (rng.randrange(10000), 1))
+        del rules[rng.randrange(len(rules))]
+        rules[rng.randrange(len(rules))] = (rng.randrange(10000), 2)
+    after = config(rules)
+    archive.add("r1", "running", after, timestamp=2)
+
+    diff = archive.diff("r1", 1, 2)
+    assert diff.startswith("--- r1 running 1\n+++ r1 running 2\n@@ ")
+    assert patch(before, diff) == after
+    assert patch(after, archive.diff("r1", 2, 1)) == before
+
+
+def test_snapshot_from_driver(tmp_path):
+    """Stores are streamed from get_config into the archive."""
+    driver = VyOSDriver("vyos", "vyos", "vyos")
+    driver.device = ReplayDevice(CONFIG)
+    archive = ConfigArchive(str(tmp_path))
+
+    ids = archive.snapshot("vyos", driver, stores=("running", "startup"), timestamp=1)
+    expected = driver.get_config()
+    assert archive.get("vyos") == expected["running"]
+    assert archive.get("vyos", store="startup") == expected["startup"]
+    assert archive.snapshot("vyos", driver, stores=("running", "startup")) == ids
+
+
+def test_snapshot_reads_requested_stores(tmp_path):
+    """Only the stores asked for are read from the device."""
+    driver = VyOSDriver("vyos", "vyos", "vyos")
+    driver.device = ReplayDevice(CONFIG)
+    archive = ConfigArchive(str(tmp_path))
+
+    archive.snapshot("vyos", driver, stores=("startup", "candidate"))
+    assert driver.device.history == [f"cat {VyOSDriver._BOOT_FILENAME}"]
@@ -0,0 +1,37 @@
+"""Tests for the device capability probe."""
+
+import os
+
+from napalm_vyos.utils.capture import ReplayDevice
+from napalm_vyos.vyos import VyOSDriver
+
+MOCKED_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mocked_data")
+
+
+def driver(case, **optional_args):
+    driver = VyOSDriver("probed", "vyos", "vyos", optional_args=optional_args)
+    driver.device = ReplayDevice(os.path.join(MOCKED_DATA, case))
+    return driver
+
+
+def test_probed_once_per_session():
+    """Getters share one probe, and pick their command from it."""
+    device = driver("test_get_lldp_neighbors/legacy_text")
+    assert device.get_lldp_neighbors() == device.get_lldp_neighbors()
+    assert device.capabilities["version"] == "1.1.7"
+    assert device.capabilities["frr_version"] is None
+    assert device.device.history == [
+        VyOSDriver._CAPABILITIES_COMMAND,
+        "show lldp neighbors detail",
+        "show lldp neighbors detail",
+    ]
+
+
+def test_cached_across_sessions():
+    """With a TTL, sessions to the same host reuse the probe of the first one."""
+    first = driver("test_get_ntp_stats/chrony", capabilities_ttl=60)
+    assert first.capabilities["chrony"] and first.capabilities["frr_version"] == "8.4.2"
+
+    second = driver("test_get_ntp_stats/chrony", capabilities_ttl=60)
+    assert second.get_ntp_peers() == first.get_ntp_peers()
+    assert second.device.history == ["chronyc -c -n sources"]
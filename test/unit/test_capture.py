@@ -0,0 +1,79 @@
+"""Tests for session capture and replay."""
+
+import os
+import tarfile
+
+import pytest
+from napalm.base.exceptions import CommandErrorException
+
+from conftest import FakeVyOSDevice
+
+from napalm_vyos.replay import ReplayDriver
+from napalm_vyos.utils.capture import Recorder, ReplayDevice, read_capture, sanitize_text
+from napalm_vyos.vyos import VyOSDriver
+
+ENVIRONMENT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "mocked_data", "test_get_environment", "normal"
+)
+
+
+def test_record_and_replay(tmp_path):
+    """A recorded session replays the same results, streamed commands included."""
+    path = str(tmp_path / "vyos.tar.xz")
+    driver = VyOSDriver("vyos", "vyos", "vyos", optional_args={"record": path})
+    driver.device = ReplayDevice(ENVIRONMENT)
+    environment = driver.get_environment()
+    command = VyOSDriver._ENVIRONMENT_COMMAND
+    streamed = list(driver._iter_command_lines(command))
+    driver.close()
+
+    with tarfile.open(path) as archive:
+        assert sorted(archive.getnames()) == [f"{sanitize_text(command)}.text", "session.json"]
+    session, _ = read_capture(path)
+    assert [(c["command"], c["streamed"]) for c in session["commands"]] == [
+        (command, False), (command, True)
+    ]
+
+    replay = ReplayDriver(path)
+    replay.open()
+    assert replay.get_environment() == environment
+    assert list(replay._iter_command_lines(command)) == streamed
+    assert replay.device.history == [command, command]
+    with pytest.raises(CommandErrorException):
+        replay.get_facts()
+
+
+def test_outputs_in_order(tmp_path):
+    """Commands answered differently are replayed in order, identical outputs stored once."""
+    recorder = Recorder(str(tmp_path / "vyos.tar.xz"))
+    for output in ("1", "2", "1"):
+        recorder.add("show interfaces counters", output, 0, 0.05)
+    path = recorder.save()
+
+    session, outputs = read_capture(path)
+    assert sorted(outputs) == ["show_interfaces_counters.1.text", "show_interfaces_counters.text"]
+
+    device = ReplayDevice(path, timing=True, speed=10)
+    assert [device.send_command("show interfaces counters") for _ in range(4)] == [
+        "1", "2", "1", "1"
+    ]
+
+
+def test_identical_outputs_of_commands(tmp_path):
+    """Commands answering the same output each get their file in the extracted case."""
+    recorder = Recorder(str(tmp_path / "vyos.tar.xz"))
+    for command, output in (("show version", ""), ("show interfaces", "eth0"),
+                            ("show interfaces", ""), ("show arp", ""), ("show arp", "")):
+        recorder.add(command, output, 0, 0.05)
+    with tarfile.open(recorder.save()) as archive:
+        archive.extractall(str(tmp_path / "case"))
+
+    device = FakeVyOSDevice()
+    device.find_file = lambda filename: str(tmp_path / "case" / filename)
+    assert [device.send_command(c) for c in ("show version", "show interfaces", "show arp")] == [
+        "", "eth0", ""
+    ]
+    assert sorted(os.listdir(str(tmp_path / "case"))) == [
+        "session.json", "show_arp.text", "show_interfaces.1.text", "show_interfaces.text",
+        "show_version.text",
+    ]
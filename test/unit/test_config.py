@@ -0,0 +1,45 @@
+"""Tests for configuration methods."""
+
+from napalm.base.exceptions import CommitError, ReplaceConfigException
+from napalm.base.test.getters import wrap_test_cases
+
+
+import pytest
+
+
+@pytest.mark.usefixtures("set_device_parameters")
+class TestConfig(object):
+    """Test commit_config, confirm_commit and rollback."""
+
+    @wrap_test_cases
+    def test_commit_config_confirm(self, test_case):
+        """Test commit-confirm followed by confirm_commit."""
+        self.device.device.history = []
+        self.device.commit_config(revert_in=300)
+        assert not self.device.device.check_config_mode()
+        pending_after_commit = self.device.has_pending_commit()
+        if pending_after_commit:
+            self.device.confirm_commit()
+        else:
+            with pytest.raises(CommitError):
+                self.device.confirm_commit()
+        assert not self.device.device.check_config_mode()
+
+        return {
+            "pending_after_commit": pending_after_commit,
+            "pending_after_confirm": self.device.has_pending_commit(),
+            "history": self.device.device.history,
+        }
+
+    @wrap_test_cases
+    def test_rollback_revision(self, test_case):
+        """Test rollback to a revision of the commit archive."""
+        self.device.device.history = []
+        error = None
+        try:
+            self.device.rollback(revision=2)
+        except (CommitError, ReplaceConfigException) as e:
+            error = type(e).__name__
+        assert not self.device.device.check_config_mode()
+
+        return {"error": error, "history": self.device.device.history}
@@ -0,0 +1,95 @@
+"""Tests for the staged deployment engine."""
+
+from napalm.base.exceptions import CommitError
+
+from napalm_vyos.deploy import Deployment
+
+
+class FakeDriver(object):
+    """Driver recording the configuration methods called on it."""
+
+    def __init__(self, diff="+set system host-name vyos", fail_commit=False, healthy=True):
+        self.device = object()
+        self.diff = diff
+        self.fail_commit = fail_commit
+        self.healthy = healthy
+        self.calls = []
+
+    def load_merge_candidate(self, filename=None, config=None):
+        self.calls.append("load")
+
+    def compare_config(self):
+        self.calls.append("compare")
+        return self.diff
+
+    def commit_config(self, message="", revert_in=None):
+        self.calls.append("commit")
+        if self.fail_commit:
+            raise CommitError("Commit failed")
+
+    def confirm_commit(self):
+        self.calls.append("confirm")
+
+    def discard_config(self):
+        self.calls.append("discard")
+
+    def rollback(self):
+        self.calls.append("rollback")
+
+
+def test_deployment_waves():
+    """Devices with a diff are committed in waves, the others discarded."""
+    drivers = {f"r{i}": FakeDriver() for i in range(5)}
+    drivers["r5"] = FakeDriver(diff="")
+
+    deployment = Deployment(drivers, config="set system host-name vyos",
+                            wave_size=2, first_wave_size=1, concurrency=2)
+    report = deployment.run()
+
+    assert [report[f"r{i}"]["wave"] for i in range(5)] == [0, 1, 1, 2, 2]
+    assert all(report[f"r{i}"]["status"] == "committed" for i in range(5))
+    assert report["r5"]["status"] == "unchanged"
+    assert drivers["r5"].calls == ["load", "compare", "discard"]
+    assert set(report["r0"]["timings"]) == {"stage", "compare", "commit"}
+
+
+def test_deployment_rollback_on_failure():
+    """A failed health gate rolls back every committed device."""
+    drivers = {f"r{i}": FakeDriver() for i in range(4)}
+    drivers["r2"].healthy = False
+
+    deployment = Deployment(drivers, config="set system host-name vyos", wave_size=2,
+                            health_check=lambda driver: driver.healthy, revert_in=60)
+    report = deployment.run()
+
+    assert report["r0"]["status"] == "rolled_back"
+    assert report["r1"]["status"] == "rolled_back"
+    assert report["r2"]["status"] == "failed"
+    assert report["r2"]["error"] == "health: health check did not pass (rolled back)"
+    assert report["r3"]["status"] == "rolled_back"
+    assert drivers["r0"].calls == ["load", "compare", "commit", "confirm", "rollback"]
+
+
+def test_deployment_tolerated_failure():
+    """Failures up to max_failures do not abort the deployment."""
+    drivers = {f"r{i}": FakeDriver() for i in range(3)}
+    drivers["r0"].fail_commit = True
+
+    report = Deployment(drivers, config="set", wave_size=1, max_failures=1).run()
+
+    assert report["r0"]["status"] == "failed"
+    assert report["r0"]["error"] == "commit: Commit failed"
+    assert report["r1"]["status"] == "committed"
+    assert report["r2"]["status"] == "committed"
+
+
+def test_deployment_stops_committing_past_max_failures():
+    """Devices of a wave not committed yet once failures exceed max_failures are discarded."""
+    drivers = {f"r{i}": FakeDriver() for i in range(4)}
+    drivers["r0"].fail_commit = True
+
+    report = Deployment(drivers, config="set", wave_size=4, concurrency=1).run()
+
+    assert report["r0"]["status"] == "failed"
+    assert [report[f"r{i}"]["status"] for i in range(1, 4)] == ["discarded"] * 3
+    assert drivers["r1"].calls == ["load", "compare", "discard"]
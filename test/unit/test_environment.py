@@ -0,0 +1,68 @@
+"""Tests for get_environment sampling."""
+
+from napalm_vyos.vyos import VyOSDriver
+
+
+class Device(object):
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+
+    def send_command(self, command, **kwargs):
+        assert command == VyOSDriver._ENVIRONMENT_COMMAND
+        return self.outputs.pop(0)
+
+
+def sample(cpus, meminfo, sensors=""):
+    stat = "".join(f"cpu{n} {' '.join(map(str, counters))}\n" for n, counters in enumerate(cpus))
+    return f"cpu  0 0 0 0 0 0 0 0 0 0\n{stat}{meminfo}{sensors}"
+
+
+def test_cpu_usage_between_calls():
+    """Usage is measured over the interval between calls, since boot at first."""
+    meminfo = "MemTotal: 1000 kB\nMemFree: 100 kB\nBuffers: 50 kB\nCached: 250 kB\n"
+    driver = VyOSDriver("vyos", "vyos", "vyos")
+    driver.device = Device([
+        sample([(10, 0, 10, 60, 20, 0, 0, 0), (0, 0, 0, 100, 0, 0, 0, 0)], meminfo),
+        sample([(40, 0, 30, 110, 20, 0, 0, 0), (0, 0, 0, 100, 0, 0, 0, 0)], meminfo),
+        sample([(5, 0, 5, 10, 0, 0, 0, 0), (0, 0, 50, 150, 0, 0, 0, 0)], meminfo),
+    ])
+
+    first = driver.get_environment()
+    assert first["cpu"] == {"0": {"%usage": 20.0}, "1": {"%usage": 0.0}}
+    # no MemAvailable, free, buffers and cache are available
+    assert first["memory"] == {"available_ram": 1000, "used_ram": 600}
+    assert first["temperature"] == {
+        "invalid": {"temperature": 0.0, "is_alert": False, "is_critical": False}
+    }
+    assert first["fans"] == {"invalid": {"status": False}}
+
+    assert driver.get_environment()["cpu"] == {"0": {"%usage": 50.0}, "1": {"%usage": 0.0}}
+    # counters of cpu0 went back after a reboot
+    assert driver.get_environment()["cpu"] == {"0": {"%usage": 50.0}, "1": {"%usage": 50.0}}
+
+
+def test_sensors():
+    """Thermal zones use their trip points, hwmon their max and crit thresholds."""
+    sensors = (
+        "/sys/class/thermal/thermal_zone0/type:x86_pkg_temp\n"
+        "/sys/class/thermal/thermal_zone0/temp:101000\n"
+        "/sys/class/thermal/thermal_zone0/trip_point_0_type:critical\n"
+        "/sys/class/thermal/thermal_zone0/trip_point_0_temp:100000\n"
+        "/sys/class/thermal/thermal_zone1/type:x86_pkg_temp\n"
+        "/sys/class/thermal/thermal_zone1/temp:40000\n"
+        "/sys/class/hwmon/hwmon0/name:x86_pkg_temp\n"
+        "/sys/class/hwmon/hwmon0/temp1_input:40000\n"
+        "/sys/class/hwmon/hwmon1/name:drivetemp\n"
+        "/sys/class/hwmon/hwmon1/temp1_input:38000\n"
+        "/sys/class/hwmon/hwmon1/temp1_crit:70000\n"
+    )
+    driver = VyOSDriver("vyos", "vyos", "vyos")
+    driver.device = Device([sample([(1, 0, 0, 1, 0, 0, 0, 0)], "MemTotal: 1 kB\n", sensors)])
+
+    assert driver.get_environment()["temperature"] == {
+        "x86_pkg_temp": {"temperature": 101.0, "is_alert": False, "is_critical": True},
+        "x86_pkg_temp (thermal_zone1)": {
+            "temperature": 40.0, "is_alert": False, "is_critical": False
+        },
+        "drivetemp temp1": {"temperature": 38.0, "is_alert": False, "is_critical": False},
+    }
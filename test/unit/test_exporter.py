@@ -0,0 +1,36 @@
+"""Tests for the OpenMetrics exporter."""
+
+from napalm.base.test.getters import wrap_test_cases
+
+from napalm_vyos.exporter import Exporter
+
+import pytest
+
+
+@pytest.mark.usefixtures("set_device_parameters")
+class TestExporter(object):
+    """Test rendering of polled targets."""
+
+    TIMINGS = (
+        "vyos_collector_duration_seconds{",
+        "vyos_scrape_duration_seconds{",
+        "vyos_session_",
+    )
+
+    @wrap_test_cases
+    def test_render_metrics(self, test_case):
+        """Test the exposition of one poll of a target."""
+        # the patched open() skips the prompt probe that sets the round trip
+        self.device._tune_timing(0.01)
+        exporter = Exporter({"router1": self.device})
+        exporter.poll()
+        metrics = exporter.render()
+
+        assert metrics.endswith("# EOF\n")
+        # timings change on every run, keep their names only
+        return {
+            "metrics": [
+                line.rsplit(" ", 1)[0] if line.startswith(self.TIMINGS) else line
+                for line in metrics.splitlines()
+            ]
+        }
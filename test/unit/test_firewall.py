@@ -0,0 +1,70 @@
+"""Tests for the firewall and NAT rule counters."""
+
+import json
+
+from napalm_vyos.vyos import VyOSDriver
+
+CAPABILITIES = {"version": "1.4-rolling-202301260317", "nft_json": True}
+
+
+class Device(object):
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+
+    def send_command(self, command, **kwargs):
+        assert command == "sudo nft -j list ruleset"
+        return self.outputs.pop(0)
+
+
+class Clock(object):
+    def __init__(self, *times):
+        self.times = list(times)
+
+    def __call__(self):
+        return self.times.pop(0)
+
+
+def ruleset(*rules):
+    return json.dumps({"nftables": [{"metainfo": {"json_schema_version": 1}}] + [
+        {"rule": {"family": "ip", "table": "vyos_filter", "chain": "NAME_WAN-IN",
+                  "handle": handle, "comment": f"WAN-IN-{handle}",
+                  "expr": [{"counter": {"packets": packets, "bytes": octets}},
+                           {"accept": None}]}}
+        for handle, packets, octets in rules
+    ]})
+
+
+def test_deltas_and_rates(monkeypatch):
+    """Deltas and rates are over the interval between calls, new and reset rules count all."""
+    driver = VyOSDriver("vyos", "vyos", "vyos")
+    driver._capabilities = CAPABILITIES
+    driver.device = Device([
+        ruleset((10, 100, 6000), (20, 5, 300)),
+        ruleset((10, 160, 9600), (20, 2, 120), (30, 7, 420)),
+    ])
+    monkeypatch.setattr("napalm_vyos.vyos.time.monotonic", Clock(1000.0, 1030.0))
+
+    first = driver.get_firewall_counters()
+    assert first[0] == {
+        "family": "ip", "table": "vyos_filter", "chain": "NAME_WAN-IN", "rule": "WAN-IN-10",
+        "packets": 100, "bytes": 6000, "packets_delta": 100, "bytes_delta": 6000,
+        "packets_rate": 0.0, "bytes_rate": 0.0,
+    }
+
+    second = driver.get_firewall_counters(columnar=True)
+    assert second["rule"] == ["WAN-IN-10", "WAN-IN-20", "WAN-IN-30"]
+    assert second["packets"] == [160, 2, 7]
+    # rule 20 was reset, rule 30 is new
+    assert second["packets_delta"] == [60, 2, 7]
+    assert second["bytes_delta"] == [3600, 120, 420]
+    assert second["packets_rate"] == [2.0, 0.067, 0.233]
+    assert second["bytes_rate"] == [120.0, 4.0, 14.0]
+
+
+def test_empty_ruleset_columns():
+    driver = VyOSDriver("vyos", "vyos", "vyos")
+    driver._capabilities = CAPABILITIES
+    driver.device = Device([ruleset()])
+    columns = driver.get_firewall_counters(columnar=True)
+    assert list(columns) == list(VyOSDriver._FIREWALL_FIELDS)
+    assert not any(columns.values())
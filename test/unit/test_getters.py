@@ -1,6 +1,8 @@
 """Tests for getters."""
 
-from napalm.base.test.getters import BaseTestGetters
+from napalm.base import models
+from napalm.base.test import helpers
+from napalm.base.test.getters import BaseTestGetters, wrap_test_cases
 
 
 import pytest
@@ -9,3 +11,150 @@ import pytest
 @pytest.mark.usefixtures("set_device_parameters")
 class TestGetter(BaseTestGetters):
     """Test get_* methods."""
+
+    @wrap_test_cases
+    def test_ping_many(self, test_case):
+        """Test ping_many."""
+        destinations = ["8.8.8.8", "192.0.2.1", "no.such.host"]
+        ping_many = self.device.ping_many(destinations)
+        assert list(ping_many) == destinations
+
+        for ping_result in ping_many.values():
+            if "success" in ping_result:
+                assert helpers.test_model(models.PingDict, ping_result["success"])
+
+        return ping_many
+
+    @wrap_test_cases
+    def test_traceroute_many(self, test_case):
+        """Test traceroute_many."""
+        destinations = ["8.8.8.8", "2001:db8::1", "no.such.host"]
+        traceroute_many = self.device.traceroute_many(destinations)
+        assert list(traceroute_many) == destinations
+
+        for traceroute_result in traceroute_many.values():
+            for hop_result in traceroute_result.get("success", {}).values():
+                for probe_result in hop_result["probes"].values():
+                    assert helpers.test_model(models.TracerouteDict, probe_result)
+
+        return traceroute_many
+
+    @wrap_test_cases
+    def test_get_route_to_cached(self, test_case):
+        """Test get_route_to answered from the local route index."""
+        self.device.route_cache_ttl = 60
+        try:
+            get_route_to = {
+                destination: self.device.get_route_to(destination=destination)
+                for destination in ["1.0.4.200", "1.0.4.10", "8.8.8.8", "10.0.2.15",
+                                    "2001:db8:1::1"]
+            }
+            get_route_to["1.0.4.0/24 longer"] = self.device.get_route_to(
+                destination="1.0.4.0/24", longer=True)
+        finally:
+            self.device.route_cache_ttl = 0
+            self.device._route_cache.clear()
+
+        for routes_to in get_route_to.values():
+            for routes in routes_to.values():
+                for route in routes:
+                    assert helpers.test_model(models.RouteDict, route)
+
+        return get_route_to
+
+    @wrap_test_cases
+    def test_instrumentation(self, test_case):
+        """Test the records passed to instrumentation hooks."""
+        events = []
+
+        def hook(event, record):
+            events.append((event, record))
+
+        self.device.instrumentation.hooks.append(hook)
+        try:
+            self.device.get_route_to(destination="1.0.4.0/24")
+            self.device.traceroute("8.8.8.8")
+        finally:
+            self.device.instrumentation.hooks.remove(hook)
+
+        instrumentation = []
+        for event, record in events:
+            assert record["wall_time"] >= 0
+            assert record["error"] is None
+            if event == "getter":
+                assert record["parse_time"] <= record["wall_time"]
+                assert record["bytes"] == sum(c["bytes"] for c in record["commands"])
+            instrumentation.append({
+                "event": event,
+                "getter": record["getter"],
+                "command": record.get("command", ""),
+                "bytes": record["bytes"],
+            })
+
+        return instrumentation
+
+    @wrap_test_cases
+    def test_iter_bgp_routes(self, test_case):
+        """Test iter_bgp_routes with both output formats and a process pool."""
+        neighbor = "192.168.1.1"
+        iter_bgp_routes = {
+            "json": list(self.device.iter_bgp_routes("ipv4")),
+            "text": list(self.device.iter_bgp_routes(
+                "ipv4", neighbor=neighbor, output_format="text")),
+            "text_pool": list(self.device.iter_bgp_routes(
+                "ipv4", neighbor=neighbor, output_format="text", processes=2,
+                chunk_lines=1)),
+        }
+        # the end marker and the prompt are read even when the consumer stops early
+        assert not self.device.device.channel
+        for output_format, peer in (("json", None), ("text", neighbor)):
+            routes = self.device.iter_bgp_routes(
+                "ipv4", neighbor=peer, output_format=output_format)
+            next(routes)
+            routes.close()
+            assert not self.device.device.channel
+        return iter_bgp_routes
+
+    @wrap_test_cases
+    def test_iter_neighbor_tables(self, test_case):
+        """Test the streamed MAC address and IPv6 neighbor tables."""
+        iter_neighbor_tables = {
+            "mac_address_table": list(self.device.iter_mac_address_table()),
+            "ipv6_neighbors": list(self.device.iter_ipv6_neighbors()),
+        }
+        # the rest of the output is read when the consumer stops early
+        for entries in (self.device.iter_mac_address_table(), self.device.iter_ipv6_neighbors()):
+            next(entries)
+            entries.close()
+            assert not self.device.device.channel
+        assert iter_neighbor_tables == {
+            "mac_address_table": self.device.get_mac_address_table(),
+            "ipv6_neighbors": self.device.get_ipv6_neighbors_table(),
+        }
+        return iter_neighbor_tables
+
+    @wrap_test_cases
+    def test_get_vrf_interfaces_ip(self, test_case):
+        """Test get_vrf_interfaces_ip for the interfaces of a VRF."""
+        get_interfaces_ip = self.device.get_vrf_interfaces_ip("TEST")
+        assert len(get_interfaces_ip) > 0
+
+        for interface, interface_details in get_interfaces_ip.items():
+            for family in ("ipv4", "ipv6"):
+                for ip, ip_details in interface_details.get(family, {}).items():
+                    assert helpers.test_model(models.InterfacesIPDictEntry, ip_details)
+
+        return get_interfaces_ip
+
+    @wrap_test_cases
+    def test_get_firewall_counters(self, test_case):
+        """Test get_firewall_counters, both as records and columns."""
+        # the driver is shared by the cases, the first call sets the counters of this one
+        first = self.device.get_firewall_counters()
+        get_firewall_counters = self.device.get_firewall_counters()
+        assert len(get_firewall_counters) == len(first) > 0
+
+        columns = self.device.get_firewall_counters(columnar=True)
+        assert [dict(zip(columns, row)) for row in zip(*columns.values())] == get_firewall_counters
+
+        return get_firewall_counters
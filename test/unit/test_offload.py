@@ -0,0 +1,65 @@
+"""Tests for the parse stages run on an executor."""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import pytest
+
+from napalm_vyos.utils import offload
+from napalm_vyos.utils.capture import ReplayDevice
+from napalm_vyos.vyos import VyOSDriver
+
+MOCKED_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mocked_data")
+
+
+def words(text, separator):
+    return text.split(separator)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ProcessPoolExecutor(2) as pool:
+        yield pool
+
+
+@pytest.mark.parametrize("executor", [None, "threads", "processes"])
+def test_run_many(executor, pool, monkeypatch):
+    """Large text goes through shared memory, unlinked once parsed, small text is pickled."""
+    monkeypatch.setattr(offload, "SHARED_MEMORY_THRESHOLD", 64)
+    shared = []
+    share = offload._share
+
+    def record(argument, segments):
+        argument = share(argument, segments)
+        if isinstance(argument, offload.SharedText):
+            shared.append(argument.name)
+        return argument
+
+    monkeypatch.setattr(offload, "_share", record)
+    calls = [("é " * 100, " "), ("small text", " ")]
+    threads = ThreadPoolExecutor(2)
+    executor = {"threads": threads, "processes": pool}.get(executor)
+
+    assert offload.run_many(executor, words, calls) == [words(*args) for args in calls]
+    assert offload.run(executor, words, "a,b", ",") == ["a", "b"]
+    assert len(shared) == (1 if executor is pool else 0)
+    for name in shared:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name)
+    threads.shutdown()
+
+
+@pytest.mark.parametrize("case, getter", [
+    ("test_get_interfaces_counters/normal", "get_interfaces_counters"),
+    ("test_get_snmp_information/normal", "get_snmp_information"),
+])
+def test_getters_on_process_pool(case, getter, pool, monkeypatch):
+    """Getters give the same results with their parse stages on a process pool."""
+    monkeypatch.setattr(offload, "SHARED_MEMORY_THRESHOLD", 64)
+    inline = VyOSDriver("vyos", "vyos", "vyos")
+    inline.device = ReplayDevice(os.path.join(MOCKED_DATA, case))
+    offloaded = VyOSDriver("vyos", "vyos", "vyos", optional_args={"parse_executor": pool})
+    offloaded.device = ReplayDevice(os.path.join(MOCKED_DATA, case))
+
+    assert getattr(offloaded, getter)() == getattr(inline, getter)()
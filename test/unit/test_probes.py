@@ -0,0 +1,48 @@
+"""Tests for the commands of the ping and traceroute probes."""
+
+from napalm_vyos.vyos import VyOSDriver
+
+
+def recording_driver(monkeypatch):
+    driver = VyOSDriver("vyos", "vyos", "vyos")
+    commands = []
+
+    def send_command(command, **kwargs):
+        commands.append(command)
+        return ""
+
+    monkeypatch.setattr(driver, "_send_command", send_command)
+    return driver, commands
+
+
+def test_ping_vrf(monkeypatch):
+    """Probes in a VRF run in its routing table."""
+    driver, commands = recording_driver(monkeypatch)
+    driver.ping("192.0.2.1", count=2, vrf="MGMT")
+    driver.ping_many(["192.0.2.1", "192.0.2.2"], count=2, vrf="MGMT")
+    driver.ping_many(["192.0.2.1"], count=2)
+
+    assert commands[0] == "ping 192.0.2.1 ttl 255 deadline 4 size 100 count 2 vrf MGMT "
+    assert commands[1] == (
+        "for d in 192.0.2.1 192.0.2.2; do sudo ip vrf exec MGMT "
+        '/bin/ping -q -n -c 2 -s 100 -t 255 -w 4 $d 2>&1 | sed "s/^/$d /" & done; wait'
+    )
+    assert "vrf" not in commands[2]
+
+
+def test_traceroute_vrf(monkeypatch):
+    driver = VyOSDriver("vyos", "vyos", "vyos")
+    commands = []
+
+    def iter_command_lines(command, deadline=0):
+        commands.append(command)
+        return iter(())
+
+    monkeypatch.setattr(driver, "_iter_command_lines", iter_command_lines)
+    driver.traceroute("192.0.2.1", ttl=3, timeout=1, vrf="MGMT")
+
+    assert commands == [
+        "for d in 192.0.2.1; do timeout 3 sudo ip vrf exec MGMT /usr/bin/traceroute -n "
+        f"-q {VyOSDriver._TRACEROUTE_PROBES} -m 3 -w 1 "
+        '$d 2>&1 | sed "s/^/$d /" & done; wait'
+    ]
@@ -0,0 +1,95 @@
+"""Tests for the adaptive polling scheduler."""
+
+import threading
+import time
+
+from napalm_vyos.scheduler import Scheduler
+from napalm_vyos.utils.instrument import Instrumentation
+
+
+class FakeDriver(object):
+    """Driver counting getter calls."""
+
+    def __init__(self):
+        self.instrumentation = Instrumentation()
+        self.calls = []
+
+    def get_facts(self):
+        self.calls.append("get_facts")
+        return {"hostname": "vyos"}
+
+    def get_interfaces_counters(self):
+        self.calls.append("get_interfaces_counters")
+        return {}
+
+
+def command(wall_time, text="show"):
+    return {"getter": None, "command": text, "wall_time": wall_time, "error": None}
+
+
+def test_scheduler_polls_and_caches():
+    """Getters run once when due, then get() is served from the cache."""
+    driver = FakeDriver()
+    results = []
+    scheduler = Scheduler({"r1": driver}, callback=lambda *args: results.append(args),
+                          intervals={"get_facts": 3600, "get_interfaces_counters": 30})
+
+    assert scheduler.run_pending(now=time.monotonic() + 3600) == 2
+    assert scheduler.join(timeout=5)
+    assert sorted(driver.calls) == ["get_facts", "get_interfaces_counters"]
+    assert ("r1", "get_facts", {"hostname": "vyos"}) in results
+
+    assert scheduler.get("r1", "get_facts") == {"hostname": "vyos"}
+    assert scheduler.run_pending() == 0
+    assert len(driver.calls) == 2
+
+
+def test_scheduler_backoff():
+    """Intervals stretch with the device latency, within max_backoff."""
+    driver = FakeDriver()
+    scheduler = Scheduler({"r1": driver}, intervals={}, smoothing=0.5, max_backoff=4)
+
+    assert scheduler.backoff("r1") == 1.0
+    driver.instrumentation.emit("command", command(0.1))
+    driver.instrumentation.emit("command", command(0.3))
+    assert scheduler.stats()["r1"]["backoff"] == 2.0
+
+    for _ in range(20):
+        driver.instrumentation.emit("command", command(10.0))
+    assert scheduler.backoff("r1") == 4
+
+
+def test_scheduler_backoff_per_command():
+    """A long command after short ones is compared to its own baseline."""
+    driver = FakeDriver()
+    scheduler = Scheduler({"r1": driver}, intervals={}, smoothing=0.5)
+
+    for _ in range(10):
+        driver.instrumentation.emit("command", command(0.25, "show version"))
+    driver.instrumentation.emit("command", command(4.0, "show ip bgp"))
+    assert scheduler.backoff("r1") == 1.0
+
+    driver.instrumentation.emit("command", command(12.0, "show ip bgp"))
+    driver.instrumentation.emit("command", command(0.75, "show version"))
+    assert scheduler.backoff("r1") == 2.0
+    assert set(scheduler.stats()["r1"]["commands"]) == {"show version", "show ip bgp"}
+
+
+def test_scheduler_hung_target():
+    """A hung device does not delay the polls of the others."""
+    hung = FakeDriver()
+    release = threading.Event()
+    hung.get_facts = lambda: release.wait(10)
+    polled = threading.Event()
+    scheduler = Scheduler({"r1": hung, "r2": FakeDriver()}, intervals={"get_facts": 60},
+                          callback=lambda target, *args: target == "r2" and polled.set())
+
+    started = time.monotonic()
+    assert scheduler.run_pending(now=started + 60) == 2
+    assert time.monotonic() - started < 1
+    assert polled.wait(5)
+    assert not scheduler.join(timeout=0.1)
+
+    release.set()
+    assert scheduler.join(timeout=5)
+    scheduler.stop()
@@ -0,0 +1,60 @@
+"""Tests for get_config streaming to sinks."""
+
+import gzip
+import io
+import os
+
+import pytest
+
+from napalm_vyos.utils.capture import ReplayDevice
+from napalm_vyos.vyos import VyOSDriver
+
+CONFIG = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "mocked_data", "test_get_config", "normal"
+)
+
+
+@pytest.fixture
+def driver():
+    driver = VyOSDriver("vyos", "vyos", "vyos")
+    driver.device = ReplayDevice(CONFIG)
+    return driver
+
+
+def test_get_config_to_paths(driver, tmp_path):
+    """Stores are written to the paths, gzip compressed by suffix, and not returned."""
+    expected = driver.get_config()
+    template = str(tmp_path / "vyos-{store}.conf.gz")
+
+    assert driver.get_config(retrieve="all", sinks=template) == {
+        "running": "", "startup": "", "candidate": ""
+    }
+    for store in ("running", "startup"):
+        with gzip.open(template.format(store=store), "rt") as f:
+            assert f.read() == expected[store]
+    assert driver.device.history.count("configure") == 0
+
+
+def test_get_config_to_file_objects(driver):
+    """Only the stores given a sink are streamed, the others are returned."""
+    running = io.BytesIO()
+    startup = io.StringIO()
+    config = driver.get_config(sinks={"running": running, "startup": startup},
+                               compression=None)
+    assert config["running"] == config["startup"] == ""
+
+    config = driver.get_config(retrieve="running", sinks={"startup": startup})
+    assert running.getvalue().decode() == config["running"]
+    assert startup.getvalue().startswith("interfaces {")
+
+    with pytest.raises(TypeError):
+        driver.get_config(retrieve="running", sinks={"running": io.StringIO()},
+                          compression="gzip")
+
+
+def test_get_config_zstd(driver):
+    zstandard = pytest.importorskip("zstandard")
+    sink = io.BytesIO()
+    driver.get_config(retrieve="running", sinks={"running": sink}, compression="zstd")
+    running = zstandard.ZstdDecompressor().decompressobj().decompress(sink.getvalue())
+    assert running.decode() == driver.get_config(retrieve="running")["running"]
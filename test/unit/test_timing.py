@@ -0,0 +1,84 @@
+"""Tests for the session timing tuned from the measured round trip time."""
+
+import time
+
+from napalm_vyos.vyos import VyOSDriver
+
+
+def command(ttfb, streamed=False):
+    return {"command": "show", "ttfb": ttfb, "streamed": streamed, "error": None}
+
+
+def getter(error=None):
+    return {"getter": "get_facts", "error": error}
+
+
+class PromptDevice(object):
+    """Channel answering every line with the prompt."""
+
+    RETURN = "\n"
+    base_prompt = "vyos@vyos"
+
+    def __init__(self):
+        self.global_delay_factor = 1
+        self.probes = 0
+        self.channel = ""
+
+    def clear_buffer(self):
+        self.channel = ""
+
+    def write_channel(self, data):
+        self.probes += 1
+        self.channel += "vyos@vyos:~$ "
+
+    def read_channel(self):
+        data, self.channel = self.channel, ""
+        return data
+
+
+def test_timing_follows_rtt():
+    """Delay factor and command deadlines scale with the round trip time."""
+    driver = VyOSDriver("vyos", "vyos", "vyos", timeout=60)
+    assert driver.timing == {"rtt": None, "delay_factor": 1, "read_timeout": 60}
+
+    driver._tune_timing(0.001)
+    assert driver.timing == {"rtt": 0.001, "delay_factor": 0.1, "read_timeout": 60}
+
+    for _ in range(50):
+        driver._tune_timing(0.5)
+    assert driver.delay_factor == 5.0
+    assert driver.timing["read_timeout"] == 300.0
+    assert driver._command_deadline(120) == 420.0
+
+
+def test_timing_ignores_command_ttfb(monkeypatch):
+    """
+    Only the prompt probe is an RTT sample, repeated between getters: the
+    time to first byte of commands grows with netmiko's delays.
+    """
+    driver = VyOSDriver("vyos", "vyos", "vyos", timeout=60, optional_args={"auto_tune": True})
+    driver.device = PromptDevice()
+    driver._tune_timing(driver._measure_rtt())
+    assert driver.device.probes == 3
+    delay_factor = driver.delay_factor
+
+    for _ in range(50):
+        driver.instrumentation.emit("command", command(2.5))
+        driver.instrumentation.emit("getter", getter())
+    assert driver.delay_factor == delay_factor
+    assert driver.device.probes == 3
+
+    clock = time.monotonic() + VyOSDriver._RTT_PROBE_INTERVAL
+    monkeypatch.setattr("napalm_vyos.vyos.time.monotonic", lambda: clock)
+    driver.instrumentation.emit("getter", getter(error="CommandTimeoutException()"))
+    assert driver.device.probes == 3
+    driver.instrumentation.emit("getter", getter())
+    assert driver.device.probes == 4
+
+
+def test_timing_static():
+    """Without auto_tune the configured global_delay_factor is kept, and nothing is timed."""
+    driver = VyOSDriver("vyos", "vyos", "vyos", optional_args={"global_delay_factor": 2})
+    assert driver.instrumentation.start("show version") is None
+    driver.instrumentation.emit("command", command(0.001))
+    assert driver.timing == {"rtt": None, "delay_factor": 2, "read_timeout": 120}